@@ -1,25 +1,29 @@
-import pickle
 import streamlit as st
-from text_processor import PreProcessText
+import instrumentation
+from pipeline import load_pipeline
+from scam_index import load_scam_index
 
-tfidf=pickle.load(open('vectorizer.pkl','rb'))
-model=pickle.load(open('model.pkl','rb'))
+instrumentation.serve_from_env()
+pipeline=load_pipeline(engine='numpy')
+# known scam scripts (None until `python scripts/scam_index.py build` has run)
+scam_index=load_scam_index()
 
 # input
 
 input_message=st.text_input("enter message")
 if st.button("Analyze"):
-        # pre process
-    obj=PreProcessText()
-    transform_message=obj.remove_punctuation(input_message)
-    # vectorise
-    # bow_transformer = CountVectorizer(analyzer=obj.token_words).fit(transform_message)
-
-    vector_input=tfidf.transform([transform_message])
-    # tfidf_transformer.transform([transform_message])
-    # predict 
-    result=model.predict(vector_input)[0]
+    # pre process + vectorise + predict (same feature path as training)
+    with instrumentation.request('app.analyze') as timing:
+        probability=pipeline.scam_probability([input_message])[0]
+        result=pipeline.labels([probability])[0]
+        template=scam_index.best_match(input_message) if scam_index is not None else None
     if result==0:
         st.header("scam")
     else:
-        st.header("no scam")
\ No newline at end of file
+        st.header("no scam")
+    st.text(f"scam probability {probability:.1%} (threshold {pipeline.threshold:.0%})")
+    if template is not None:
+        st.text(f"matches known scam #{template['id']} ({template['similarity']:.0%} similar): "
+                f"{template['message'][:120]}")
+    if timing.stages:
+        st.caption(instrumentation.format_stages(timing.stages))
\ No newline at end of file
@@ -1,14 +1,26 @@
 import streamlit as st
-import assemblyai as aai
-import pickle
-from text_processor import PreProcessText
+import instrumentation
+from pipeline import load_pipeline
+from scam_index import load_scam_index
+from transcription_backends import AssemblyAIBackend, TranscriptionError
+from transcript_cache import CachedBackend, TranscriptCache
 
 # --- CONFIGURATION ---
-aai.settings.api_key = "Your api key from assembly ai"
+# Prometheus /metrics when SCAM_METRICS_PORT is set (see instrumentation.py)
+instrumentation.serve_from_env()
+
+@st.cache_resource
+def get_transcript_cache():
+    return TranscriptCache()
+
+# Reruns (any widget click) and repeat uploads of the same file hit the cache
+backend = CachedBackend(AssemblyAIBackend(api_key="Your api key from assembly ai"),
+                        get_transcript_cache())
 
 # Load your ML models
-tfidf = pickle.load(open('vectorizer.pkl','rb'))
-model = pickle.load(open('model.pkl','rb'))
+pipeline = load_pipeline(engine='numpy')
+# Known scam scripts (None until `python scripts/scam_index.py build` has run)
+scam_index = load_scam_index()
 
 # --- UI SETUP ---
 st.title(":blue[VoxKey]")
@@ -28,17 +40,16 @@ else:
         with st.spinner("Transcribing audio... please wait."):
             try:
                 # AssemblyAI can take the file buffer directly
-                config = aai.TranscriptionConfig(speech_models=["universal"])
-                transcriber = aai.Transcriber(config=config)
-                
-                # We pass the uploaded file bytes to AssemblyAI
-                transcript = transcriber.transcribe(uploaded_file)
-                
-                if transcript.status == "error":
-                    st.error(f"Transcription failed: {transcript.error}")
-                else:
-                    input_message = transcript.text
-                    st.info(f"Transcribed Text: {input_message}")
+                with instrumentation.request('audio_input.transcribe') as timing:
+                    transcript = backend.transcribe(uploaded_file)
+                input_message = transcript['text']
+                st.info(f"Transcribed Text: {input_message}")
+                if transcript['cached']:
+                    st.caption("Transcript loaded from cache")
+                elif timing.stages:
+                    st.caption(instrumentation.format_stages(timing.stages))
+            except TranscriptionError as e:
+                st.error(str(e))
             except Exception as e:
                 st.error(f"An error occurred: {e}")
 
@@ -47,16 +58,19 @@ if st.button("Analyze"):
     if input_message.strip() == "":
         st.warning("Please provide some text or an audio file first.")
     else:
-        obj = PreProcessText()
-        transform_message = obj.remove_punctuation(input_message)
-        
-        # Vectorize
-        vector_input = tfidf.transform([transform_message])
-        
-        # Predict 
-        result = model.predict(vector_input)[0]
+        # Preprocess, vectorize and predict at the pipeline's operating threshold
+        with instrumentation.request('audio_input.analyze') as timing:
+            probability = pipeline.scam_probability([input_message])[0]
+            result = pipeline.labels([probability])[0]
+            template = scam_index.best_match(input_message) if scam_index is not None else None
         
         if result == 0:
             st.error("🚨 Warning: This appears to be a SCAM.")
         else:
-            st.success("✅ This seems safe.")
\ No newline at end of file
+            st.success("✅ This seems safe.")
+        st.progress(float(probability), text=f"Scam probability: {probability:.1%}")
+        if template is not None:
+            st.warning(f"Matches a known scam script ({template['similarity']:.0%} similar): "
+                       f"{template['message'][:200]}")
+        if timing.stages:
+            st.caption(instrumentation.format_stages(timing.stages))
\ No newline at end of file
@@ -0,0 +1,293 @@
+"""
+Audio decoding shared by the transcription tools
+Everything is returned as mono float32 at 16 kHz, the rate Whisper expects
+
+    load_audio(path)            any ffmpeg-readable file -> float32 samples
+    open_audio(source)          decode once into a cached 16 kHz int16 PCM file and
+                                return it memory-mapped (PcmAudio)
+    iter_windows(audio, ...)    overlapping fixed-length windows with their start time
+
+PCM .wav files are read with the standard library so they work without ffmpeg.
+
+load_audio holds the whole recording as float32 (230 MB per hour). For long
+recordings use open_audio: decoding streams to disk block by block, and
+PcmAudio slices are converted to float32 only for the window being read,
+so memory per request stays flat whatever the length. Decoded files are
+keyed by SHA-256 of the media, shared by every tool that reads the same
+recording, and evicted least recently used past max_bytes.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+import numpy as np
+from instrumentation import timed
+from transcript_cache import media_sha256
+
+SAMPLE_RATE = 16000
+PCM_CACHE_DIR = '.audio_cache'
+PCM_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+BLOCK_S = 30
+
+
+def _read_wav(path, sr):
+    """Decode a PCM WAV file with the wave module (downmix + linear resample)"""
+    with wave.open(path, 'rb') as f:
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        rate = f.getframerate()
+        raw = f.readframes(f.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != sr and len(samples):
+        n_out = int(round(len(samples) * sr / rate))
+        positions = np.arange(n_out, dtype=np.float64) * (rate / sr)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+    return samples.astype(np.float32, copy=False)
+
+
+def _read_ffmpeg(path, sr):
+    """Decode anything ffmpeg understands (mp3, mp4, m4a, ...)"""
+    if shutil.which('ffmpeg') is None:
+        raise RuntimeError("ffmpeg is required to decode this file - install it and make "
+                           "sure it is on PATH")
+    cmd = ['ffmpeg', '-nostdin', '-threads', '0', '-i', path,
+           '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sr), '-']
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode {path}: {e.stderr.decode(errors='replace')}") from e
+    return np.frombuffer(out, dtype='<i2').astype(np.float32) / 32768
+
+
+def _wav_blocks(path, sr, block_s=BLOCK_S):
+    """_read_wav one block at a time: yields float32 pieces of the same output"""
+    with wave.open(path, 'rb') as f:
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        rate = f.getframerate()
+        if width not in (1, 2, 4):
+            raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+        n_in = f.getnframes()
+        n_out = int(round(n_in * sr / rate))
+        step = rate / sr
+        buffer = np.zeros(0, dtype=np.float32)
+        offset = 0                              # input index of buffer[0]
+        done = 0                                # output samples yielded so far
+        while done < n_out:
+            raw = f.readframes(int(block_s * rate))
+            if width == 1:
+                block = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+            elif width == 2:
+                block = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768
+            else:
+                block = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648
+            if channels > 1:
+                block = block.reshape(-1, channels).mean(axis=1)
+            if rate == sr:
+                if len(block) == 0:
+                    return
+                done += len(block)
+                yield block
+                continue
+
+            buffer = np.concatenate([buffer, block])
+            last = offset + len(buffer) - 1
+            # Outputs whose position is covered; everything left on the final block
+            end = n_out if len(block) == 0 or last >= n_in - 1 else min(n_out, int(last / step) + 1)
+            positions = np.arange(done, end, dtype=np.float64) * step - offset
+            yield np.interp(positions, np.arange(len(buffer)), buffer).astype(np.float32)
+            done = end
+            keep = min(int(done * step) - offset, len(buffer) - 1)
+            buffer = buffer[max(keep, 0):]
+            offset += max(keep, 0)
+
+
+def _ffmpeg_blocks(path, sr, block_s=BLOCK_S):
+    """_read_ffmpeg one block at a time, reading ffmpeg's output as it is produced"""
+    if shutil.which('ffmpeg') is None:
+        raise RuntimeError("ffmpeg is required to decode this file - install it and make "
+                           "sure it is on PATH")
+    cmd = ['ffmpeg', '-nostdin', '-threads', '0', '-i', path,
+           '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sr), '-']
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            raw = process.stdout.read(int(block_s * sr) * 2)
+            if not raw:
+                break
+            yield np.frombuffer(raw[:len(raw) // 2 * 2], dtype='<i2').astype(np.float32) / 32768
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"Failed to decode {path}: {stderr.decode(errors='replace')}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _decode_blocks(path, sr):
+    if path.lower().endswith('.wav'):
+        try:
+            # Checked here: _wav_blocks is a generator and would only fail once iterated
+            with wave.open(path, 'rb') as f:
+                if f.getsampwidth() not in (1, 2, 4):
+                    raise ValueError(f"Unsupported WAV sample width: {f.getsampwidth()} bytes")
+            return _wav_blocks(path, sr)
+        except (wave.Error, EOFError, ValueError):
+            pass                                # compressed or 24-bit WAV: let ffmpeg handle it
+    return _ffmpeg_blocks(path, sr)
+
+
+class PcmAudio(object):
+    """
+    A decoded recording memory-mapped from an int16 PCM file
+
+    Behaves like a read-only 1-D float32 array for len() and slicing:
+    audio[a:b] converts only those samples, so iter_windows, vad and the
+    feature extractors can walk an hour of audio a window at a time.
+    """
+
+    def __init__(self, path, sr=SAMPLE_RATE):
+        self.path = path
+        self.sr = sr
+        if os.path.getsize(path):
+            self.pcm = np.memmap(path, dtype='<i2', mode='r')
+        else:
+            self.pcm = np.zeros(0, dtype='<i2')     # mmap cannot map an empty file
+
+    def __len__(self):
+        return len(self.pcm)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return np.float32(self.pcm[index]) / 32768
+        return self.pcm[index].astype(np.float32) / 32768
+
+    @property
+    def duration(self):
+        return len(self.pcm) / self.sr
+
+    def to_array(self):
+        """The whole recording as float32 (for consumers that need one array)"""
+        return self[:]
+
+
+def _evict_pcm(cache_dir, max_bytes):
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not name.endswith('.pcm'):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue                            # removed by another process
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries[:-1]:          # never the entry just written
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)                     # open memmaps keep their data
+        except OSError:
+            continue
+        total -= size
+
+
+@timed('decode')
+def open_audio(source, sr=SAMPLE_RATE, cache_dir=PCM_CACHE_DIR, max_bytes=PCM_CACHE_MAX_BYTES):
+    """
+    Decode a recording once and return it memory-mapped
+
+    Args:
+        source: file path or file-like object with a .name (e.g. a Streamlit upload)
+        sr: target sample rate
+        cache_dir: where decoded PCM files are kept
+
+    Returns:
+        PcmAudio
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'{media_sha256(source)}-{sr}.pcm')
+    if os.path.exists(path):
+        os.utime(path)                          # LRU: mark as recently used
+        return PcmAudio(path, sr)
+
+    media_path = source
+    if hasattr(source, 'read'):                 # decoders need a file on disk
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(source.name)[1],
+                                         delete=False) as f:
+            position = source.tell()
+            source.seek(0)
+            shutil.copyfileobj(source, f)
+            source.seek(position)
+            media_path = f.name
+    try:
+        fd, partial = tempfile.mkstemp(dir=cache_dir, suffix='.partial')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for block in _decode_blocks(media_path, sr):
+                    out.write((np.clip(block, -1, 1) * 32767).astype('<i2').tobytes())
+            os.replace(partial, path)           # readers never see half a file
+        except BaseException:
+            os.remove(partial)
+            raise
+    finally:
+        if media_path is not source:
+            os.remove(media_path)
+    _evict_pcm(cache_dir, max_bytes)
+    return PcmAudio(path, sr)
+
+
+def load_audio(path, sr=SAMPLE_RATE):
+    """
+    Load an audio/video file as mono float32 samples in [-1, 1]
+
+    Args:
+        path: file path
+        sr: target sample rate
+
+    Returns:
+        1-D float32 numpy array
+    """
+    if path.lower().endswith('.wav'):
+        try:
+            return _read_wav(path, sr)
+        except (wave.Error, ValueError):
+            pass                                # compressed WAV: let ffmpeg handle it
+    return _read_ffmpeg(path, sr)
+
+
+def iter_windows(audio, sr=SAMPLE_RATE, window_s=30.0, overlap_s=5.0):
+    """
+    Yield (start_seconds, samples, is_last) over overlapping windows
+
+    Consecutive windows share overlap_s seconds, so speech cut at one
+    window's edge is decoded whole in the next one.
+    """
+    if overlap_s >= window_s:
+        raise ValueError("overlap_s must be smaller than window_s")
+    window = int(window_s * sr)
+    step = int((window_s - overlap_s) * sr)
+    start = 0
+    while True:
+        end = min(start + window, len(audio))
+        is_last = end >= len(audio)
+        yield start / sr, audio[start:end], is_last
+        if is_last:
+            return
+        start += step
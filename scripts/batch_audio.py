@@ -0,0 +1,264 @@
+"""
+Batch audio ingestion: directory of recordings -> transcripts -> scam scores
+
+Three overlapping stages:
+    1. decode   process pool, each file -> 16 kHz mono PCM (audio_io.open_audio, so
+                reruns reuse the decoded file), silence removed unless --no-vad
+    2. transcribe   warm Whisper TranscriptionPool fed the decoded samples
+                    (or another backend on a thread pool)
+    3. score    finished transcripts are scored together in batches
+
+Results are appended to a JSONL manifest as soon as each batch is scored.
+A rerun skips files already in the manifest with status 'ok' and the same
+size, mtime, backend and VAD setting, so an interrupted run resumes where it stopped;
+failed files are retried.
+
+Usage (from the project root):
+    python scripts/batch_audio.py Conversation/dataset
+    python scripts/batch_audio.py /data/calls --output calls.jsonl --decode-workers 4 --whisper-workers 2
+    python scripts/batch_audio.py Conversation/dataset --backend mock     # no model needed
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import numpy as np
+from audio_io import SAMPLE_RATE, open_audio
+from pipeline import DEFAULT_PIPELINE_DIR, load_pipeline
+from transcription_backends import BACKENDS, get_backend
+from vad import speech_view
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.mp4', '.m4a', '.flac', '.ogg', '.webm')
+DEFAULT_MANIFEST = 'batch_results.jsonl'
+STAGES = ('decode_s', 'transcribe_s', 'score_s')
+
+
+def find_audio_files(root):
+    """Audio/video files under root, sorted"""
+    found = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                found.append(os.path.join(directory, name))
+    return sorted(found)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+
+def read_manifest(path):
+    """{file path: last record} from an existing manifest"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue                        # torn last line from an interrupted run
+            done[record['path']] = record
+    return done
+
+
+def _decode(path, vad=True):
+    """Worker: decode one file to int16 PCM (half the size of float32 to pickle)"""
+    start = time.perf_counter()
+    samples = open_audio(path)
+    duration = samples.duration
+    if vad:
+        samples, _, _ = speech_view(samples)
+    pcm = (np.clip(samples[:], -1, 1) * 32767).astype(np.int16)
+    return pcm, duration, time.perf_counter() - start
+
+
+class BatchTranscriber(object):
+    """submit(samples) -> Future of a transcript dict, whatever the backend"""
+
+    def __init__(self, backend_name, model, workers):
+        self.pool = None
+        self.threads = None
+        if backend_name == 'whisper':
+            from whisper_pool import TranscriptionPool
+            self.pool = TranscriptionPool(model, workers=workers, max_queue=workers * 2)
+            self.backend_id = f'whisper-{model}'
+        else:
+            self.backend = get_backend(backend_name)
+            self.threads = ThreadPoolExecutor(max_workers=workers)
+            self.backend_id = self.backend.backend_id
+
+    def submit(self, samples):
+        if self.pool is not None:
+            return self.pool.submit(samples)
+        return self.threads.submit(self.backend.transcribe_samples, samples)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.threads is not None:
+            self.threads.shutdown()
+
+
+def run_batch(files, manifest_path, transcriber, pipeline, decode_workers=2, score_batch=32,
+              max_in_flight=8, vad=True, quiet=False):
+    """
+    Decode, transcribe and score files, appending records to the manifest
+
+    Returns:
+        dict with per-stage totals, counts and wall time
+    """
+    totals = {stage: 0.0 for stage in STAGES}
+    counts = {'ok': 0, 'error': 0}
+    audio_seconds = 0.0
+    speech_seconds = 0.0
+    started = time.perf_counter()
+    pending = list(files)
+    decoding = {}
+    transcribing = {}
+    to_score = []
+
+    with open(manifest_path, 'a', encoding='utf-8') as manifest, \
+            ProcessPoolExecutor(max_workers=decode_workers) as decoder:
+
+        def write(record):
+            nonlocal audio_seconds, speech_seconds
+            counts[record['status']] += 1
+            for stage in STAGES:
+                totals[stage] += record.get(stage, 0.0)
+            audio_seconds += record.get('duration_s', 0.0)
+            speech_seconds += record.get('speech_s', 0.0)
+            manifest.write(json.dumps(record, ensure_ascii=False) + '\n')
+            if not quiet:
+                done = counts['ok'] + counts['error']
+                label = (f"scam {record['scam_probability']:.2f}" if record['status'] == 'ok'
+                         else f"error: {record['error']}")
+                print(f"  [{done}/{len(files)}] {record['path']}  {label}")
+
+        def score(records):
+            start = time.perf_counter()
+            probabilities = pipeline.scam_probability([r['text'] for r in records])
+            share = (time.perf_counter() - start) / len(records)
+            for record, probability in zip(records, probabilities):
+                record['scam_probability'] = float(probability)
+                record['label'] = int(pipeline.labels([probability])[0])
+                record['score_s'] = share
+                write(record)
+            manifest.flush()
+
+        while pending or decoding or transcribing:
+            # Keep a bounded number of files between decode and transcription
+            while pending and len(decoding) + len(transcribing) < max_in_flight:
+                path = pending.pop(0)
+                decoding[decoder.submit(_decode, path, vad)] = path
+
+            finished, _ = wait(list(decoding) + list(transcribing), return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in decoding:
+                    path = decoding.pop(future)
+                    try:
+                        pcm, duration, decode_s = future.result()
+                    except Exception as e:
+                        write({'path': path, 'status': 'error', 'error': str(e).splitlines()[0],
+                               'backend': transcriber.backend_id, 'vad': vad,
+                               **file_signature(path)})
+                        continue
+                    record = {'path': path, 'status': 'ok', 'backend': transcriber.backend_id,
+                              'vad': vad, 'duration_s': duration, 'speech_s': len(pcm) / SAMPLE_RATE,
+                              'decode_s': decode_s, **file_signature(path)}
+                    if len(pcm) == 0:           # nothing but silence
+                        record.update(text='', transcribe_s=0.0)
+                        to_score.append(record)
+                        continue
+                    record['_submitted'] = time.perf_counter()
+                    transcribing[transcriber.submit(pcm.astype(np.float32) / 32768)] = record
+                else:
+                    record = transcribing.pop(future)
+                    submitted = record.pop('_submitted')
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        record.update(status='error', error=str(e).splitlines()[0])
+                        write(record)
+                        continue
+                    record['transcribe_s'] = time.perf_counter() - submitted
+                    if 'decode_s' in result:
+                        record['whisper_decode_s'] = result['decode_s']
+                    record['text'] = result['text'].strip()
+                    to_score.append(record)
+
+            if len(to_score) >= score_batch or (to_score and not (pending or decoding or transcribing)):
+                score(to_score)
+                to_score = []
+
+    return {'totals': totals, 'counts': counts, 'audio_s': audio_seconds,
+            'speech_s': speech_seconds, 'wall_s': time.perf_counter() - started}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe and score a directory of recordings")
+    parser.add_argument('root', help='directory to scan (recursively)')
+    parser.add_argument('--output', default=DEFAULT_MANIFEST, help='JSONL results manifest')
+    parser.add_argument('--backend', default='whisper', choices=sorted(BACKENDS))
+    parser.add_argument('--model', default='base', help='Whisper model size')
+    parser.add_argument('--decode-workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--whisper-workers', type=int, default=1,
+                        help='transcription workers (each holds a model)')
+    parser.add_argument('--score-batch', type=int, default=32, help='transcripts per scoring call')
+    parser.add_argument('--pipeline', default=DEFAULT_PIPELINE_DIR, help='pipeline directory')
+    parser.add_argument('--no-vad', action='store_true', help='transcribe silence too')
+    parser.add_argument('--quiet', action='store_true', help='no per-file output')
+    args = parser.parse_args()
+
+    files = find_audio_files(args.root)
+    transcriber = BatchTranscriber(args.backend, args.model, args.whisper_workers)
+    done = read_manifest(args.output)
+    todo = []
+    for path in files:
+        record = done.get(path)
+        if (record is not None and record['status'] == 'ok'
+                and record.get('backend') == transcriber.backend_id
+                and record.get('vad') == (not args.no_vad)
+                and {k: record.get(k) for k in ('size', 'mtime')} == file_signature(path)):
+            continue
+        todo.append(path)
+
+    print(f"\n{len(files)} recordings under {args.root}: "
+          f"{len(files) - len(todo)} already in {args.output}, {len(todo)} to process")
+    if not todo:
+        transcriber.shutdown()
+        return
+
+    pipeline = load_pipeline(args.pipeline, engine='sparse')
+    try:
+        summary = run_batch(todo, args.output, transcriber, pipeline,
+                            decode_workers=args.decode_workers, score_batch=args.score_batch,
+                            max_in_flight=max(4, args.whisper_workers * 4), vad=not args.no_vad,
+                            quiet=args.quiet)
+    finally:
+        transcriber.shutdown()
+
+    wall = summary['wall_s']
+    processed = summary['counts']['ok'] + summary['counts']['error']
+    print("\n" + "="*70)
+    print(f"BATCH COMPLETE - {summary['counts']['ok']} ok, {summary['counts']['error']} failed")
+    print("="*70)
+    print(f"  Wall time:   {wall:.1f}s for {summary['audio_s']:.0f}s of audio "
+          f"({summary['audio_s'] / wall:.1f}x realtime, {processed / wall * 60:.1f} files/min)")
+    if summary['audio_s']:
+        print(f"  Speech:      {summary['speech_s']:.0f}s transcribed, "
+              f"{1 - summary['speech_s'] / summary['audio_s']:.0%} of the audio skipped as silence")
+    for stage in STAGES:
+        print(f"  {stage[:-2]:<11}  {summary['totals'][stage]:8.2f}s total, "
+              f"{summary['totals'][stage] / max(processed, 1):.3f}s per file")
+    print(f"  Results:     {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: speaker diarization on the Conversation dataset
+Conversation/dataset has one clip per speaker turn (professor/student), so
+calls with a known reference are built by alternating the two speakers'
+clips with short pauses between turns.
+
+Reports:
+    - diarization accuracy (share of speech time given the right speaker)
+      and real-time factor for every synthetic call
+    - speaker identification accuracy: profiles enrolled from train/,
+      tested on the valid/ clips
+
+Usage (from the project root):
+    python scripts/bench_diarization.py [--root Conversation/dataset] [--pause 0.4]
+"""
+
+import argparse
+import glob
+import os
+import time
+import numpy as np
+from audio_io import SAMPLE_RATE, load_audio
+from diarization import SpeakerProfiles, diarize, frame_accuracy
+
+SPEAKERS = ('professor', 'student')
+
+
+def speaker_clips(root, split):
+    """{speaker: [(path, samples), ...]} for one split"""
+    clips = {}
+    for speaker in SPEAKERS:
+        paths = sorted(glob.glob(os.path.join(root, split, speaker, '*.wav')))
+        clips[speaker] = [(path, load_audio(path)) for path in paths]
+    return clips
+
+
+def build_call(first, second, pause_s, rng):
+    """Alternate the two speakers' clips; returns (samples, [(start, end, speaker), ...])"""
+    pause = (rng.normal(0, 0.002, int(pause_s * SAMPLE_RATE))).astype(np.float32)
+    parts, truth = [], []
+    position = 0.0
+    for a, b in zip(first, second):
+        for speaker, clip in ((0, a), (1, b)):
+            parts.extend([clip, pause])
+            duration = len(clip) / SAMPLE_RATE
+            truth.append((position, position + duration, speaker))
+            position += duration + pause_s
+    return np.concatenate(parts), truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--root', default='Conversation/dataset')
+    parser.add_argument('--pause', type=float, default=0.4, help='seconds between turns')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    train = speaker_clips(args.root, 'train')
+    valid = speaker_clips(args.root, 'valid')
+    if not all(train.values()):
+        print(f"\n✗ No speaker folders under {args.root}/train")
+        return
+
+    # Synthetic calls: train clips in pairs, plus the valid clips
+    calls = []
+    professor = [c for _, c in train['professor']]
+    student = [c for _, c in train['student']]
+    for i in range(0, min(len(professor), len(student)) - 1, 2):
+        calls.append((f'train {i + 1}-{i + 2}', *build_call(professor[i:i + 2], student[i:i + 2],
+                                                            args.pause, rng)))
+    calls.append(('train all', *build_call(professor, student, args.pause, rng)))
+    if all(valid.values()):
+        calls.append(('valid', *build_call([c for _, c in valid['professor']],
+                                           [c for _, c in valid['student']], args.pause, rng)))
+
+    print("\n" + "="*70)
+    print("DIARIZATION - synthetic two-speaker calls")
+    print("="*70)
+    print(f"  {'call':<12} {'audio s':>8} {'turns':>6} {'found':>6} {'accuracy':>9} {'RTF':>8}")
+    accuracies, rtfs = [], []
+    for name, samples, truth in calls:
+        start = time.perf_counter()
+        turns = diarize(samples, n_speakers=2)
+        elapsed = time.perf_counter() - start
+        duration = len(samples) / SAMPLE_RATE
+        accuracy = frame_accuracy(turns, truth)
+        accuracies.append(accuracy)
+        rtfs.append(elapsed / duration)
+        print(f"  {name:<12} {duration:8.1f} {len(truth):>6} {len(turns):>6} "
+              f"{accuracy:9.3f} {elapsed / duration:8.4f}")
+    print(f"  {'mean':<12} {'':>8} {'':>6} {'':>6} {np.mean(accuracies):9.3f} {np.mean(rtfs):8.4f}")
+
+    if all(valid.values()):
+        profiles = SpeakerProfiles()
+        for speaker in SPEAKERS:
+            profiles.enroll(speaker, [c for _, c in train[speaker]])
+        print(f"\nSpeaker identification (enrolled on train/, tested on valid/):")
+        correct = total = 0
+        for speaker in SPEAKERS:
+            for path, clip in valid[speaker]:
+                guess = profiles.identify(clip)
+                correct += guess == speaker
+                total += 1
+                print(f"  {path:<45} {speaker:<10} -> {guess}")
+        print(f"  accuracy {correct}/{total}")
+
+
+if __name__ == "__main__":
+    main()
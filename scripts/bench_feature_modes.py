@@ -0,0 +1,123 @@
+"""
+Benchmark: vocabulary vs hashing feature mode
+Trains both on the same stratified 80/20 split of the combined corpus and
+compares held-out accuracy, latency, artifact size and load memory.
+
+Usage (from the project root):
+    python scripts/bench_feature_modes.py [--bits 16 18 20] [--workers 4]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.metrics import precision_recall_fscore_support
+from sklearn.model_selection import train_test_split
+from sklearn.naive_bayes import MultinomialNB
+from data_loader import demo_load_all_datasets
+from hashing_features import train_hashing_pipeline
+from pipeline import ScamPipeline
+from text_processor import PreProcessText
+
+
+def train_vocabulary_pipeline(messages, labels):
+    obj = PreProcessText()
+    bow = CountVectorizer(analyzer=obj.token_words).fit(messages)
+    counts = bow.transform(messages)
+    tfidf = TfidfTransformer().fit(counts)
+    model = MultinomialNB().fit(tfidf.transform(counts), labels)
+    return ScamPipeline.from_estimators(bow, tfidf, model)
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def measure(name, train, train_messages, train_labels, test_messages, test_labels, workdir):
+    """Train, save, reload and score one configuration"""
+    start = time.perf_counter()
+    pipeline = train(train_messages, train_labels)
+    train_seconds = time.perf_counter() - start
+
+    path = os.path.join(workdir, name.replace(' ', '_').replace('^', ''))
+    pipeline.save(path)
+
+    # Memory allocated by Python while loading (arrays are memory-mapped)
+    tracemalloc.start()
+    start = time.perf_counter()
+    loaded = ScamPipeline.load(path, engine='numpy')
+    load_ms = (time.perf_counter() - start) * 1000
+    loaded.predict_proba(test_messages[:1])
+    load_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    predictions = loaded.predict(test_messages)
+    precision, recall, _, _ = precision_recall_fscore_support(
+        test_labels, predictions, pos_label=0, average='binary', zero_division=0)
+    accuracy = (predictions == test_labels).mean()
+
+    latencies = []
+    for message in test_messages[:2000]:
+        t = time.perf_counter()
+        loaded.predict_proba([message])
+        latencies.append((time.perf_counter() - t) * 1e6)
+
+    batch = ScamPipeline.load(path, engine='sparse')
+    start = time.perf_counter()
+    batch.predict_proba(test_messages)
+    batch_rate = len(test_messages) / (time.perf_counter() - start)
+
+    return {
+        'name': name, 'accuracy': accuracy, 'precision': precision, 'recall': recall,
+        'train_s': train_seconds, 'p50_us': np.percentile(latencies, 50),
+        'batch_rate': batch_rate, 'size_kb': directory_size(path) / 1024,
+        'load_ms': load_ms, 'load_mem_kb': load_memory / 1024,
+        'n_features': pipeline.n_features,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bits', type=int, nargs='+', default=[16, 18, 20],
+                        help='hash sizes to compare (log2 buckets)')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for hashing')
+    args = parser.parse_args()
+
+    data = demo_load_all_datasets(balance=False)
+    if data is None:
+        return
+    train_messages, test_messages, train_labels, test_labels = train_test_split(
+        data['message'].tolist(), data['label'].to_numpy(), test_size=0.2,
+        stratify=data['label'], random_state=42)
+
+    configs = [('vocabulary', train_vocabulary_pipeline)]
+    for bits in args.bits:
+        configs.append((f'hashing 2^{bits}',
+                        lambda m, y, bits=bits: train_hashing_pipeline(m, y, n_bits=bits,
+                                                                       workers=args.workers)))
+
+    workdir = tempfile.mkdtemp(prefix='feature_modes_')
+    try:
+        rows = [measure(name, train, train_messages, train_labels, test_messages, test_labels,
+                        workdir)
+                for name, train in configs]
+    finally:
+        shutil.rmtree(workdir)
+
+    print("\n" + "="*100)
+    print(f"FEATURE MODE COMPARISON - train {len(train_messages)}, held-out {len(test_messages)}")
+    print("="*100)
+    print(f"  {'mode':<13} {'features':>9} {'acc':>7} {'scam P':>7} {'scam R':>7} {'train s':>8} "
+          f"{'p50 µs':>7} {'batch msg/s':>12} {'size KB':>8} {'load ms':>8} {'load KB':>8}")
+    for r in rows:
+        print(f"  {r['name']:<13} {r['n_features']:>9} {r['accuracy']:7.4f} {r['precision']:7.4f} "
+              f"{r['recall']:7.4f} {r['train_s']:8.2f} {r['p50_us']:7.1f} {r['batch_rate']:12.0f} "
+              f"{r['size_kb']:8.0f} {r['load_ms']:8.1f} {r['load_mem_kb']:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
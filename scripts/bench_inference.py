@@ -0,0 +1,84 @@
+"""
+Benchmark: per-message scoring latency, sklearn vs pipeline engines
+Scores messages one at a time (like the apps do) through:
+    sklearn   vectorizer.pkl + model.pkl  (CountVectorizer.transform + MultinomialNB)
+    sparse    ScamPipeline engine='sparse'
+    numpy     ScamPipeline engine='numpy'
+and checks all three agree on predictions and probabilities.
+
+Usage (from the project root):
+    python scripts/bench_inference.py [--messages N]
+"""
+
+import argparse
+import pickle
+import time
+import numpy as np
+from data_loader import demo_load_all_datasets
+from pipeline import ScamPipeline
+
+
+def time_per_message(score, messages):
+    """Call score([message]) for every message, return (latencies in µs, stacked outputs)"""
+    latencies = np.empty(len(messages))
+    outputs = []
+    for i, message in enumerate(messages):
+        start = time.perf_counter()
+        outputs.append(score([message]))
+        latencies[i] = (time.perf_counter() - start) * 1e6
+    return latencies, np.vstack(outputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000, help='messages to score')
+    parser.add_argument('--vectorizer', default='vectorizer.pkl')
+    parser.add_argument('--model', default='model.pkl')
+    args = parser.parse_args()
+
+    data = demo_load_all_datasets(balance=False)
+    if data is None:
+        return
+    messages = data['message'].sample(n=min(args.messages, len(data)), random_state=0).tolist()
+
+    with open(args.vectorizer, 'rb') as f:
+        vectorizer = pickle.load(f)
+    with open(args.model, 'rb') as f:
+        model = pickle.load(f)
+    sparse_pipeline = ScamPipeline.from_pickles(args.vectorizer, args.model, engine='sparse')
+    numpy_pipeline = ScamPipeline.from_pickles(args.vectorizer, args.model, engine='numpy')
+
+    paths = {
+        'sklearn': lambda m: model.predict_proba(vectorizer.transform(m)),
+        'sparse': sparse_pipeline.predict_proba,
+        'numpy': numpy_pipeline.predict_proba,
+    }
+
+    # Warm up caches and lazy initialisation
+    for score in paths.values():
+        score(messages[:10])
+
+    print("\n" + "="*60)
+    print(f"PER-MESSAGE INFERENCE BENCHMARK - {len(messages)} messages")
+    print("="*60)
+
+    results = {name: time_per_message(score, messages) for name, score in paths.items()}
+
+    reference = results['sklearn'][1]
+    for name in ('sparse', 'numpy'):
+        proba = results[name][1]
+        same_labels = (reference.argmax(axis=1) == proba.argmax(axis=1)).all()
+        max_diff = np.abs(reference - proba).max()
+        if not same_labels or max_diff > 1e-9:
+            raise AssertionError(f"{name} disagrees with sklearn (max prob diff {max_diff:.2e})")
+        print(f"  ✓ {name} matches sklearn (max prob diff {max_diff:.1e})")
+
+    sklearn_p50 = np.percentile(results['sklearn'][0], 50)
+    print(f"\n  {'path':<8} {'p50 µs':>9} {'p99 µs':>9} {'mean µs':>9} {'speedup':>8}")
+    for name, (latencies, _) in results.items():
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"  {name:<8} {p50:9.1f} {p99:9.1f} {latencies.mean():9.1f} {sklearn_p50 / p50:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Benchmark suite: every stage of the scam-detection pipeline
+Runs offline against Datasets/ and the bundled WAV/mp4 samples, appends the
+numbers to a JSON history and flags regressions against a stored baseline
+
+Stages (each measured in a fresh process, so peak RSS belongs to that stage):
+    parse           DatasetLoader.load of each bundled dataset        rows/s
+    tokenize        PreProcessText.token_words per message             messages/s
+    load_pickles    unpickling vectorizer.pkl + model.pkl              loads/s
+    load_pipeline   ScamPipeline.load (memory-mapped)                  loads/s
+    transform       vectorizer.transform at several batch sizes        messages/s
+    predict         pipeline.predict_proba, both engines / batch sizes messages/s
+    retrain         CountVectorizer + TF-IDF + NB fit at corpus sizes   messages/s
+    audio           WAV/mp4 decode + VAD (mp4 skipped without ffmpeg)  audio s/s
+
+Each result records throughput, latency p50/p95/p99 per call and peak RSS.
+The message samples are drawn with a fixed seed, so runs are comparable.
+
+A result regresses when throughput drops, p95 latency grows, or peak RSS
+grows by more than the tolerance compared with the baseline entry with the
+same stage and parameters. The exit status is 1 when anything regressed.
+
+Usage (from the project root):
+    python scripts/bench_suite.py                          # full suite, compare to baseline
+    python scripts/bench_suite.py --quick                  # smaller sizes
+    python scripts/bench_suite.py --stages predict tokenize
+    python scripts/bench_suite.py --save-baseline          # make this run the reference
+"""
+
+import argparse
+import contextlib
+import datetime
+import glob
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+DEFAULT_HISTORY = 'bench_history.json'
+DEFAULT_BASELINE = 'bench_baseline.json'
+STAGES = ('parse', 'tokenize', 'load_pickles', 'load_pipeline', 'transform', 'predict',
+          'retrain', 'audio')
+CORPUS_SIZES = (1000, 5000, None)               # None = the whole corpus
+QUICK_CORPUS_SIZES = (500, 2000)
+BATCH_SIZES = (1, 32, 1024)
+BATCH_SAMPLE = 4096                             # messages pushed through each batch size
+REPEAT = 20
+
+
+def _corpus(size=None):
+    """Messages and labels of the combined corpus, a fixed-seed sample of `size`"""
+    import pandas as pd
+    from data_loader import DEFAULT_DATASETS, DatasetLoader
+    frames = [DatasetLoader.load(spec) for spec in DEFAULT_DATASETS if os.path.exists(spec['path'])]
+    data = pd.concat([f for f in frames if f is not None], ignore_index=True)
+    if size is not None and size < len(data):
+        data = data.sample(n=size, random_state=0)
+    return data['message'].astype(str).tolist(), data['label'].to_numpy()
+
+
+def _batched(function, items, batch):
+    """Call function on consecutive batches; returns per-call latencies"""
+    latencies = []
+    for i in range(0, len(items), batch):
+        start = time.perf_counter()
+        function(items[i:i + batch])
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# ----------------------------------------------------------------------
+# Stages: each returns (items processed, unit, per-call latencies in seconds)
+# ----------------------------------------------------------------------
+
+def stage_parse(params):
+    from data_loader import DatasetLoader
+    spec = params['spec']
+    start = time.perf_counter()
+    data = DatasetLoader.load(spec)
+    return len(data), 'rows', [time.perf_counter() - start]
+
+
+def stage_tokenize(params):
+    from text_processor import PreProcessText
+    messages, _ = _corpus(params['messages'])
+    token_words = PreProcessText().token_words
+    token_words(messages[0])                    # warm-up: stopword set
+    latencies = []
+    for message in messages:
+        start = time.perf_counter()
+        token_words(message)
+        latencies.append(time.perf_counter() - start)
+    return len(messages), 'messages', latencies
+
+
+def stage_load_pickles(params):
+    import pickle
+    latencies = []
+    for i in range(params['repeat'] + 1):
+        start = time.perf_counter()
+        with open('vectorizer.pkl', 'rb') as f:
+            pickle.load(f)
+        with open('model.pkl', 'rb') as f:
+            pickle.load(f)
+        if i:                                   # the first load also imports sklearn
+            latencies.append(time.perf_counter() - start)
+    return len(latencies), 'loads', latencies
+
+
+def stage_load_pipeline(params):
+    from pipeline import DEFAULT_PIPELINE_DIR, ScamPipeline
+    latencies = []
+    for i in range(params['repeat'] + 1):
+        start = time.perf_counter()
+        ScamPipeline.load(DEFAULT_PIPELINE_DIR)
+        if i:
+            latencies.append(time.perf_counter() - start)
+    return len(latencies), 'loads', latencies
+
+
+def stage_transform(params):
+    import pickle
+    with open('vectorizer.pkl', 'rb') as f:
+        vectorizer = pickle.load(f)
+    messages, _ = _corpus(params['messages'])
+    vectorizer.transform(messages[:8])
+    return len(messages), 'messages', _batched(vectorizer.transform, messages, params['batch'])
+
+
+def stage_predict(params):
+    from pipeline import load_pipeline
+    pipeline = load_pipeline(engine=params['engine'])
+    messages, _ = _corpus(params['messages'])
+    pipeline.predict_proba(messages[:8])
+    return len(messages), 'messages', _batched(pipeline.predict_proba, messages, params['batch'])
+
+
+def stage_retrain(params):
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+    from sklearn.naive_bayes import MultinomialNB
+    from text_processor import PreProcessText
+    messages, labels = _corpus(params['messages'])
+    start = time.perf_counter()
+    counts = CountVectorizer(analyzer=PreProcessText().token_words).fit_transform(messages)
+    weighted = TfidfTransformer().fit_transform(counts)
+    MultinomialNB().fit(weighted, labels)
+    return len(messages), 'messages', [time.perf_counter() - start]
+
+
+def stage_audio(params):
+    from audio_io import SAMPLE_RATE, load_audio
+    from vad import detect_speech
+    seconds = 0.0
+    latencies = []
+    for path in params['files']:
+        start = time.perf_counter()
+        samples = load_audio(path)
+        detect_speech(samples)
+        latencies.append(time.perf_counter() - start)
+        seconds += len(samples) / SAMPLE_RATE
+    return seconds, 'audio s', latencies
+
+
+def stage_plan(stages, quick=False):
+    """(stage, params) pairs to run"""
+    from data_loader import DEFAULT_DATASETS
+    sizes = QUICK_CORPUS_SIZES if quick else CORPUS_SIZES
+    batch_sample = BATCH_SAMPLE // 4 if quick else BATCH_SAMPLE
+    repeat = REPEAT // 4 if quick else REPEAT
+    plan = []
+    if 'parse' in stages:
+        plan += [('parse', {'spec': spec}) for spec in DEFAULT_DATASETS if os.path.exists(spec['path'])]
+    if 'tokenize' in stages:
+        plan += [('tokenize', {'messages': size}) for size in sizes]
+    if 'load_pickles' in stages and os.path.exists('model.pkl'):
+        plan.append(('load_pickles', {'repeat': repeat}))
+    if 'load_pipeline' in stages:
+        plan.append(('load_pipeline', {'repeat': repeat}))
+    if 'transform' in stages and os.path.exists('vectorizer.pkl'):
+        plan += [('transform', {'batch': b, 'messages': batch_sample}) for b in BATCH_SIZES]
+    if 'predict' in stages:
+        plan += [('predict', {'engine': 'numpy', 'batch': 1, 'messages': batch_sample})]
+        plan += [('predict', {'engine': 'sparse', 'batch': b, 'messages': batch_sample})
+                 for b in BATCH_SIZES]
+    if 'retrain' in stages:
+        plan += [('retrain', {'messages': size}) for size in sizes]
+    if 'audio' in stages:
+        wavs = sorted(glob.glob('Conversation/**/*.wav', recursive=True)) + ['ham1.wav']
+        plan.append(('audio', {'format': 'wav', 'files': [p for p in wavs if os.path.exists(p)]}))
+        if shutil.which('ffmpeg'):
+            plan.append(('audio', {'format': 'mp4', 'files': sorted(glob.glob('*.mp4'))}))
+    return plan
+
+
+def _run_stage(name, params):
+    """Child process: run one stage quietly and summarize it"""
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')         # e.g. sklearn pickle version notices
+        items, unit, latencies = globals()['stage_' + name](params)
+    latencies = np.asarray(latencies)
+    total = float(latencies.sum())
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024
+    return {'items': float(items), 'unit': unit, 'calls': len(latencies), 'seconds': total,
+            'throughput': items / total if total else 0.0,
+            'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+            'peak_rss_mb': float(rss_mb)}
+
+
+def result_key(stage, params):
+    """Stable identifier of a measurement (file lists and specs reduced to names)"""
+    shown = {}
+    for name, value in sorted(params.items()):
+        if name == 'spec':
+            shown['dataset'] = os.path.basename(value['path'])
+        elif name == 'files':
+            shown['files'] = len(value)
+        elif name != 'repeat':
+            shown[name] = 'all' if value is None else value
+    return ' '.join([stage] + [f'{k}={v}' for k, v in shown.items()])
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import sklearn
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'sklearn': sklearn.__version__, 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'commit': commit}
+
+
+def compare(results, baseline, tolerance=0.25, rss_tolerance=0.15):
+    """
+    Regressions of results against a baseline run
+
+    Returns:
+        {key: [reason, ...]} for every result that got worse than allowed
+    """
+    reference = {r['key']: r for r in baseline.get('results', [])}
+    regressions = {}
+    for result in results:
+        base = reference.get(result['key'])
+        if base is None:
+            continue
+        reasons = []
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            reasons.append(f"throughput {base['throughput']:.4g} -> {result['throughput']:.4g}")
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            reasons.append(f"p95 {base['p95_ms']:.3g} -> {result['p95_ms']:.3g} ms")
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + rss_tolerance):
+            reasons.append(f"peak RSS {base['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB")
+        if reasons:
+            regressions[result['key']] = reasons
+    return regressions
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--quick', action='store_true', help='smaller corpus sizes and repeats')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON file runs are appended to')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='reference run to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative throughput/latency change')
+    parser.add_argument('--rss-tolerance', type=float, default=0.15,
+                        help='allowed relative peak RSS growth')
+    args = parser.parse_args()
+
+    plan = stage_plan(args.stages, args.quick)
+    run = {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+           'quick': args.quick, 'environment': environment(), 'results': []}
+
+    print("\n" + "="*70)
+    print(f"BENCHMARK SUITE - {len(plan)} measurements"
+          f" ({run['environment']['commit'] or 'no git'}, {run['environment']['cpus']} CPUs)")
+    print("="*70)
+    print(f"  {'measurement':<46} {'throughput':>16} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>7}")
+    context = multiprocessing.get_context('spawn')
+    for stage, params in plan:
+        key = result_key(stage, params)
+        # One fresh process per measurement: clean caches and a per-stage peak RSS
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                result = pool.submit(_run_stage, stage, params).result()
+            except Exception as e:
+                print(f"  {key:<46} ✗ {str(e).splitlines()[0]}")
+                continue
+        result.update(key=key, stage=stage)
+        run['results'].append(result)
+        rate = f"{result['throughput']:,.1f} {result['unit']}/s"
+        print(f"  {key:<46} {rate:>16} {result['p50_ms']:8.3f} {result['p95_ms']:8.3f} "
+              f"{result['peak_rss_mb']:7.0f}")
+
+    history = _read_json(args.history, [])
+    history.append(run)
+    _write_json(args.history, history)
+    print(f"\n✓ Run {len(history)} appended to {args.history}")
+
+    if args.save_baseline:
+        _write_json(args.baseline, run)
+        print(f"✓ Saved as baseline {args.baseline}")
+        return
+    baseline = _read_json(args.baseline, None)
+    if baseline is None:
+        print(f"  (no baseline yet - run with --save-baseline to create {args.baseline})")
+        return
+    regressions = compare(run['results'], baseline, args.tolerance, args.rss_tolerance)
+    compared = sum(1 for r in run['results'] if r['key'] in {b['key'] for b in baseline['results']})
+    print(f"\nAgainst baseline from {baseline['timestamp']} ({compared} comparable measurements):")
+    if not regressions:
+        print("  ✓ no regressions")
+        return
+    for key, reasons in regressions.items():
+        print(f"  ✗ {key}: {'; '.join(reasons)}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark: legacy per-token stopword lookup vs TokenizerEngine
+Runs on the combined training corpus and checks the tokens are identical
+
+Usage (from the project root):
+    python scripts/bench_tokenizer.py [--limit N] [--repeat R]
+"""
+
+import argparse
+import string
+import time
+from nltk.corpus import stopwords
+from data_loader import demo_load_all_datasets
+from text_processor import TokenizerEngine
+
+
+def legacy_token_words(text=''):
+    """The original PreProcessText.token_words implementation, kept for comparison"""
+    message = []
+    for x in text:
+        if x in string.punctuation:
+            pass
+        else:
+            message.append(x)
+    message = ''.join(message)
+    words = []
+    for x in message.split():
+        if x.lower() not in stopwords.words('english'):
+            words.append(x)
+    return words
+
+
+def best_of(repeat, func, *args):
+    """Run func repeat times, return (best seconds, last result)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--limit', type=int, default=None,
+                        help='only use the first N messages (default: all)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timing repetitions for the fast path (best is reported)')
+    args = parser.parse_args()
+
+    data = demo_load_all_datasets(balance=False)
+    if data is None:
+        return
+    messages = data['message'].tolist()
+    if args.limit:
+        messages = messages[:args.limit]
+
+    engine = TokenizerEngine()
+
+    print("\n" + "="*60)
+    print(f"TOKENIZER BENCHMARK - {len(messages)} messages")
+    print("="*60)
+
+    legacy_time, legacy_tokens = best_of(1, lambda m: [legacy_token_words(t) for t in m], messages)
+    single_time, single_tokens = best_of(args.repeat, lambda m: [engine.tokenize(t) for t in m], messages)
+    batch_time, batch_tokens = best_of(args.repeat, engine.tokenize_batch, messages)
+
+    if legacy_tokens != single_tokens or legacy_tokens != batch_tokens:
+        raise AssertionError("TokenizerEngine output differs from legacy token_words")
+    print("  ✓ Token output identical to legacy token_words")
+
+    n = len(messages)
+    for name, seconds in (('legacy token_words', legacy_time),
+                          ('engine.tokenize', single_time),
+                          ('engine.tokenize_batch', batch_time)):
+        print(f"  {name:<22} {seconds:8.3f}s  {n / seconds:12.0f} msg/s  "
+              f"x{legacy_time / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
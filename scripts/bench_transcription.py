@@ -0,0 +1,141 @@
+"""
+Benchmark: transcription backends
+Real-time factor (processing time / audio duration, lower is better) per file
+and throughput (audio seconds transcribed per wall-clock second) with
+several requests in flight.
+
+Default inputs are the Conversation/ dataset WAVs, ham1.wav and the bundled
+mp4 samples (mp4 needs ffmpeg; files that cannot be decoded are skipped).
+
+Usage (from the project root):
+    python scripts/bench_transcription.py --backends whisper mock
+    python scripts/bench_transcription.py --backends whisper --concurrency 2 --stream
+    python scripts/bench_transcription.py --files scam2.mp4 final.mp4 --backends assemblyai
+"""
+
+import argparse
+import asyncio
+import glob
+import time
+import numpy as np
+from audio_io import SAMPLE_RATE, load_audio
+from transcription_backends import BACKENDS, get_backend
+
+
+def default_files():
+    files = sorted(glob.glob('Conversation/**/*.wav', recursive=True))
+    files += ['ham1.wav'] + sorted(glob.glob('*.mp4'))
+    return files
+
+
+def audio_durations(files):
+    """{path: seconds} for the files that can be decoded"""
+    durations = {}
+    for path in files:
+        try:
+            durations[path] = len(load_audio(path)) / SAMPLE_RATE
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"  ! skipping {path}: {str(e).splitlines()[0]}")
+    return durations
+
+
+async def _throughput(backend, files, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(path):
+        async with slots:
+            await backend.transcribe_async(path)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(path) for path in files))
+    return time.perf_counter() - start
+
+
+async def _stream_once(backend, samples, chunk_frames=3200):
+    """Push a file through stream() as fast as possible; seconds until the last final"""
+    pcm = (np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes()
+    chunk_bytes = chunk_frames * 2
+
+    async def chunks():
+        for offset in range(0, len(pcm), chunk_bytes):
+            yield pcm[offset:offset + chunk_bytes]
+
+    start = time.perf_counter()
+    finals = 0
+    async for kind, _ in backend.stream(chunks()):
+        finals += kind == 'final'
+    return time.perf_counter() - start, finals
+
+
+def bench_backend(name, durations, concurrency, stream):
+    backend = get_backend(name)
+    files = list(durations)
+
+    # First call loads models / opens connections; reported separately
+    start = time.perf_counter()
+    backend.transcribe(files[0])
+    warmup = time.perf_counter() - start
+
+    rtfs = []
+    words = 0
+    for path in files:
+        start = time.perf_counter()
+        result = backend.transcribe(path)
+        rtfs.append((time.perf_counter() - start) / durations[path])
+        words += len(result['text'].split())
+
+    total_audio = sum(durations.values())
+    wall = asyncio.run(_throughput(backend, files, concurrency))
+
+    row = {
+        'backend': backend.backend_id, 'files': len(files), 'audio_s': total_audio,
+        'warmup_s': warmup, 'rtf_mean': float(np.mean(rtfs)),
+        'rtf_p50': float(np.percentile(rtfs, 50)), 'rtf_max': float(np.max(rtfs)),
+        'throughput': total_audio / wall, 'words': words, 'stream_rtf': None,
+    }
+    if stream:
+        elapsed = 0.0
+        for path in files:
+            seconds, _ = asyncio.run(_stream_once(backend, load_audio(path)))
+            elapsed += seconds
+        row['stream_rtf'] = elapsed / total_audio
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=['whisper'], choices=sorted(BACKENDS))
+    parser.add_argument('--files', nargs='+', default=None, help='audio/video files')
+    parser.add_argument('--concurrency', type=int, default=2,
+                        help='requests in flight for the throughput run')
+    parser.add_argument('--stream', action='store_true', help='also time the streaming interface')
+    args = parser.parse_args()
+
+    durations = audio_durations(args.files or default_files())
+    if not durations:
+        print("\n✗ No decodable audio files")
+        return
+    print(f"\n{len(durations)} files, {sum(durations.values()):.0f}s of audio")
+
+    rows = []
+    for name in args.backends:
+        print(f"\n=== {name} ===")
+        try:
+            rows.append(bench_backend(name, durations, args.concurrency, args.stream))
+        except ImportError as e:
+            print(f"  ! {name} unavailable: {e}")
+
+    print("\n" + "="*96)
+    print(f"TRANSCRIPTION BACKENDS - concurrency {args.concurrency}")
+    print("="*96)
+    print(f"  {'backend':<22} {'files':>5} {'audio s':>8} {'warmup s':>9} {'RTF mean':>9} "
+          f"{'RTF p50':>8} {'RTF max':>8} {'x realtime':>11} {'stream RTF':>11}")
+    for r in rows:
+        stream_rtf = f"{r['stream_rtf']:11.3f}" if r['stream_rtf'] is not None else f"{'-':>11}"
+        print(f"  {r['backend']:<22} {r['files']:>5} {r['audio_s']:8.0f} {r['warmup_s']:9.2f} "
+              f"{r['rtf_mean']:9.3f} {r['rtf_p50']:8.3f} {r['rtf_max']:8.3f} "
+              f"{r['throughput']:11.1f} {stream_rtf}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Probability calibration and operating-threshold tuning
+Naive Bayes posteriors are badly over-confident (most messages score ~0 or ~1),
+so a raw 0.5 cut-off says little about the real false-positive rate
+
+    fit_platt(log_odds, is_scam)        Platt scaling: P(scam) = sigmoid(a * log_odds + b),
+                                        fit by Newton's method on held-out messages
+    threshold_sweep(p, is_scam)         TP/FP/precision/recall/FPR/cost at every distinct
+                                        threshold - one sort and cumulative sums
+    choose_threshold(curve, ...)        lowest cost, or best recall at a precision floor
+    reliability(p, is_scam)             Brier score, expected calibration error, bins
+
+The calibration and the operating threshold are stored in the pipeline
+manifest (see pipeline.py); every entry point then reports calibrated
+probabilities and labels messages at that threshold.
+
+Calibrate on messages the model was not trained on: retrain_model.py trains on
+DatasetCombiner.split(...)'s train part and calibrates on the held-out part.
+Running `calibrate` on a pipeline trained on everything still works but is
+optimistic (a warning is printed).
+
+Usage (from the project root):
+    python scripts/calibration.py calibrate                     # fit on the 20% held-out split
+    python scripts/calibration.py sweep --fp-cost 1 --fn-cost 5
+    python scripts/calibration.py sweep --min-precision 0.95 --save
+    python scripts/calibration.py sweep --output threshold_curve.csv
+"""
+
+import argparse
+import csv
+import numpy as np
+from data_loader import DatasetCombiner
+from pipeline import DEFAULT_PIPELINE_DIR, SCAM_LABEL, load_pipeline
+
+DEFAULT_HOLDOUT = 0.2
+REPORT_THRESHOLDS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95)
+
+
+def _sigmoid(z):
+    return np.exp(-np.logaddexp(0, -z))
+
+
+def fit_platt(log_odds, is_scam, max_iter=100, tol=1e-10):
+    """
+    Fit P(scam) = sigmoid(a * log_odds + b)
+
+    Uses Platt's smoothed targets (N+ + 1) / (N+ + 2) and 1 / (N- + 2), so a
+    perfectly separated held-out set does not push a to infinity.
+
+    Returns:
+        (a, b)
+    """
+    s = np.asarray(log_odds, dtype=np.float64)
+    y = np.asarray(is_scam, dtype=bool)
+    n_pos = int(y.sum())
+    n_neg = len(y) - n_pos
+    target = np.where(y, (n_pos + 1) / (n_pos + 2), 1 / (n_neg + 2))
+
+    def loss(a, b):
+        z = a * s + b
+        return float(np.sum(np.logaddexp(0, z) - target * z))
+
+    a, b = 0.0, float(np.log((n_pos + 1) / (n_neg + 1)))
+    current = loss(a, b)
+    for _ in range(max_iter):
+        p = _sigmoid(a * s + b)
+        residual = p - target
+        gradient = np.array([residual @ s, residual.sum()])
+        w = p * (1 - p)
+        hessian = np.array([[w @ (s * s), w @ s], [w @ s, w.sum()]]) + 1e-12 * np.eye(2)
+        step = np.linalg.solve(hessian, gradient)
+        size = 1.0
+        while size > 1e-8:                      # backtracking line search
+            candidate = loss(a - size * step[0], b - size * step[1])
+            if candidate <= current:
+                break
+            size /= 2
+        else:
+            break
+        a, b = a - size * step[0], b - size * step[1]
+        improvement = current - candidate
+        current = candidate
+        if improvement < tol * max(1.0, abs(current)):
+            break
+    return float(a), float(b)
+
+
+def threshold_sweep(probabilities, is_scam, fp_cost=1.0, fn_cost=1.0):
+    """
+    Confusion counts and derived metrics at every distinct threshold
+
+    A message is labelled scam when its probability >= threshold. The first
+    row (threshold inf) labels nothing as scam.
+
+    Returns:
+        dict of equal-length arrays: threshold, tp, fp, fn, tn, precision,
+        recall, fpr, cost
+    """
+    p = np.asarray(probabilities, dtype=np.float64)
+    y = np.asarray(is_scam, dtype=bool)
+    order = np.argsort(-p, kind='stable')
+    p_sorted = p[order]
+    y_sorted = y[order]
+    # Last position of each run of equal scores: everything up to it is >= that score
+    last = np.flatnonzero(np.r_[p_sorted[1:] != p_sorted[:-1], True])
+    tp = np.r_[0, np.cumsum(y_sorted)[last]]
+    fp = np.r_[0, np.cumsum(~y_sorted)[last]]
+    n_pos = int(y.sum())
+    n_neg = len(y) - n_pos
+    fn = n_pos - tp
+    tn = n_neg - fp
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall = tp / n_pos if n_pos else np.zeros(len(tp))
+        fpr = fp / n_neg if n_neg else np.zeros(len(fp))
+    return {
+        'threshold': np.r_[np.inf, p_sorted[last]],
+        'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'precision': precision, 'recall': recall, 'fpr': fpr,
+        'cost': fp_cost * fp + fn_cost * fn,
+    }
+
+
+def choose_threshold(curve, min_precision=None, min_recall=None):
+    """
+    Index of the operating point in a threshold_sweep curve
+
+    min_precision: best recall among thresholds with at least this precision
+    min_recall:    fewest false positives among thresholds with at least this recall
+    otherwise:     lowest cost (ties: the highest threshold)
+    """
+    if min_precision is not None:
+        candidates = np.flatnonzero(curve['precision'] >= min_precision)
+        key = curve['recall']
+    elif min_recall is not None:
+        candidates = np.flatnonzero(curve['recall'] >= min_recall)
+        key = -curve['fp']
+    else:
+        candidates = np.arange(len(curve['cost']))
+        key = -curve['cost']
+    if len(candidates) == 0:
+        raise ValueError("No threshold meets the requested precision/recall")
+    # argmax returns the first (highest-threshold) row among ties
+    return int(candidates[np.argmax(key[candidates])])
+
+
+def reliability(probabilities, is_scam, n_bins=10):
+    """
+    Brier score, expected calibration error and per-bin (mean p, scam rate, count)
+    """
+    p = np.asarray(probabilities, dtype=np.float64)
+    y = np.asarray(is_scam, dtype=np.float64)
+    bins = np.minimum((p * n_bins).astype(int), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    mean_p = np.bincount(bins, weights=p, minlength=n_bins) / np.maximum(counts, 1)
+    rate = np.bincount(bins, weights=y, minlength=n_bins) / np.maximum(counts, 1)
+    return {
+        'brier': float(np.mean((p - y) ** 2)),
+        'ece': float(np.sum(counts * np.abs(mean_p - rate)) / max(len(p), 1)),
+        'bins': list(zip(mean_p.tolist(), rate.tolist(), counts.tolist())),
+    }
+
+
+def calibrate_pipeline(pipeline, held_out):
+    """
+    Fit Platt scaling on a held-out DataFrame ('message', 'label') and set it
+    on the pipeline
+
+    Returns:
+        (before, after) reliability() of the held-out messages
+    """
+    messages = held_out['message'].astype(str).tolist()
+    is_scam = held_out['label'].to_numpy() == SCAM_LABEL
+    log_odds = pipeline.scam_log_odds(messages)
+    before = reliability(_sigmoid(log_odds), is_scam)
+    a, b = fit_platt(log_odds, is_scam)
+    pipeline.calibration = {'method': 'platt', 'a': a, 'b': b, 'n_samples': len(messages),
+                            'n_scam': int(is_scam.sum())}
+    after = reliability(_sigmoid(a * log_odds + b), is_scam)
+    return before, after
+
+
+def _load_corpus(dedup=False):
+    from corpus_cache import CorpusCache
+    return CorpusCache().load_all(balance=False, dedup=dedup)
+
+
+def _print_row(curve, i, marker=''):
+    threshold = curve['threshold'][i]
+    shown = 'inf' if np.isinf(threshold) else f'{threshold:.4f}'
+    print(f"  {shown:>9} {curve['precision'][i]:10.4f} {curve['recall'][i]:8.4f} "
+          f"{curve['fpr'][i]:8.4f} {int(curve['fp'][i]):>7} {int(curve['fn'][i]):>7} "
+          f"{curve['cost'][i]:>9.0f}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate scam probabilities and tune the threshold")
+    parser.add_argument('command', choices=['calibrate', 'sweep'])
+    parser.add_argument('--pipeline', default=DEFAULT_PIPELINE_DIR, help='pipeline directory')
+    parser.add_argument('--holdout', type=float, default=DEFAULT_HOLDOUT,
+                        help='held-out fraction used for calibration')
+    parser.add_argument('--fp-cost', type=float, default=1.0, help='cost of a false alarm')
+    parser.add_argument('--fn-cost', type=float, default=1.0, help='cost of a missed scam')
+    parser.add_argument('--min-precision', type=float, default=None,
+                        help='pick the best recall with at least this precision')
+    parser.add_argument('--min-recall', type=float, default=None,
+                        help='pick the fewest false alarms with at least this recall')
+    parser.add_argument('--save', action='store_true',
+                        help='store the chosen threshold in the pipeline manifest')
+    parser.add_argument('--output', default=None, help='write the full curve as CSV')
+    args = parser.parse_args()
+
+    pipeline = load_pipeline(args.pipeline, engine='sparse')
+    # Same rows as the split the pipeline was trained on (deduplicated by retrain_model.py)
+    corpus = _load_corpus(dedup=pipeline.metadata.get('holdout', {}).get('dedup', False))
+    if corpus is None:
+        return
+
+    if args.command == 'calibrate':
+        if 'holdout' not in pipeline.metadata:
+            print("\n  ! This pipeline was trained on the full corpus - the held-out rows were "
+                  "seen in training,\n    so the calibration will be optimistic. Retrain with "
+                  "retrain_model.py for an honest one.")
+        _, held_out = DatasetCombiner.split(corpus, holdout=args.holdout)
+        before, after = calibrate_pipeline(pipeline, held_out)
+        pipeline.save(args.pipeline)
+        print("\n" + "="*70)
+        print("CALIBRATION (held-out split)")
+        print("="*70)
+        print(f"  Platt a={pipeline.calibration['a']:.4f}  b={pipeline.calibration['b']:.4f}")
+        print(f"  Brier  {before['brier']:.4f} -> {after['brier']:.4f}")
+        print(f"  ECE    {before['ece']:.4f} -> {after['ece']:.4f}")
+        print(f"✓ Saved to {args.pipeline}/manifest.json")
+        return
+
+    # sweep: the whole corpus scored in one batch, every threshold from one sort
+    probabilities = pipeline.scam_probability(corpus['message'].astype(str).tolist())
+    is_scam = corpus['label'].to_numpy() == SCAM_LABEL
+    curve = threshold_sweep(probabilities, is_scam, args.fp_cost, args.fn_cost)
+    chosen = choose_threshold(curve, args.min_precision, args.min_recall)
+    current = int(np.flatnonzero(curve['threshold'] >= pipeline.threshold)[-1])
+
+    print("\n" + "="*70)
+    print(f"THRESHOLD SWEEP - {len(corpus)} messages, "
+          f"{'calibrated' if pipeline.calibration else 'uncalibrated'} probabilities")
+    print("="*70)
+    print(f"  {'threshold':>9} {'precision':>10} {'recall':>8} {'FPR':>8} {'FP':>7} {'FN':>7} {'cost':>9}")
+    shown = sorted({int(np.flatnonzero(curve['threshold'] >= t)[-1]) for t in REPORT_THRESHOLDS})
+    for i in shown:
+        _print_row(curve, i)
+    print()
+    _print_row(curve, current, '  <- current operating threshold')
+    _print_row(curve, chosen, '  <- chosen')
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(curve))
+            writer.writerows(zip(*curve.values()))
+        print(f"\n✓ Curve written to {args.output} ({len(curve['threshold'])} thresholds)")
+    if args.save:
+        if np.isinf(curve['threshold'][chosen]):
+            print("\n✗ Chosen threshold labels nothing as scam - not saved")
+            return
+        pipeline.threshold = float(curve['threshold'][chosen])
+        pipeline.save(args.pipeline)
+        print(f"\n✓ Operating threshold {pipeline.threshold:.4f} saved to {args.pipeline}/manifest.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+On-disk cache of normalized, tokenized datasets
+Repeated training runs skip CSV parsing, label normalization and tokenization
+
+Each dataset is stored as one .npz file (no pickles) holding the labels,
+the raw messages and the token ids of every message. The file name contains
+a key built from:
+    - SHA-256 of the source file bytes
+    - the loader options (columns, header, format)
+    - TOKENIZER_VERSION and the current label mappings
+so editing a dataset, its spec, the label mappings or the tokenizer
+invalidates the entry automatically. Stale entries for the same source are
+deleted when a new one is written.
+
+Usage (from the project root):
+    python scripts/corpus_cache.py            # warm the cache for DEFAULT_DATASETS
+    python scripts/corpus_cache.py --clear
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from data_loader import DEFAULT_DATASETS, DatasetCombiner, DatasetLoader, LabelNormalizer
+from text_processor import TOKENIZER_VERSION, get_tokenizer
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = '.corpus_cache'
+
+
+def file_sha256(path, block_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _pack_strings(strings):
+    """List of str -> (utf-8 blob as uint8, int64 offsets)"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded)),
+              out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(blob, offsets):
+    data = blob.tobytes()
+    return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+class CorpusCache(object):
+    """
+    Loads datasets through DatasetLoader.load, caching the tokenized result
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, spec):
+        """Cache key for a dataset spec (changes when the file or any setting changes)"""
+        settings = {name: value for name, value in spec.items() if name != 'path'}
+        mappings = sorted((repr(k), v) for k, v in LabelNormalizer.LABEL_MAPPINGS.items())
+        digest = hashlib.sha256()
+        digest.update(file_sha256(spec['path']).encode())
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        digest.update(json.dumps(mappings).encode())
+        digest.update(f'tokenizer={TOKENIZER_VERSION};format={CACHE_FORMAT_VERSION}'.encode())
+        return digest.hexdigest()[:24]
+
+    def _entry_prefix(self, spec):
+        name = os.path.basename(spec['path']).replace('.', '_')
+        path_hash = hashlib.sha256(os.path.abspath(spec['path']).encode()).hexdigest()[:8]
+        return os.path.join(self.cache_dir, f'{name}-{path_hash}')
+
+    def load(self, spec):
+        """
+        Load one dataset, from the cache when possible
+
+        Returns:
+            DataFrame with 'label', 'message' and 'tokens' (list of str) columns,
+            or None if the dataset could not be loaded
+        """
+        prefix = self._entry_prefix(spec)
+        entry = f'{prefix}-{self.key(spec)}.npz'
+        if os.path.exists(entry):
+            self.hits += 1
+            print(f"\nLoading {spec['path']} from cache...")
+            df = self._read(entry)
+            print(f"  ✓ Loaded {len(df)} records")
+            return df
+
+        self.misses += 1
+        df = DatasetLoader.load(spec)
+        if df is None:
+            return None
+        df = df.reset_index(drop=True)
+        df['message'] = df['message'].astype(str)
+        df['tokens'] = get_tokenizer().tokenize_batch(df['message'])
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for stale in glob.glob(f'{glob.escape(prefix)}-*.npz'):
+            os.remove(stale)
+        self._write(entry, df)
+        print(f"  ✓ Cached as {entry}")
+        return df
+
+    def load_all(self, specs=None, balance=False, dedup=False):
+        """Load and combine datasets (default: DEFAULT_DATASETS that exist)"""
+        frames = []
+        for spec in specs or DEFAULT_DATASETS:
+            if os.path.exists(spec['path']):
+                df = self.load(spec)
+                if df is not None:
+                    frames.append(df)
+        if not frames:
+            print("\n✗ No datasets found!")
+            return None
+        return DatasetCombiner.combine(*frames, balance=balance, dedup=dedup)
+
+    def clear(self):
+        """Delete every cache entry"""
+        removed = 0
+        for entry in glob.glob(os.path.join(glob.escape(self.cache_dir), '*.npz')):
+            os.remove(entry)
+            removed += 1
+        return removed
+
+    @staticmethod
+    def _write(entry, df):
+        terms = {}
+        token_ids = []
+        token_offsets = [0]
+        for tokens in df['tokens']:
+            for token in tokens:
+                token_ids.append(terms.setdefault(token, len(terms)))
+            token_offsets.append(len(token_ids))
+        message_blob, message_offsets = _pack_strings(df['message'].tolist())
+        # Tokens never contain whitespace, so newline-joined terms are unambiguous
+        terms_blob = np.frombuffer('\n'.join(terms).encode('utf-8'), dtype=np.uint8)
+
+        tmp_entry = entry + '.tmp.npz'
+        np.savez(tmp_entry,
+                 labels=df['label'].to_numpy(dtype=np.int8),
+                 message_blob=message_blob, message_offsets=message_offsets,
+                 terms_blob=terms_blob,
+                 token_ids=np.asarray(token_ids, dtype=np.int32),
+                 token_offsets=np.asarray(token_offsets, dtype=np.int64))
+        os.replace(tmp_entry, entry)
+
+    @staticmethod
+    def _read(entry):
+        with np.load(entry) as data:
+            labels = data['labels'].astype(np.int64)
+            messages = _unpack_strings(data['message_blob'], data['message_offsets'])
+            terms_text = data['terms_blob'].tobytes().decode('utf-8')
+            terms = terms_text.split('\n') if terms_text else []
+            token_ids = data['token_ids'].tolist()
+            offsets = data['token_offsets'].tolist()
+        tokens = [[terms[i] for i in token_ids[offsets[d]:offsets[d + 1]]]
+                  for d in range(len(offsets) - 1)]
+        return pd.DataFrame({'label': labels, 'message': messages, 'tokens': tokens})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm or clear the tokenized corpus cache")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--clear', action='store_true', help='delete all cache entries')
+    args = parser.parse_args()
+
+    cache = CorpusCache(args.cache_dir)
+    if args.clear:
+        print(f"Removed {cache.clear()} cache entries from {args.cache_dir}/")
+        return
+
+    start = time.perf_counter()
+    combined = cache.load_all()
+    if combined is not None:
+        print(f"\n✓ {len(combined)} records in {time.perf_counter() - start:.2f}s "
+              f"(cache hits: {cache.hits}, misses: {cache.misses})")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,23 @@ Unified data loader with automatic label normalization
 Handles different label formats across datasets
 """
 
+import numpy as np
 import pandas as pd
 import os
 
+# Datasets used for training. Each entry is passed to DatasetLoader.load
+DEFAULT_DATASETS = [
+    # MainCall.csv (fraud/normal, NO HEADERS)
+    {'path': 'Datasets/MainCall.csv', 'format': 'csv', 'has_header': False,
+     'label_col_index': 0, 'text_col_index': 1},
+    # Bigmaincall.csv (spam/ham, NO HEADERS)
+    {'path': 'Datasets/Bigmaincall.csv', 'format': 'csv', 'has_header': False,
+     'label_col_index': 0, 'text_col_index': 1},
+    # SMSSpamCollection.txt (spam/ham in TSV format)
+    {'path': 'Datasets/Default/SMSSpamCollection.txt', 'format': 'tsv',
+     'label_col_index': 0, 'text_col_index': 1},
+]
+
 class LabelNormalizer:
     """
     Normalizes labels to standard format: 0 (scam/spam) and 1 (legitimate/ham)
@@ -41,11 +55,8 @@ class LabelNormalizer:
     }
     
     @staticmethod
-    def normalize(label):
-        """Convert any label format to 0 or 1"""
-        if pd.isna(label):
-            return None
-        
+    def _lookup(label):
+        """Mapped value for a non-null label, or None if it is unknown"""
         # Convert to string and lowercase for matching
         label_str = str(label).strip().lower()
         
@@ -56,7 +67,59 @@ class LabelNormalizer:
         if label in LabelNormalizer.LABEL_MAPPINGS:
             return LabelNormalizer.LABEL_MAPPINGS[label]
         
-        raise ValueError(f"Unknown label format: {label}. Please add mapping in LabelNormalizer.LABEL_MAPPINGS")
+        return None
+    
+    @staticmethod
+    def normalize(label):
+        """Convert any label format to 0 or 1"""
+        if pd.isna(label):
+            return None
+        
+        normalized = LabelNormalizer._lookup(label)
+        if normalized is None:
+            raise ValueError(f"Unknown label format: {label}. Please add mapping in LabelNormalizer.LABEL_MAPPINGS")
+        return normalized
+    
+    @staticmethod
+    def normalize_series(labels):
+        """
+        Vectorized normalize() for a whole column
+        
+        Only the distinct values are looked up in Python; rows are mapped
+        through their factorized codes. Null labels become NaN.
+        
+        Args:
+            labels: pandas Series (or array-like) of raw labels
+        
+        Returns:
+            Series of 0/1 (int64, or float64 with NaN if any label is null)
+        
+        Raises:
+            ValueError listing every unknown label with its row count
+        """
+        labels = pd.Series(labels)
+        codes, uniques = pd.factorize(labels, use_na_sentinel=True)
+        
+        # Extra trailing slot so the null sentinel (-1) maps to NaN
+        mapped = np.full(len(uniques) + 1, np.nan)
+        unknown = []
+        for i, label in enumerate(uniques):
+            normalized = LabelNormalizer._lookup(label)
+            if normalized is None:
+                unknown.append(i)
+            else:
+                mapped[i] = normalized
+        
+        if unknown:
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            details = ', '.join(f"{uniques[i]!r} ({counts[i]} rows)" for i in unknown)
+            raise ValueError(f"Unknown label formats: {details}. "
+                             f"Please add mapping in LabelNormalizer.LABEL_MAPPINGS")
+        
+        result = mapped[codes]
+        if (codes >= 0).all():
+            result = result.astype(np.int64)
+        return pd.Series(result, index=labels.index, name=labels.name)
     
     @staticmethod
     def add_custom_mapping(label_dict):
@@ -69,6 +132,29 @@ class DatasetLoader:
     Loads datasets with automatic label normalization
     """
     
+    @staticmethod
+    def load(spec):
+        """
+        Load a dataset described by a spec dict (see DEFAULT_DATASETS)
+        
+        Args:
+            spec: dict with 'path', 'format' ('csv' or 'tsv') and the
+                  column options of load_csv / load_tsv
+        
+        Returns:
+            DataFrame with 'message' and 'label' columns (normalized)
+        """
+        if spec.get('format', 'csv') == 'tsv':
+            return DatasetLoader.load_tsv(spec['path'],
+                                          label_column_index=spec.get('label_col_index', 0),
+                                          text_column_index=spec.get('text_col_index', 1))
+        return DatasetLoader.load_csv(spec['path'],
+                                      text_column=spec.get('text_column'),
+                                      label_column=spec.get('label_column'),
+                                      has_header=spec.get('has_header', True),
+                                      label_col_index=spec.get('label_col_index', 0),
+                                      text_col_index=spec.get('text_col_index', 1))
+    
     @staticmethod
     def load_csv(file_path, text_column=None, label_column=None, has_header=True, 
                  label_col_index=0, text_col_index=1):
@@ -107,7 +193,7 @@ class DatasetLoader:
             print(f"  Records before normalization: {len(df)}")
             
             # Normalize labels
-            df['label'] = df['label'].apply(LabelNormalizer.normalize)
+            df['label'] = LabelNormalizer.normalize_series(df['label'])
             
             # Check label distribution
             counts = df['label'].value_counts()
@@ -136,13 +222,15 @@ class DatasetLoader:
         """
         print(f"\nLoading {file_path}...")
         try:
-            df = pd.read_csv(file_path, sep='\t', header=None)
+            # Only the two columns are parsed, so stray trailing tabs on a line are ignored
+            df = pd.read_csv(file_path, sep='\t', header=None,
+                             usecols=[label_column_index, text_column_index])
             print(f"  Columns found: {len(df.columns)}")
             
             # Select relevant columns
             df = pd.DataFrame({
-                'label': df.iloc[:, label_column_index],
-                'message': df.iloc[:, text_column_index]
+                'label': df[label_column_index],
+                'message': df[text_column_index]
             })
             
             # Remove null values
@@ -150,7 +238,7 @@ class DatasetLoader:
             print(f"  Records before normalization: {len(df)}")
             
             # Normalize labels
-            df['label'] = df['label'].apply(LabelNormalizer.normalize)
+            df['label'] = LabelNormalizer.normalize_series(df['label'])
             
             # Check label distribution
             counts = df['label'].value_counts()
@@ -171,13 +259,16 @@ class DatasetCombiner:
     """
     
     @staticmethod
-    def combine(*dataframes, balance=False):
+    def combine(*dataframes, balance=False, dedup=False):
         """
         Combine multiple dataframes
         
         Args:
             *dataframes: DataFrames to combine
             balance: if True, balance classes by undersampling majority class
+            dedup: if True, keep one row per cluster of exact / near-duplicate
+                   messages across all dataframes (see dedup.py); clusters
+                   with mixed labels keep their majority label
         
         Returns:
             Combined DataFrame
@@ -187,6 +278,12 @@ class DatasetCombiner:
         print(f"\n=== Combined Dataset ===")
         print(f"Total records: {len(combined)}")
         
+        if dedup:
+            from dedup import deduplicate, print_report
+            sources = np.repeat(np.arange(len(dataframes)), [len(df) for df in dataframes])
+            combined, report = deduplicate(combined, sources=sources)
+            print_report(report)
+        
         counts = combined['label'].value_counts()
         print(f"  - Scam (0): {counts.get(0, 0)}")
         print(f"  - Legitimate (1): {counts.get(1, 0)}")
@@ -207,11 +304,159 @@ class DatasetCombiner:
             print(f"  - Legitimate (1): {min_size}")
         
         return combined
+    
+    @staticmethod
+    def split(combined, holdout=0.2, random_state=42):
+        """
+        Stratified train / held-out split of a combined dataset
+        
+        The held-out part is never trained on, so probabilities measured on it
+        are honest (used to fit calibration, see calibration.py).
+        
+        Args:
+            combined: DataFrame from combine()
+            holdout: fraction of each class to hold out
+            random_state: seed, so the same rows are held out every run
+        
+        Returns:
+            (train DataFrame, held-out DataFrame)
+        """
+        held_out = combined.groupby('label', group_keys=False).sample(frac=holdout,
+                                                                      random_state=random_state)
+        train = combined.drop(held_out.index)
+        
+        print(f"\n=== Train / Held-out Split ({holdout:.0%} held out) ===")
+        for name, part in (('Train', train), ('Held-out', held_out)):
+            counts = part['label'].value_counts()
+            print(f"  - {name}: {len(part)} (scam {counts.get(0, 0)}, legitimate {counts.get(1, 0)})")
+        
+        return train.reset_index(drop=True), held_out.reset_index(drop=True)
+
+
+class DatasetStream:
+    """
+    Streams normalized (label, message) chunks from any number of sources
+    
+    Nothing is held in memory except the current chunk, the hashes of seen
+    messages (dedupe=True) and one reservoir per majority class (balance=True,
+    at most minority-class-size rows). Sources use the same spec dicts as
+    DEFAULT_DATASETS, so each source has its own column mapping.
+    """
+    
+    @staticmethod
+    def iter_source(spec, chunksize=50000):
+        """
+        Yield normalized chunks of one source
+        
+        Args:
+            spec: dataset spec dict (see DEFAULT_DATASETS)
+            chunksize: rows per chunk
+        
+        Yields:
+            DataFrames with 'label' and 'message' columns
+        """
+        if spec.get('format', 'csv') == 'tsv':
+            columns = [spec.get('label_col_index', 0), spec.get('text_col_index', 1)]
+            reader = pd.read_csv(spec['path'], sep='\t', header=None, usecols=columns,
+                                 chunksize=chunksize)
+        elif spec.get('has_header', True):
+            columns = [spec['label_column'], spec['text_column']]
+            reader = pd.read_csv(spec['path'], usecols=columns, chunksize=chunksize)
+        else:
+            columns = [spec.get('label_col_index', 0), spec.get('text_col_index', 1)]
+            reader = pd.read_csv(spec['path'], header=None, usecols=columns, chunksize=chunksize)
+        
+        for chunk in reader:
+            chunk = pd.DataFrame({'label': chunk[columns[0]], 'message': chunk[columns[1]]}).dropna()
+            chunk['label'] = LabelNormalizer.normalize_series(chunk['label'])
+            chunk['message'] = chunk['message'].astype(str)
+            yield chunk.reset_index(drop=True)
+    
+    @staticmethod
+    def _filtered(specs, chunksize, dedupe):
+        """All sources in order, with duplicate messages removed if dedupe"""
+        seen = set()
+        for spec in specs:
+            for chunk in DatasetStream.iter_source(spec, chunksize):
+                if dedupe:
+                    hashes = pd.util.hash_pandas_object(chunk['message'], index=False).to_numpy()
+                    keep = ~pd.Series(hashes).duplicated().to_numpy()
+                    keep &= np.fromiter((h not in seen for h in hashes.tolist()),
+                                        dtype=bool, count=len(hashes))
+                    seen.update(hashes[keep].tolist())
+                    chunk = chunk[keep].reset_index(drop=True)
+                if len(chunk):
+                    yield chunk
+    
+    @staticmethod
+    def stream(specs=None, chunksize=50000, dedupe=False, balance=False, random_state=42):
+        """
+        Yield (label, message) chunks from several sources
+        
+        Args:
+            specs: list of dataset spec dicts (default: DEFAULT_DATASETS that exist)
+            chunksize: rows read per chunk from each source
+            dedupe: drop messages whose exact text was already seen
+            balance: undersample every class to the size of the smallest one.
+                     Needs one extra pass to count labels; majority classes
+                     are sampled uniformly with reservoir sampling
+            random_state: seed for the reservoir sampling
+        
+        Yields:
+            DataFrames with 'label' and 'message' columns
+        """
+        if specs is None:
+            specs = [spec for spec in DEFAULT_DATASETS if os.path.exists(spec['path'])]
+        
+        if not balance:
+            yield from DatasetStream._filtered(specs, chunksize, dedupe)
+            return
+        
+        # Pass 1: class sizes after filtering
+        class_counts = {}
+        for chunk in DatasetStream._filtered(specs, chunksize, dedupe):
+            for label, count in chunk['label'].value_counts().items():
+                class_counts[label] = class_counts.get(label, 0) + int(count)
+        if not class_counts:
+            return
+        target = min(class_counts.values())
+        print(f"\nStreaming balance: {class_counts} -> {target} per class")
+        
+        # Pass 2: minority rows pass straight through, majority rows go to reservoirs
+        rng = np.random.default_rng(random_state)
+        reservoirs = {label: [None] * target for label, n in class_counts.items() if n > target}
+        seen_per_class = {label: 0 for label in reservoirs}
+        for chunk in DatasetStream._filtered(specs, chunksize, dedupe):
+            passthrough = ~chunk['label'].isin(list(reservoirs)).to_numpy()
+            if passthrough.any():
+                yield chunk[passthrough].reset_index(drop=True)
+            for label, reservoir in reservoirs.items():
+                messages = chunk.loc[chunk['label'] == label, 'message'].tolist()
+                if not messages:
+                    continue
+                # Algorithm R: item number t (0-based) replaces slot j ~ U[0, t] if j < target
+                start = seen_per_class[label]
+                positions = np.arange(start, start + len(messages))
+                slots = np.where(positions < target, positions,
+                                 rng.integers(0, positions + 1))
+                for message, slot in zip(messages, slots.tolist()):
+                    if slot < target:
+                        reservoir[slot] = message
+                seen_per_class[label] = start + len(messages)
+        
+        for label, reservoir in reservoirs.items():
+            for i in range(0, target, chunksize):
+                messages = reservoir[i:i + chunksize]
+                yield pd.DataFrame({'label': np.full(len(messages), label, dtype=np.int64),
+                                    'message': messages})
 
 
-def demo_load_all_datasets(balance=False):
+def demo_load_all_datasets(balance=False, use_cache=False):
     """
     Demo: Load all available datasets with automatic normalization
+    
+    With use_cache=True the parsed, tokenized datasets come from the
+    corpus cache (see corpus_cache.py) and include a 'tokens' column.
     """
     print("\n" + "="*60)
     print("UNIFIED DATASET LOADER - AUTO LABEL NORMALIZATION")
@@ -219,31 +464,17 @@ def demo_load_all_datasets(balance=False):
     
     datasets = []
     
-    # Load MainCall.csv (fraud/normal, NO HEADERS)
-    if os.path.exists('Datasets/MainCall.csv'):
-        df = DatasetLoader.load_csv('Datasets/MainCall.csv',
-                                   has_header=False,
-                                   label_col_index=0,
-                                   text_col_index=1)
-        if df is not None:
-            datasets.append(df)
-    
-    # Load Bigmaincall.csv (spam/ham, NO HEADERS)
-    if os.path.exists('Datasets/Bigmaincall.csv'):
-        df = DatasetLoader.load_csv('Datasets/Bigmaincall.csv',
-                                   has_header=False,
-                                   label_col_index=0,
-                                   text_col_index=1)
-        if df is not None:
-            datasets.append(df)
+    if use_cache:
+        from corpus_cache import CorpusCache
+        load = CorpusCache().load
+    else:
+        load = DatasetLoader.load
     
-    # Load SMSSpamCollection.txt (spam/ham in TSV format)
-    if os.path.exists('Datasets/Default/SMSSpamCollection.txt'):
-        df = DatasetLoader.load_tsv('Datasets/Default/SMSSpamCollection.txt',
-                                   label_column_index=0,
-                                   text_column_index=1)
-        if df is not None:
-            datasets.append(df)
+    for spec in DEFAULT_DATASETS:
+        if os.path.exists(spec['path']):
+            df = load(spec)
+            if df is not None:
+                datasets.append(df)
     
     if not datasets:
         print("\n✗ No datasets found!")
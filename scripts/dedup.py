@@ -0,0 +1,356 @@
+"""
+Exact and near-duplicate messages across training datasets
+MinHash signatures + LSH banding, vectorized with NumPy, roughly linear in corpus size
+
+    MinHasher.signatures(texts)     (n, num_perm) uint32 MinHash of character k-shingles
+                                    of the normalized text (lower case, punctuation and
+                                    runs of whitespace collapsed)
+    duplicate_clusters(texts)       each message -> index of the first message of its
+                                    duplicate cluster (itself when it has none)
+    label_conflicts(df, clusters)   clusters whose members carry different labels
+    deduplicate(df)                 one row per cluster -> (DataFrame, report)
+
+Signatures are split into `bands` bands of num_perm / bands rows; messages that
+agree on a whole band become candidates, and a candidate is kept only when
+the fraction of agreeing signature positions (the estimated Jaccard
+similarity of the shingle sets) reaches the threshold. Clusters are the
+connected components of the kept pairs. With the defaults (64 permutations,
+16 bands of 4) pairs at Jaccard 0.8 are found with probability > 0.999.
+
+DatasetCombiner.combine(..., dedup=True) runs deduplicate() before training,
+so near-identical messages cannot land on both sides of the train / held-out
+split.
+
+Usage (from the project root):
+    python scripts/dedup.py                                  # DEFAULT_DATASETS
+    python scripts/dedup.py --threshold 0.9 --output duplicates.csv
+    python scripts/dedup.py Datasets/Default/fraud_call.csv Datasets/Default/fraud_call.file
+"""
+
+import argparse
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+SHINGLE_CHARS = 5
+NUM_PERM = 64
+BANDS = 16
+THRESHOLD = 0.8
+CONFLICT_POLICIES = ('majority', 'drop')
+# Hash values held at once while permuting (4M uint64 = 32 MB)
+BLOCK_ELEMENTS = 1 << 22
+
+_NON_WORD = re.compile(r'[\W_]+')
+_ROLL = np.uint64(0x100000001B3)
+
+
+def normalize(text):
+    """Lower case, punctuation and whitespace runs -> one space"""
+    return _NON_WORD.sub(' ', str(text).lower()).strip()
+
+
+def _mix(x):
+    """splitmix64 finalizer: spreads every input bit over the whole word"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class MinHasher(object):
+    """
+    MinHash of character shingles with multiply-shift hash functions
+
+    The same seed gives the same signatures in every process, so signatures
+    can be stored and compared later (see scam_index.py).
+    """
+
+    def __init__(self, num_perm=NUM_PERM, shingle_chars=SHINGLE_CHARS, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_chars = shingle_chars
+        self.seed = seed
+        self.a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, texts):
+        """
+        32-bit hashes of every k-byte window of the normalized texts
+
+        Texts shorter than k (including empty ones) are one shingle, so every
+        message has at least one.
+
+        Returns:
+            (hashes uint64 (n_shingles,), start offset of each text's shingles (n,))
+        """
+        encoded = [normalize(text).encode('utf-8') for text in texts]
+        k = self.shingle_chars
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        data = np.frombuffer(b''.join(encoded) + bytes(k), dtype=np.uint8).astype(np.uint64)
+        windows = np.maximum(lengths - k + 1, 1)
+        starts = np.cumsum(windows) - windows
+        doc = np.repeat(np.arange(len(encoded)), windows)
+        position = (np.cumsum(lengths) - lengths)[doc] + np.arange(int(windows.sum())) - starts[doc]
+        width = np.minimum(lengths, k)[doc]
+
+        # Polynomial rolling hash of each window (uint64 arithmetic wraps)
+        h = np.zeros(len(position), dtype=np.uint64)
+        for j in range(k):
+            h = h * _ROLL + np.where(j < width, data[position + j] + np.uint64(1), np.uint64(0))
+        return _mix(h) >> np.uint64(32), starts
+
+    def signatures(self, texts):
+        """(n, num_perm) uint32 MinHash signatures"""
+        hashes, starts = self.shingles(texts)
+        signatures = np.empty((len(starts), self.num_perm), dtype=np.uint32)
+        if not len(starts):
+            return signatures
+        # As many permutations at a time as fit in BLOCK_ELEMENTS (all of them for one message)
+        chunk = max(1, min(self.num_perm, BLOCK_ELEMENTS // len(hashes)))
+        for i in range(0, self.num_perm, chunk):
+            permuted = (hashes[:, None] * self.a[i:i + chunk] + self.b[i:i + chunk]) >> np.uint64(32)
+            signatures[:, i:i + chunk] = np.minimum.reduceat(permuted, starts, axis=0)
+        return signatures
+
+    def signature(self, text):
+        return self.signatures([text])[0]
+
+
+def band_keys(signatures, bands=BANDS):
+    """(n, bands) uint64: one hash per band of each signature"""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    blocks = signatures[:, :bands * rows].astype(np.uint64).reshape(n, bands, rows)
+    keys = np.zeros((n, bands), dtype=np.uint64)
+    for r in range(rows):
+        keys = _mix(keys ^ blocks[:, :, r])
+    return keys
+
+
+def candidate_pairs(signatures, bands=BANDS):
+    """
+    Pairs of messages sharing at least one LSH bucket
+
+    Every bucket member is paired with the bucket's first member (not with
+    every other member), so the number of pairs stays linear in n.
+
+    Returns:
+        (m, 2) int64 array of (first, other) row indices, first < other
+    """
+    keys = band_keys(signatures, bands)
+    if len(keys) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = []
+    for band in range(keys.shape[1]):
+        order = np.argsort(keys[:, band], kind='stable')
+        sorted_keys = keys[order, band]
+        first = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        head = order[first][np.cumsum(first) - 1]
+        pairs.append(np.stack([head[~first], order[~first]], axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(pairs), axis=0)
+
+
+def similar_pairs(signatures, threshold=THRESHOLD, bands=BANDS):
+    """
+    Candidate pairs whose estimated Jaccard similarity reaches threshold
+
+    Returns:
+        ((m, 2) row index pairs, (m,) estimated similarity)
+    """
+    pairs = candidate_pairs(signatures, bands)
+    similarity = np.empty(len(pairs))
+    for i in range(0, len(pairs), 65536):
+        block = pairs[i:i + 65536]
+        similarity[i:i + 65536] = np.mean(signatures[block[:, 0]] == signatures[block[:, 1]], axis=1)
+    keep = similarity >= threshold
+    return pairs[keep], similarity[keep]
+
+
+def duplicate_clusters(texts, threshold=THRESHOLD, bands=BANDS, hasher=None):
+    """
+    Cluster exact and near-duplicate messages
+
+    Returns:
+        int64 array: for every message the index of the first message of its
+        cluster (the message itself when it has no duplicate)
+    """
+    # Exact duplicates share one signature: only distinct normalized texts are hashed
+    codes, distinct = pd.factorize(pd.Series([normalize(text) for text in texts], dtype=object))
+    n = len(codes)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    signatures = (hasher or MinHasher()).signatures(distinct)
+    pairs, _ = similar_pairs(signatures, threshold, bands)
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])),
+                       shape=(len(distinct), len(distinct)))
+    _, component = connected_components(graph, directed=False)
+    component = component[codes]
+    first = np.full(component.max() + 1, n, dtype=np.int64)
+    np.minimum.at(first, component, np.arange(n))
+    return first[component]
+
+
+def label_conflicts(df, clusters):
+    """
+    Duplicate clusters whose members do not all have the same label
+
+    Returns:
+        DataFrame (cluster, size, scam, legitimate, message), one row per
+        conflicting cluster, message = the cluster's first message
+    """
+    labels = df['label'].to_numpy()
+    frame = pd.DataFrame({'cluster': clusters, 'scam': labels == 0, 'legitimate': labels != 0})
+    grouped = frame.groupby('cluster').agg(size=('scam', 'size'), scam=('scam', 'sum'),
+                                           legitimate=('legitimate', 'sum'))
+    conflicts = grouped[(grouped['scam'] > 0) & (grouped['legitimate'] > 0)].reset_index()
+    conflicts['message'] = df['message'].to_numpy()[conflicts['cluster'].to_numpy()]
+    return conflicts
+
+
+def deduplicate(df, threshold=THRESHOLD, conflicts='majority', sources=None, bands=BANDS,
+                hasher=None, clusters=None):
+    """
+    Keep one row per duplicate cluster
+
+    Args:
+        df: DataFrame with 'message' and 'label' (other columns are kept)
+        threshold: minimum estimated Jaccard similarity of two duplicates
+        conflicts: clusters with mixed labels keep one row with the majority
+            label (ties: scam) for 'majority', or are removed for 'drop'
+        sources: optional source id per row, for the cross-source counts
+        clusters: duplicate_clusters() of df['message'], if already computed
+
+    Returns:
+        (deduplicated DataFrame with a fresh index, report dict)
+    """
+    if conflicts not in CONFLICT_POLICIES:
+        raise ValueError(f"Unknown conflict policy '{conflicts}'. Choose one of {CONFLICT_POLICIES}")
+    df = df.reset_index(drop=True)
+    if clusters is None:
+        clusters = duplicate_clusters(df['message'].astype(str), threshold, bands, hasher)
+    conflicting = label_conflicts(df, clusters)
+    labels = df['label'].to_numpy()
+
+    # Label each cluster keeps: majority vote (scam on ties), its first row with that label
+    is_scam = pd.Series(labels == 0).groupby(clusters)
+    scam_share = is_scam.mean()
+    winner = np.where(scam_share.to_numpy() >= 0.5, 0, 1)
+    keep_label = pd.Series(winner, index=scam_share.index).loc[clusters].to_numpy()
+    agrees = np.where(keep_label == 0, labels == 0, labels != 0)
+    keep = agrees & ~pd.Series(clusters).where(agrees).duplicated().to_numpy()
+    if conflicts == 'drop':
+        keep &= ~np.isin(clusters, conflicting['cluster'].to_numpy())
+
+    normalized = df['message'].astype(str).map(normalize)
+    in_cluster = pd.Series(clusters).duplicated(keep=False).to_numpy()
+    report = {
+        'rows': len(df),
+        'kept': int(keep.sum()),
+        'removed': int(len(df) - keep.sum()),
+        'exact_duplicates': int(normalized.duplicated().sum()),
+        'near_duplicates': int((~normalized.duplicated().to_numpy()
+                                & (clusters != np.arange(len(df)))).sum()),
+        'clusters': int(len(np.unique(clusters[in_cluster]))),
+        'label_conflicts': len(conflicting),
+        'conflicting_rows': int(conflicting['size'].sum()) if len(conflicting) else 0,
+    }
+    if sources is not None:
+        sources = np.asarray(sources)
+        spans = pd.DataFrame({'cluster': clusters, 'source': sources}).groupby('cluster')['source']
+        report['cross_source_clusters'] = int((spans.nunique() > 1).sum())
+    return df[keep].reset_index(drop=True), report
+
+
+def print_report(report, title="DEDUPLICATION"):
+    print(f"\n=== {title} (MinHash LSH) ===")
+    print(f"  - Exact duplicates (after normalization): {report['exact_duplicates']}")
+    print(f"  - Near duplicates: {report['near_duplicates']}")
+    if 'cross_source_clusters' in report:
+        print(f"  - Clusters spanning several sources: {report['cross_source_clusters']}")
+    print(f"  - Label conflicts: {report['label_conflicts']} clusters "
+          f"({report['conflicting_rows']} rows)")
+    print(f"Records: {report['rows']} -> {report['kept']} ({report['removed']} removed)")
+
+
+def _spec_for(path):
+    """Dataset spec for a file given on the command line: TSV if its first line has a tab"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        first = f.readline()
+    if '\t' in first:
+        return {'path': path, 'format': 'tsv', 'label_col_index': 0, 'text_col_index': 1}
+    return {'path': path, 'format': 'csv', 'has_header': False,
+            'label_col_index': 0, 'text_col_index': 1}
+
+
+def main():
+    from data_loader import DEFAULT_DATASETS, DatasetLoader
+    from transcript_cache import media_sha256
+
+    parser = argparse.ArgumentParser(description="Find exact and near-duplicate messages across datasets")
+    parser.add_argument('paths', nargs='*', help='extra dataset files (label, message; CSV or TSV)')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='minimum estimated Jaccard similarity of character shingles')
+    parser.add_argument('--bands', type=int, default=BANDS)
+    parser.add_argument('--output', default=None, help='write every duplicated row as CSV')
+    parser.add_argument('--examples', type=int, default=5, help='label conflicts to show')
+    args = parser.parse_args()
+
+    specs = [spec for spec in DEFAULT_DATASETS if os.path.exists(spec['path'])]
+    specs += [_spec_for(path) for path in args.paths]
+    digests = {}
+    for spec in specs:
+        digests.setdefault(media_sha256(spec['path']), []).append(spec['path'])
+    identical = [paths for paths in digests.values() if len(paths) > 1]
+
+    frames = []
+    for spec in specs:
+        df = DatasetLoader.load(spec)
+        if df is not None:
+            frames.append(df.reset_index(drop=True)[['label', 'message']]
+                          .assign(source=spec['path']))
+    if not frames:
+        print("\n✗ No datasets found!")
+        return
+
+    corpus = pd.concat(frames, ignore_index=True)
+    corpus['message'] = corpus['message'].astype(str)
+    start = time.perf_counter()
+    clusters = duplicate_clusters(corpus['message'], args.threshold, args.bands)
+    elapsed = time.perf_counter() - start
+    corpus['cluster'] = clusters
+    _, report = deduplicate(corpus, sources=corpus['source'], clusters=clusters)
+    conflicts = label_conflicts(corpus, clusters)
+
+    print("\n" + "="*70)
+    print(f"DUPLICATES - {len(corpus)} messages from {len(frames)} files ({elapsed:.2f}s)")
+    print("="*70)
+    for paths in identical:
+        print(f"  ✗ Identical files: {', '.join(paths)}")
+    duplicated = corpus['cluster'].duplicated(keep=False)
+    print(f"\n  {'source':<42} {'rows':>7} {'dup in file':>11} {'dup elsewhere':>13}")
+    sources_per_cluster = corpus.groupby('cluster')['source'].nunique()
+    elsewhere = corpus['cluster'].map(sources_per_cluster) > 1
+    for source, part in corpus.groupby('source', sort=False):
+        in_file = part['cluster'].duplicated().sum()
+        print(f"  {source:<42} {len(part):>7} {in_file:>11} {int(elsewhere[part.index].sum()):>13}")
+    print_report(report)
+
+    if len(conflicts):
+        print(f"\n  Label conflicts (first {min(args.examples, len(conflicts))}):")
+        for row in conflicts.head(args.examples).itertuples():
+            print(f"    {row.scam} scam / {row.legitimate} legitimate: {row.message[:70]!r}")
+
+    if args.output:
+        corpus[duplicated].sort_values(['cluster', 'source']).to_csv(args.output, index=False)
+        print(f"\n✓ {int(duplicated.sum())} duplicated rows written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Lightweight speaker diarization (NumPy, CPU only)
+Splits a call into speaker turns so the scam model can score each side
+separately instead of one mixed transcript
+
+    mfcc(samples)                  (n_frames, 13) MFCCs, fully vectorized
+    window_embeddings(samples)     one vector per 1.5 s of speech: mean + std of
+                                   MFCCs, normalized per recording
+    diarize(samples, n_speakers)   k-means over the embeddings, smoothed
+                                   -> [{'start', 'end', 'speaker'}, ...]
+    assign_speakers(turns, segments)   label transcript segments by overlap
+    score_by_speaker(pipeline, segments, caller_rule)
+                                   scam probability of each speaker's side, and
+                                   which side is the caller (from turn-taking,
+                                   never from the scores)
+    SpeakerProfiles                optional enrollment: name speakers from
+                                   reference clips (e.g. the phone owner)
+
+Silence is removed with vad.detect_speech first, so only speech frames are
+clustered.
+
+Usage (from the project root):
+    python scripts/diarization.py ham1.wav --speakers 2
+"""
+
+import argparse
+import functools
+import itertools
+import numpy as np
+from audio_io import SAMPLE_RATE, open_audio
+from instrumentation import timed
+from vad import detect_speech
+
+N_MFCC = 13
+N_MELS = 26
+N_FFT = 512
+FRAME_MS = 25
+HOP_MS = 10
+WINDOW_S = 1.5
+WINDOW_HOP_S = 0.5
+# 'longest': the caller is the side holding at least CALLER_SHARE of the speech
+CALLER_RULES = ('longest', 'first', 'second')
+CALLER_SHARE = 0.6
+
+
+@functools.lru_cache(maxsize=4)
+def _mel_filterbank(sr, n_fft=N_FFT, n_mels=N_MELS, fmin=20.0):
+    """(n_mels, n_fft // 2 + 1) triangular mel filters"""
+    to_mel = lambda f: 2595 * np.log10(1 + f / 700)
+    to_hz = lambda m: 700 * (10 ** (m / 2595) - 1)
+    mel_points = np.linspace(to_mel(fmin), to_mel(sr / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * to_hz(mel_points) / sr).astype(int)
+    filters = np.zeros((n_mels, n_fft // 2 + 1))
+    for i in range(n_mels):
+        left, center, right = bins[i], bins[i + 1], bins[i + 2]
+        if center > left:
+            filters[i, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            filters[i, center:right] = (right - np.arange(center, right)) / (right - center)
+    return filters
+
+
+@functools.lru_cache(maxsize=4)
+def _dct_matrix(n_mels=N_MELS, n_mfcc=N_MFCC):
+    """Orthonormal DCT-II rows 0..n_mfcc-1"""
+    n = np.arange(n_mels)
+    matrix = np.cos(np.pi / n_mels * (n + 0.5)[None, :] * np.arange(n_mfcc)[:, None])
+    matrix *= np.sqrt(2 / n_mels)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+def mfcc(samples, sr=SAMPLE_RATE, frame_ms=FRAME_MS, hop_ms=HOP_MS, block_frames=3000):
+    """
+    MFCCs of a signal (float32 array or memory-mapped PcmAudio)
+
+    Computed block_frames frames at a time, so the spectrum of a long call
+    is never held in memory at once.
+
+    Returns:
+        (n_frames, N_MFCC) array; frame i starts at i * hop_ms
+    """
+    frame = int(sr * frame_ms / 1000)
+    hop = int(sr * hop_ms / 1000)
+    if len(samples) < frame:
+        return np.zeros((0, N_MFCC))
+    n_frames = 1 + (len(samples) - frame) // hop
+    window = np.hamming(frame).astype(np.float32)
+    out = np.empty((n_frames, N_MFCC))
+    for first in range(0, n_frames, block_frames):
+        count = min(block_frames, n_frames - first)
+        lo, hi = first * hop, first * hop + (count - 1) * hop + frame
+        block = np.asarray(samples[max(lo - 1, 0):hi], dtype=np.float32)
+        emphasized = block[1:] - 0.97 * block[:-1]
+        if lo == 0:                             # first sample has no predecessor
+            emphasized = np.append(block[0], emphasized)
+        frames = np.lib.stride_tricks.sliding_window_view(emphasized, frame)[::hop]
+        spectrum = np.fft.rfft(frames * window, n=N_FFT)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2) / N_FFT
+        mel = np.log(power @ _mel_filterbank(sr).T + 1e-10)
+        out[first:first + count] = mel @ _dct_matrix().T
+    return out
+
+
+def window_embeddings(samples, sr=SAMPLE_RATE, regions=None, window_s=WINDOW_S,
+                      hop_s=WINDOW_HOP_S, normalize=True):
+    """
+    Embeddings of sliding windows over the speech regions
+
+    normalize=False skips the per-recording standardization, for comparing
+    windows across recordings (SpeakerProfiles)
+
+    Returns:
+        (embeddings (n, 24) L2-normalized, centers (n,) window centre times in seconds)
+    """
+    features = mfcc(samples, sr)[:, 1:]         # c0 is loudness, not voice
+    if regions is None:
+        regions = detect_speech(samples, sr)
+    per_second = 1000 / HOP_MS
+    width = int(window_s * per_second)
+    step = int(hop_s * per_second)
+
+    starts = []
+    for start, end in regions:
+        first, last = int(start * per_second), int(end * per_second) - width
+        if last < first:                        # region shorter than a window
+            if end - start >= 0.5:
+                starts.append(max(0, min(first, len(features) - width)))
+            continue
+        starts.extend(range(first, last + 1, step))
+    starts = np.asarray([s for s in starts if 0 <= s <= len(features) - width], dtype=np.intp)
+    if len(starts) == 0:
+        return np.zeros((0, 2 * features.shape[1])), np.zeros(0)
+
+    # Window means/stds for all windows at once via cumulative sums
+    cumsum = np.vstack([np.zeros(features.shape[1]), np.cumsum(features, axis=0)])
+    cumsq = np.vstack([np.zeros(features.shape[1]), np.cumsum(features ** 2, axis=0)])
+    mean = (cumsum[starts + width] - cumsum[starts]) / width
+    var = (cumsq[starts + width] - cumsq[starts]) / width - mean ** 2
+    embeddings = np.hstack([mean, np.sqrt(np.maximum(var, 0))])
+
+    centers = (starts + width / 2) / per_second
+    if not normalize:
+        return embeddings, centers
+    embeddings = (embeddings - embeddings.mean(axis=0)) / (embeddings.std(axis=0) + 1e-8)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-8
+    return embeddings, centers
+
+
+def kmeans(X, k, n_init=5, max_iter=50, random_state=0):
+    """
+    Plain k-means with k-means++ seeding
+
+    Returns:
+        (labels, centroids, inertia)
+    """
+    rng = np.random.default_rng(random_state)
+    sq_norms = (X ** 2).sum(axis=1)
+    best = None
+    for _ in range(n_init):
+        centroids = X[[rng.integers(len(X))]]
+        for _ in range(1, k):
+            dist = np.min(sq_norms[:, None] - 2 * X @ centroids.T + (centroids ** 2).sum(axis=1),
+                          axis=1).clip(0)
+            total = dist.sum()
+            pick = rng.choice(len(X), p=dist / total) if total > 0 else rng.integers(len(X))
+            centroids = np.vstack([centroids, X[pick]])
+        for _ in range(max_iter):
+            dist = sq_norms[:, None] - 2 * X @ centroids.T + (centroids ** 2).sum(axis=1)
+            labels = dist.argmin(axis=1)
+            updated = np.array([X[labels == j].mean(axis=0) if np.any(labels == j) else centroids[j]
+                                for j in range(k)])
+            if np.allclose(updated, centroids):
+                break
+            centroids = updated
+        inertia = dist[np.arange(len(X)), labels].clip(0).sum()
+        if best is None or inertia < best[2]:
+            best = (labels, centroids, inertia)
+    return best
+
+
+def _smooth(labels, width=3):
+    """Majority filter: removes single-window speaker flips"""
+    if len(labels) < width:
+        return labels
+    half = width // 2
+    padded = np.concatenate([labels[:1].repeat(half), labels, labels[-1:].repeat(half)])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, width)
+    counts = np.apply_along_axis(np.bincount, 1, windows, minlength=labels.max() + 1)
+    return counts.argmax(axis=1)
+
+
+@timed('diarize')
+def diarize(samples, sr=SAMPLE_RATE, n_speakers=2, regions=None, random_state=0):
+    """
+    Speaker turns of a recording
+
+    Args:
+        samples: float32 mono audio or a memory-mapped PcmAudio
+        n_speakers: number of speakers to find
+        regions: speech regions (default: vad.detect_speech)
+
+    Returns:
+        list of {'start', 'end', 'speaker'} (speaker is 0..n_speakers-1, numbered
+        in order of first appearance)
+    """
+    if regions is None:
+        regions = detect_speech(samples, sr)
+    embeddings, centers = window_embeddings(samples, sr, regions)
+    if len(embeddings) == 0:
+        return []
+    k = min(n_speakers, len(embeddings))
+    labels = _smooth(kmeans(embeddings, k, random_state=random_state)[0])
+    # Renumber so the first voice heard is speaker 0
+    order = {label: i for i, label in enumerate(dict.fromkeys(labels.tolist()))}
+    labels = np.array([order[label] for label in labels.tolist()])
+
+    # Each window labels the half-hop around its centre; clip to speech regions
+    turns = []
+    for start, end in regions:
+        inside = np.flatnonzero((centers >= start) & (centers <= end))
+        if len(inside) == 0:
+            nearest = int(np.abs(centers - (start + end) / 2).argmin())
+            turns.append({'start': start, 'end': end, 'speaker': int(labels[nearest])})
+            continue
+        bounds = [start] + [(centers[a] + centers[b]) / 2 for a, b in zip(inside[:-1], inside[1:])] + [end]
+        for i, index in enumerate(inside):
+            speaker = int(labels[index])
+            if turns and turns[-1]['speaker'] == speaker and turns[-1]['end'] >= bounds[i] - 1e-6:
+                turns[-1]['end'] = float(bounds[i + 1])
+            else:
+                turns.append({'start': float(bounds[i]), 'end': float(bounds[i + 1]),
+                              'speaker': speaker})
+    return turns
+
+
+def speaker_at(turns, t):
+    for turn in turns:
+        if turn['start'] <= t < turn['end']:
+            return turn['speaker']
+    return None
+
+
+def assign_speakers(turns, segments):
+    """Label each transcript segment with the speaker it overlaps most (in place)"""
+    for segment in segments:
+        overlap = {}
+        for turn in turns:
+            shared = min(segment['end'], turn['end']) - max(segment['start'], turn['start'])
+            if shared > 0:
+                overlap[turn['speaker']] = overlap.get(turn['speaker'], 0) + shared
+        segment['speaker'] = max(overlap, key=overlap.get) if overlap else None
+    return segments
+
+
+def identify_caller(segments, rule='longest', share=CALLER_SHARE):
+    """
+    Which speaker placed the call, from turn-taking alone
+
+    Args:
+        segments: transcript segments labelled by assign_speakers
+        rule: 'longest' - the side with at least `share` of the speech time
+              (scam callers do most of the talking); 'first' / 'second' - the
+              first / second voice heard (e.g. chosen by the user)
+
+    Returns:
+        speaker label, or None when the rule does not single one out
+    """
+    if rule not in CALLER_RULES:
+        raise ValueError(f"Unknown caller rule {rule!r}, expected one of {CALLER_RULES}")
+    segments = sorted((s for s in segments if s.get('speaker') is not None),
+                      key=lambda s: s['start'])
+    if rule == 'longest':
+        seconds = {}
+        for segment in segments:
+            seconds[segment['speaker']] = (seconds.get(segment['speaker'], 0.0)
+                                           + segment['end'] - segment['start'])
+        total = sum(seconds.values())
+        if total <= 0:
+            return None
+        speaker = max(seconds, key=seconds.get)
+        return speaker if seconds[speaker] >= share * total else None
+    order = list(dict.fromkeys(segment['speaker'] for segment in segments))
+    position = CALLER_RULES.index(rule) - 1
+    return order[position] if position < len(order) else None
+
+
+def score_by_speaker(pipeline, segments, caller_rule='longest'):
+    """
+    Scam probability of each speaker's side of the call
+
+    The caller is picked by identify_caller, independently of the scores, so
+    a callee who says "OTP" or "bank" does not become the caller.
+
+    Returns:
+        (per-speaker dict {speaker: {'text', 'scam_probability', 'seconds'}},
+         caller: speaker label, or None when it cannot be determined)
+    """
+    sides = {}
+    for segment in segments:
+        if segment.get('speaker') is None:
+            continue
+        side = sides.setdefault(segment['speaker'], {'texts': [], 'seconds': 0.0})
+        side['texts'].append(segment['text'].strip())
+        side['seconds'] += segment['end'] - segment['start']
+    if not sides:
+        return {}, None
+    speakers = sorted(sides)
+    texts = [' '.join(sides[s]['texts']) for s in speakers]
+    probabilities = pipeline.scam_probability(texts)
+    result = {speaker: {'text': text, 'scam_probability': float(probability),
+                        'seconds': sides[speaker]['seconds']}
+              for speaker, text, probability in zip(speakers, texts, probabilities)}
+    return result, identify_caller(segments, caller_rule)
+
+
+class SpeakerProfiles(object):
+    """
+    Named voice profiles for telling who is who across recordings
+
+    Windows are standardized with statistics of all enrollment audio
+    (instead of per recording) and each speaker is the mean of their
+    windows; identify() votes over the windows of a new clip.
+    """
+
+    def __init__(self):
+        self.windows = {}
+        self._fit = None
+
+    def enroll(self, name, clips, sr=SAMPLE_RATE):
+        embeddings = [window_embeddings(clip, sr, normalize=False)[0] for clip in clips]
+        self.windows[name] = np.vstack([e for e in embeddings if len(e)])
+        self._fit = None
+
+    def _standardize(self, embeddings):
+        mean, std = self._fit[:2]
+        embeddings = (embeddings - mean) / std
+        return embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-8)
+
+    def _centroids(self):
+        if self._fit is None:
+            everything = np.vstack(list(self.windows.values()))
+            self._fit = (everything.mean(axis=0), everything.std(axis=0) + 1e-8, None)
+            centroids = np.array([self._standardize(w).mean(axis=0) for w in self.windows.values()])
+            centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+            self._fit = self._fit[:2] + (centroids,)
+        return self._fit[2]
+
+    def identify(self, samples, sr=SAMPLE_RATE):
+        """Name of the closest profile (majority vote over windows)"""
+        embeddings, _ = window_embeddings(samples, sr, normalize=False)
+        if len(embeddings) == 0 or not self.windows:
+            return None
+        centroids = self._centroids()
+        votes = (self._standardize(embeddings) @ centroids.T).argmax(axis=1)
+        names = list(self.windows)
+        return names[np.bincount(votes, minlength=len(names)).argmax()]
+
+
+def frame_accuracy(turns, truth, step=0.01):
+    """
+    Share of reference speech time given the right speaker, under the best
+    mapping of predicted to reference labels
+
+    truth: list of (start, end, speaker) reference turns
+    """
+    times = np.concatenate([np.arange(start, end, step) for start, end, _ in truth])
+    reference = np.concatenate([np.full(len(np.arange(start, end, step)), speaker)
+                                for start, end, speaker in truth])
+    predicted = np.array([speaker_at(turns, t) for t in times], dtype=object)
+    labels = sorted(set(reference.tolist()))
+    found = sorted({p for p in predicted.tolist() if p is not None})
+    best = 0.0
+    for mapping in itertools.permutations(labels, len(found)):
+        lookup = dict(zip(found, mapping))
+        mapped = np.array([lookup.get(p) for p in predicted.tolist()], dtype=object)
+        best = max(best, float(np.mean(mapped == reference)))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split a recording into speaker turns")
+    parser.add_argument('file', help='audio/video file')
+    parser.add_argument('--speakers', type=int, default=2, help='number of speakers')
+    args = parser.parse_args()
+
+    samples = open_audio(args.file)
+    for turn in diarize(samples, n_speakers=args.speakers):
+        print(f"  {turn['start']:7.2f} - {turn['end']:7.2f}  speaker {turn['speaker']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Hashing-trick feature mode: fixed 2^k columns, no vocabulary
+Model size and per-worker memory stay constant however large the corpus grows
+
+Tokens are mapped to columns with the same signed 32-bit MurmurHash3 as
+sklearn's HashingVectorizer/FeatureHasher. With alternate_sign=True the sign
+of the hash is applied to each count, so colliding tokens tend to cancel
+instead of piling up; the absolute value is then taken because Naive Bayes
+needs non-negative features. The output then goes through the same TF-IDF +
+MultinomialNB steps as the vocabulary mode.
+
+Naive Bayes is fit only on buckets that occur in training. Otherwise the
+alpha smoothing would be spread over 2^k mostly empty columns. Unused buckets
+get idf 0 and log-probability 0 for every class. A token that lands there at
+prediction time is ignored, just like an out-of-vocabulary word.
+
+Shards need no shared state, so each worker process tokenizes and hashes
+its own slice of the corpus and only the sparse count matrices come back.
+
+Usage (from the project root):
+    python scripts/hashing_features.py --bits 20 --workers 4      # train + save scam_pipeline/
+"""
+
+import argparse
+import functools
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.utils import murmurhash3_32
+from text_processor import get_tokenizer
+
+DEFAULT_N_BITS = 20
+
+
+class HashingFeaturizer(object):
+    """
+    Token lists -> non-negative hashed count matrix with 2^n_bits columns
+    """
+
+    def __init__(self, n_bits=DEFAULT_N_BITS, alternate_sign=True, cache_size=1 << 16):
+        self.n_bits = n_bits
+        self.n_features = 1 << n_bits
+        self.alternate_sign = alternate_sign
+        self._hasher = FeatureHasher(n_features=self.n_features, input_type='string',
+                                     alternate_sign=alternate_sign)
+        # Per-token lookups for the single-message path; repeated words are common
+        self.token_column = functools.lru_cache(maxsize=cache_size)(self._token_column)
+
+    def _token_column(self, token):
+        """(column, sign) for one token, identical to FeatureHasher"""
+        h = murmurhash3_32(token, seed=0)
+        sign = 1 if (h >= 0 or not self.alternate_sign) else -1
+        return abs(h) % self.n_features, sign
+
+    def transform(self, token_lists):
+        """Batch path: sparse (n_docs, 2^n_bits) float64 matrix"""
+        X = self._hasher.transform(token_lists).tocsr()
+        if self.alternate_sign:
+            np.abs(X.data, out=X.data)
+            X.eliminate_zeros()
+        return X
+
+    def counts_one(self, tokens):
+        """Single-message path: (column ids, counts) arrays"""
+        counts = {}
+        token_column = self.token_column
+        for token in tokens:
+            column, sign = token_column(token)
+            counts[column] = counts.get(column, 0) + sign
+        counts = {column: abs(value) for column, value in counts.items() if value}
+        ids = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        return ids, values
+
+
+def _hash_shard(messages, n_bits, alternate_sign):
+    """Worker: tokenize and hash one shard of messages"""
+    tokens = get_tokenizer().tokenize_batch(messages)
+    return HashingFeaturizer(n_bits, alternate_sign).transform(tokens)
+
+
+def hashed_counts(messages, n_bits=DEFAULT_N_BITS, alternate_sign=True, workers=1,
+                  shard_size=20000):
+    """
+    Hashed count matrix for a list of messages, optionally over a process pool
+    """
+    messages = list(messages)
+    shards = [messages[i:i + shard_size] for i in range(0, len(messages), shard_size)]
+    if workers == 1 or len(shards) <= 1:
+        parts = [_hash_shard(shard, n_bits, alternate_sign) for shard in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_hash_shard, shards, [n_bits] * len(shards),
+                                  [alternate_sign] * len(shards)))
+    if not parts:
+        return sp.csr_matrix((0, 1 << n_bits))
+    return sp.vstack(parts, format='csr')
+
+
+def train_hashing_pipeline(messages, labels, n_bits=DEFAULT_N_BITS, alternate_sign=True,
+                           use_tfidf=True, workers=1, shard_size=20000, alpha=1.0):
+    """
+    Fit TF-IDF + MultinomialNB on hashed features
+
+    Returns:
+        ScamPipeline in hashing mode
+    """
+    from sklearn.feature_extraction.text import TfidfTransformer
+    from sklearn.naive_bayes import MultinomialNB
+    from pipeline import ScamPipeline
+
+    X = hashed_counts(messages, n_bits, alternate_sign, workers, shard_size)
+    active = np.flatnonzero(X.getnnz(axis=0))
+    X = X[:, active]
+
+    idf = None
+    tfidf_transformer = None
+    if use_tfidf:
+        tfidf_transformer = TfidfTransformer().fit(X)
+        X = tfidf_transformer.transform(X)
+        idf = np.zeros(1 << n_bits)
+        idf[active] = tfidf_transformer.idf_
+    model = MultinomialNB(alpha=alpha).fit(X, np.asarray(labels))
+
+    feature_log_prob = np.zeros((len(model.classes_), 1 << n_bits))
+    feature_log_prob[:, active] = model.feature_log_prob_
+
+    return ScamPipeline(None, feature_log_prob, model.class_log_prior_, model.classes_,
+                        idf=idf, norm=tfidf_transformer.norm if use_tfidf else None,
+                        hashing={'n_bits': n_bits, 'alternate_sign': alternate_sign},
+                        metadata={'source': 'hashing_features.py'})
+
+
+def main():
+    from data_loader import demo_load_all_datasets
+    from pipeline import DEFAULT_PIPELINE_DIR, save_pipeline
+
+    parser = argparse.ArgumentParser(description="Train the scam model on hashed features")
+    parser.add_argument('--bits', type=int, default=DEFAULT_N_BITS,
+                        help='log2 of the number of hash buckets (default: 20)')
+    parser.add_argument('--no-alternate-sign', action='store_true',
+                        help='plain (unsigned) hashing')
+    parser.add_argument('--no-tfidf', action='store_true', help='fit on raw hashed counts')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for hashing')
+    parser.add_argument('--pipeline', default=DEFAULT_PIPELINE_DIR, help='pipeline directory')
+    args = parser.parse_args()
+
+    data = demo_load_all_datasets(balance=False)
+    if data is None:
+        return
+
+    print(f"\n=== Training on 2^{args.bits} hashed features ===")
+    start = time.perf_counter()
+    pipeline = train_hashing_pipeline(data['message'], data['label'], n_bits=args.bits,
+                                      alternate_sign=not args.no_alternate_sign,
+                                      use_tfidf=not args.no_tfidf, workers=args.workers)
+    print(f"  - Trained in {time.perf_counter() - start:.2f}s")
+    accuracy = (pipeline.predict(data['message'].tolist()) == data['label'].to_numpy()).mean()
+    print(f"  - Training Accuracy: {accuracy:.4f}")
+    save_pipeline(pipeline, args.pipeline)
+
+
+if __name__ == "__main__":
+    main()
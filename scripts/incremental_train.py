@@ -0,0 +1,261 @@
+"""
+Incremental retraining: add newly labelled messages without a full rebuild
+Persists the accumulated Naive Bayes statistics so only new rows are tokenized
+
+State directory (default: incremental_state/):
+    state.json                 alpha, document counts, format version
+    vocabulary.json            terms in column order (grows as new words appear)
+    class_feature_counts.npy   (n_classes, n_features) summed term counts per class
+    doc_freq.npy               (n_features,) number of messages containing each term
+    class_doc_counts.npy       (n_classes,) messages per class
+
+Naive Bayes only needs per-class term totals, so adding a batch is a sum.
+The model here is fit on raw term counts: TF-IDF weights depend on the whole
+corpus and would change every stored count on each update. Document
+frequencies are kept to prune rare terms (--min-df) when the model is
+exported as a scam_pipeline/ artifact.
+
+Usage (from the project root):
+    python scripts/incremental_train.py --init                      # build state from Datasets/
+    python scripts/incremental_train.py --add new_calls.csv --label-column label --text-column message
+    python scripts/incremental_train.py --add new_calls.csv --no-header
+
+--add streams the file in --chunksize rows, so it can be larger than RAM.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+import scipy.sparse as sp
+from data_loader import DatasetStream, demo_load_all_datasets
+from pipeline import DEFAULT_PIPELINE_DIR, DEFAULT_THRESHOLD, ScamPipeline, save_pipeline
+from text_processor import TOKENIZER_VERSION, get_tokenizer
+
+STATE_FORMAT_VERSION = 1
+DEFAULT_STATE_DIR = 'incremental_state'
+CLASSES = (0, 1)
+
+_ARRAYS = ('class_feature_counts', 'doc_freq', 'class_doc_counts')
+
+
+class IncrementalTrainer(object):
+    """
+    Accumulated MultinomialNB statistics that can be updated batch by batch
+    """
+
+    def __init__(self, alpha=1.0, terms=None, class_feature_counts=None, doc_freq=None,
+                 class_doc_counts=None, tokenizer_version=TOKENIZER_VERSION):
+        self.alpha = alpha
+        self.terms = list(terms or [])
+        self.vocabulary = {term: index for index, term in enumerate(self.terms)}
+        n_features = len(self.terms)
+        self.class_feature_counts = (np.zeros((len(CLASSES), n_features))
+                                     if class_feature_counts is None
+                                     else np.asarray(class_feature_counts, dtype=np.float64))
+        self.doc_freq = (np.zeros(n_features, dtype=np.int64) if doc_freq is None
+                         else np.asarray(doc_freq, dtype=np.int64))
+        self.class_doc_counts = (np.zeros(len(CLASSES), dtype=np.int64) if class_doc_counts is None
+                                 else np.asarray(class_doc_counts, dtype=np.int64))
+        self.tokenizer_version = tokenizer_version
+
+    @property
+    def n_docs(self):
+        return int(self.class_doc_counts.sum())
+
+    @property
+    def n_features(self):
+        return len(self.terms)
+
+    def update(self, messages, labels, token_lists=None):
+        """
+        Add a batch of labelled messages
+
+        Args:
+            messages: iterable of strings
+            labels: iterable of normalized labels (0 = scam, 1 = legitimate)
+            token_lists: already tokenized messages (e.g. from the corpus cache)
+
+        Returns:
+            Number of new vocabulary terms
+        """
+        labels = np.asarray(labels, dtype=np.int64)
+        if token_lists is None:
+            token_lists = get_tokenizer().tokenize_batch(messages)
+
+        # Map tokens to ids, appending unseen terms to the vocabulary
+        vocabulary = self.vocabulary
+        terms = self.terms
+        old_size = len(terms)
+        indices = []
+        indptr = [0]
+        for tokens in token_lists:
+            for token in tokens:
+                index = vocabulary.get(token)
+                if index is None:
+                    index = len(terms)
+                    vocabulary[token] = index
+                    terms.append(token)
+                indices.append(index)
+            indptr.append(len(indices))
+
+        added = len(terms) - old_size
+        if added:
+            self.class_feature_counts = np.hstack(
+                [self.class_feature_counts, np.zeros((len(CLASSES), added))])
+            self.doc_freq = np.concatenate([self.doc_freq, np.zeros(added, dtype=np.int64)])
+
+        counts = sp.csr_matrix((np.ones(len(indices)), np.asarray(indices, dtype=np.int64),
+                                np.asarray(indptr)), shape=(len(token_lists), len(terms)))
+        counts.sum_duplicates()
+
+        # (n_classes, n_docs) one-hot label matrix: one sparse product sums every class
+        class_index = np.searchsorted(CLASSES, labels)
+        if not np.array_equal(np.asarray(CLASSES)[class_index], labels):
+            raise ValueError(f"Labels must be one of {CLASSES} - normalize them with LabelNormalizer")
+        onehot = sp.csr_matrix((np.ones(len(labels)), (class_index, np.arange(len(labels)))),
+                               shape=(len(CLASSES), len(labels)))
+
+        self.class_feature_counts += np.asarray((onehot @ counts).todense())
+        self.doc_freq += np.diff(counts.tocsc().indptr)
+        self.class_doc_counts += np.bincount(class_index, minlength=len(CLASSES))
+        return added
+
+    def to_pipeline(self, min_df=1, calibration=None, threshold=DEFAULT_THRESHOLD):
+        """
+        Export the current statistics as a ScamPipeline
+
+        Same formulas as MultinomialNB.fit on term counts, restricted to
+        terms that appear in at least min_df messages. calibration and
+        threshold are stored as given (main() carries over the ones of the
+        pipeline being replaced).
+        """
+        keep = np.flatnonzero(self.doc_freq >= min_df)
+        feature_counts = self.class_feature_counts[:, keep] + self.alpha
+        feature_log_prob = (np.log(feature_counts)
+                            - np.log(feature_counts.sum(axis=1, keepdims=True)))
+        class_log_prior = (np.log(self.class_doc_counts)
+                           - np.log(self.class_doc_counts.sum())).astype(np.float64)
+        return ScamPipeline([self.terms[i] for i in keep], feature_log_prob, class_log_prior,
+                            np.asarray(CLASSES), tokenizer_version=self.tokenizer_version,
+                            calibration=calibration, threshold=threshold,
+                            metadata={'source': 'incremental_train.py', 'n_docs': self.n_docs,
+                                      'alpha': self.alpha, 'min_df': min_df})
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, directory=DEFAULT_STATE_DIR):
+        """Write the state directory (an existing one is renamed aside, not deleted first)"""
+        tmp_dir = directory.rstrip('/\\') + '.tmp'
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        with open(os.path.join(tmp_dir, 'state.json'), 'w') as f:
+            json.dump({'format_version': STATE_FORMAT_VERSION, 'alpha': self.alpha,
+                       'tokenizer_version': self.tokenizer_version,
+                       'n_docs': self.n_docs, 'n_features': self.n_features}, f, indent=2)
+        with open(os.path.join(tmp_dir, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.terms, f, ensure_ascii=False)
+        for name in _ARRAYS:
+            np.save(os.path.join(tmp_dir, name + '.npy'), getattr(self, name))
+        # Swap by renames: the old directory is only deleted once the new one is in place
+        old_dir = directory.rstrip('/\\') + '.old'
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        if os.path.exists(directory):
+            os.rename(directory, old_dir)
+        os.rename(tmp_dir, directory)
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+
+    @classmethod
+    def load(cls, directory=DEFAULT_STATE_DIR):
+        with open(os.path.join(directory, 'state.json')) as f:
+            state = json.load(f)
+        if state['format_version'] > STATE_FORMAT_VERSION:
+            raise ValueError(f"State format v{state['format_version']} is newer than "
+                             f"supported v{STATE_FORMAT_VERSION}. Please update the code.")
+        if state['tokenizer_version'] != TOKENIZER_VERSION:
+            raise ValueError(f"State was built with tokenizer v{state['tokenizer_version']}, "
+                             f"running v{TOKENIZER_VERSION}. Rebuild it with --init.")
+        with open(os.path.join(directory, 'vocabulary.json'), encoding='utf-8') as f:
+            terms = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, name + '.npy')) for name in _ARRAYS}
+        return cls(alpha=state['alpha'], terms=terms, tokenizer_version=state['tokenizer_version'],
+                   **arrays)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally retrain the scam model")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument('--init', action='store_true',
+                        help='build the state from all datasets in Datasets/')
+    action.add_argument('--add', metavar='FILE', help='CSV/TSV file with newly labelled messages')
+    parser.add_argument('--state', default=DEFAULT_STATE_DIR, help='state directory')
+    parser.add_argument('--pipeline', default=DEFAULT_PIPELINE_DIR,
+                        help='pipeline directory to write after updating')
+    parser.add_argument('--alpha', type=float, default=1.0, help='Naive Bayes smoothing (--init only)')
+    parser.add_argument('--min-df', type=int, default=1,
+                        help='drop terms seen in fewer messages when exporting')
+    parser.add_argument('--tsv', action='store_true', help='--add file is tab separated, no header')
+    parser.add_argument('--no-header', action='store_true', help='--add CSV has no header row')
+    parser.add_argument('--label-column', default='label')
+    parser.add_argument('--text-column', default='message')
+    parser.add_argument('--label-col-index', type=int, default=0)
+    parser.add_argument('--text-col-index', type=int, default=1)
+    parser.add_argument('--chunksize', type=int, default=50000, help='rows per --add chunk')
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("SCAM DETECTION MODEL - INCREMENTAL RETRAINING")
+    print("="*70)
+
+    start = time.perf_counter()
+    if args.init:
+        data = demo_load_all_datasets(balance=False, use_cache=True)
+        if data is None:
+            return
+        trainer = IncrementalTrainer(alpha=args.alpha)
+        start = time.perf_counter()
+        added = trainer.update(data['message'], data['label'], data.get('tokens'))
+        rows = len(data)
+    else:
+        spec = {'path': args.add, 'format': 'tsv' if args.tsv else 'csv',
+                'has_header': not args.no_header,
+                'label_column': args.label_column, 'text_column': args.text_column,
+                'label_col_index': args.label_col_index, 'text_col_index': args.text_col_index}
+        trainer = IncrementalTrainer.load(args.state)
+        print(f"\nLoaded state: {trainer.n_docs} messages, {trainer.n_features} terms")
+        added = 0
+        rows = 0
+        for chunk in DatasetStream.iter_source(spec, chunksize=args.chunksize):
+            added += trainer.update(chunk['message'], chunk['label'])
+            rows += len(chunk)
+            print(f"  ... {rows} messages added")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ Added {rows} messages in {elapsed:.2f}s ({added} new terms)")
+    print(f"  State: {trainer.n_docs} messages, {trainer.n_features} terms")
+    print(f"    - Scam (0): {trainer.class_doc_counts[0]}")
+    print(f"    - Legitimate (1): {trainer.class_doc_counts[1]}")
+
+    trainer.save(args.state)
+    print(f"Saved {args.state}/")
+    # Keep the tuned calibration and operating threshold of the pipeline being replaced
+    calibration, threshold = None, DEFAULT_THRESHOLD
+    if os.path.exists(os.path.join(args.pipeline, 'manifest.json')):
+        previous = ScamPipeline.load(args.pipeline)
+        calibration, threshold = previous.calibration, previous.threshold
+        print(f"Carrying over calibration ({'platt' if calibration else 'none'}) "
+              f"and threshold {threshold} from {args.pipeline}/ "
+              f"(refit with: python scripts/calibration.py calibrate)")
+    save_pipeline(trainer.to_pipeline(min_df=args.min_df, calibration=calibration,
+                                      threshold=threshold), args.pipeline)
+
+
+if __name__ == "__main__":
+    main()
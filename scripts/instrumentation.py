@@ -0,0 +1,526 @@
+"""
+Per-stage timing, counters and histograms shared by every entry point
+Shows where a slow request spends its time: transcription, tokenizing, vectorizing or prediction
+
+    with stage('transcribe', backend='whisper'):   time a block (histogram + optional JSON log line)
+    @timed('decode')                               time every call of a function
+    count('transcript_cache_total', result='hit')  bump a counter
+    with request('app.analyze') as r:              time a whole user action; r.stages holds the
+                                                   per-stage breakdown, and with the profiler on
+                                                   a slow request dumps a flame graph
+    prometheus_text() / snapshot()                 export (Prometheus text format / plain dict)
+    serve(port)                                    GET /metrics on a background HTTP thread
+
+Stages recorded out of the box (histogram scam_stage_seconds, label stage=...):
+    tokenize     punctuation + stopword removal (TokenizerEngine)
+    vectorize    counts + TF-IDF weighting (sparse engine)
+    predict      Naive Bayes log-likelihoods (numpy engine: includes its per-message counting)
+    transcribe   every Whisper / AssemblyAI call, label backend=...
+    decode       open_audio (decode into the PCM cache, or a cache hit)
+    vad          speech_view (silence detection)
+    diarize      speaker diarization
+    media_hash   hashing an upload for the transcript cache (hits and misses are
+                 counted in scam_transcript_cache_total)
+
+Configuration (environment variables, read at import; or call configure()):
+    SCAM_METRICS=0              disabled: stage()/request() return a shared no-op object and
+                                count() returns at once (well under a microsecond per call)
+    SCAM_METRICS_LOG=path       one JSON line per stage and request ('-' = stderr)
+    SCAM_PROFILE_SLOW_MS=500    sample the stack of every request; keep the samples of those
+                                slower than this as collapsed stacks (flamegraph.pl, speedscope)
+    SCAM_PROFILE_DIR=profiles   where the .folded files go
+    SCAM_METRICS_PORT=9108      the Streamlit apps start serve() on this port
+
+Usage (from the project root):
+    SCAM_METRICS_LOG=- SCAM_PROFILE_SLOW_MS=200 streamlit run scripts/integrated.py
+    SCAM_METRICS_PORT=9108 streamlit run scripts/audio_input.py && curl -s localhost:9108/metrics
+    python scripts/instrumentation.py --messages 2000     # score a corpus sample, print the metrics
+"""
+
+import argparse
+import bisect
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+METRIC_PREFIX = 'scam_'
+PROFILE_INTERVAL_S = 0.005
+DEFAULT_PROFILE_DIR = 'profiles'
+
+HELP = {
+    'stage_seconds': 'Time spent in each processing stage',
+    'stage_errors_total': 'Stages that raised an exception',
+    'request_seconds': 'End-to-end time of user-facing requests',
+    'requests_total': 'User-facing requests by outcome',
+    'slow_requests_total': 'Requests over the profiling threshold',
+}
+
+
+class Histogram(object):
+    """Fixed-bucket histogram (Prometheus semantics: bucket i counts values <= bound i)"""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th value (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Registry(object):
+    """Thread-safe counters and histograms keyed by (name, sorted label items)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=(), buckets=STAGE_BUCKETS):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """Plain dict of every series (JSON-serializable)"""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = [{'name': name, 'labels': dict(labels), 'count': h.count,
+                           'sum': round(h.sum, 6), 'mean': round(h.sum / h.count, 6),
+                           'p50': h.quantile(0.5), 'p95': h.quantile(0.95), 'p99': h.quantile(0.99)}
+                          for (name, labels), h in sorted(self.histograms.items())]
+        return {'counters': counters, 'histograms': histograms}
+
+    def prometheus_text(self, prefix=METRIC_PREFIX):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, series in _group(self.counters):
+                lines += _header(prefix + name, name, 'counter')
+                for labels, value in series:
+                    lines.append(f'{prefix}{name}{_labels(labels)} {value}')
+            for name, series in _group(self.histograms):
+                lines += _header(prefix + name, name, 'histogram')
+                for labels, h in series:
+                    cumulative = 0
+                    for bound, n in zip(h.buckets + ('+Inf',), h.counts):
+                        cumulative += n
+                        lines.append(f'{prefix}{name}_bucket{_labels(labels + (("le", bound),))} '
+                                     f'{cumulative}')
+                    lines.append(f'{prefix}{name}_sum{_labels(labels)} {h.sum!r}')
+                    lines.append(f'{prefix}{name}_count{_labels(labels)} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _group(series):
+    grouped = {}
+    for (name, labels), value in sorted(series.items()):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped.items()
+
+
+def _header(full_name, name, kind):
+    header = [f'# HELP {full_name} {HELP[name]}'] if name in HELP else []
+    return header + [f'# TYPE {full_name} {kind}']
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+# ----------------------------------------------------------------------
+# Sampling profiler
+# ----------------------------------------------------------------------
+
+class SamplingProfiler(object):
+    """
+    Samples one thread's Python stack every interval seconds
+
+    Samples are kept as collapsed stacks ("outer;inner;leaf count" lines),
+    the input format of flamegraph.pl, speedscope and inferno. Frames are
+    "function (file.py:first line)", so all samples of a function merge.
+    """
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL_S):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:'
+                             f'{code.co_firstlineno})')
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self):
+        return [f'{stack} {n}' for stack, n in sorted(self.stacks.items())]
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            f.write('\n'.join(self.collapsed()) + '\n')
+        return path
+
+
+# ----------------------------------------------------------------------
+# Stages and requests
+# ----------------------------------------------------------------------
+
+class _Settings(object):
+    enabled = os.environ.get('SCAM_METRICS', '1').lower() not in ('0', 'false', 'off', 'no')
+    log = False
+    slow_s = None
+    profile_dir = os.environ.get('SCAM_PROFILE_DIR', DEFAULT_PROFILE_DIR)
+
+
+REGISTRY = Registry()
+_settings = _Settings()
+_local = threading.local()
+_logger = logging.getLogger('scam.metrics')
+_logger.propagate = False
+_servers = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: the event dict plus ts and level"""
+
+    def format(self, record):
+        event = dict(getattr(record, 'event', None) or {'message': record.getMessage()})
+        event.setdefault('ts', round(record.created, 6))
+        event.setdefault('level', record.levelname.lower())
+        return json.dumps(event, default=str)
+
+
+def configure(enabled=None, log=None, slow_ms=None, profile_dir=None):
+    """
+    Change the instrumentation settings at runtime
+
+    Args:
+        enabled: record anything at all
+        log: path of a JSON-lines log, '-' for stderr, False to stop logging
+        slow_ms: profile requests and keep flame graphs of those slower than
+            this; False turns the profiler off
+        profile_dir: directory for the .folded files
+    """
+    if enabled is not None:
+        _settings.enabled = bool(enabled)
+    if log is not None:
+        for handler in list(_logger.handlers):
+            _logger.removeHandler(handler)
+            if handler.stream not in (sys.stderr, sys.stdout):
+                handler.close()
+        if log:
+            handler = (logging.StreamHandler(sys.stderr) if log == '-'
+                       else logging.FileHandler(log, encoding='utf-8'))
+            handler.setFormatter(JsonFormatter())
+            _logger.addHandler(handler)
+            _logger.setLevel(logging.INFO)
+        _settings.log = bool(log)
+    if slow_ms is not None:
+        _settings.slow_s = None if slow_ms is False else slow_ms / 1000.0
+    if profile_dir is not None:
+        _settings.profile_dir = profile_dir
+
+
+def enabled():
+    return _settings.enabled
+
+
+def _log(event):
+    _logger.info(event['event'], extra={'event': event})
+
+
+class _NoOp(object):
+    """What stage()/request() return while disabled: nothing is timed or stored"""
+
+    name = None
+    id = None
+    seconds = 0.0
+    stages = {}
+    profile = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoOp()
+
+
+class _Stage(object):
+    __slots__ = ('name', 'labels', 'start', 'seconds')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.start
+        labels = (('stage', self.name),) + self.labels
+        REGISTRY.observe('stage_seconds', self.seconds, labels)
+        if exc_type is not None:
+            REGISTRY.inc('stage_errors_total', 1, labels)
+        current = getattr(_local, 'request', None)
+        if current is not None:
+            current.stages[self.name] = current.stages.get(self.name, 0.0) + self.seconds
+        if _settings.log:
+            event = {'event': 'stage', 'stage': self.name, 'seconds': round(self.seconds, 6)}
+            event.update(self.labels)
+            if current is not None:
+                event['request_id'] = current.id
+            if exc_type is not None:
+                event['error'] = exc_type.__name__
+            _log(event)
+        return False
+
+
+class _Request(object):
+    """A user-facing action: total time, per-stage breakdown, optional profile"""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.id = uuid.uuid4().hex[:12]
+        self.stages = {}
+        self.seconds = 0.0
+        self.profile = None
+        self._profiler = None
+
+    def __enter__(self):
+        self._parent = getattr(_local, 'request', None)
+        _local.request = self
+        if _settings.slow_s is not None:
+            self._profiler = SamplingProfiler().start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.start
+        _local.request = self._parent
+        labels = (('request', self.name),) + self.labels
+        REGISTRY.observe('request_seconds', self.seconds, labels)
+        REGISTRY.inc('requests_total', 1, labels + (('status', 'error' if exc_type else 'ok'),))
+        if self._profiler is not None:
+            self._profiler.stop()
+            if self.seconds >= _settings.slow_s:
+                REGISTRY.inc('slow_requests_total', 1, labels)
+                if self._profiler.samples:
+                    path = os.path.join(_settings.profile_dir, f'{self.name}-'
+                                        f'{time.strftime("%Y%m%d-%H%M%S")}-{self.id}.folded')
+                    self.profile = self._profiler.write(path)
+        if _settings.log:
+            event = {'event': 'request', 'request': self.name, 'request_id': self.id,
+                     'seconds': round(self.seconds, 6),
+                     'stages': {k: round(v, 6) for k, v in self.stages.items()}}
+            event.update(self.labels)
+            if exc_type is not None:
+                event['error'] = exc_type.__name__
+            if self.profile:
+                event['profile'] = self.profile
+            _log(event)
+        return False
+
+
+def stage(name, **labels):
+    """Context manager timing one processing stage"""
+    if not _settings.enabled:
+        return _NOOP
+    return _Stage(name, tuple(sorted(labels.items())))
+
+
+def request(name, **labels):
+    """Context manager around a whole user-facing request (see module docstring)"""
+    if not _settings.enabled:
+        return _NOOP
+    return _Request(name, tuple(sorted(labels.items())))
+
+
+def timed(name, **labels):
+    """Decorator: time every call of the function as a stage"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1, **labels):
+    """Add value to a counter (name should end in _total)"""
+    if _settings.enabled:
+        REGISTRY.inc(name, value, tuple(sorted(labels.items())))
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+def prometheus_text():
+    return REGISTRY.prometheus_text()
+
+
+def format_stages(stages):
+    """'transcribe 2.31s · tokenize 0.4ms · ...' for a request's stage breakdown"""
+    return ' · '.join(f'{name} {seconds:.2f}s' if seconds >= 1 else f'{name} {seconds * 1000:.1f}ms'
+                      for name, seconds in stages.items())
+
+
+# ----------------------------------------------------------------------
+# Exporter
+# ----------------------------------------------------------------------
+
+def serve(port, host='127.0.0.1'):
+    """
+    Serve GET /metrics (Prometheus) and /metrics.json on a daemon thread
+
+    Idempotent per port, so Streamlit reruns can call it every time.
+    """
+    if port in _servers:
+        return _servers[port]
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path == '/metrics':
+                body = prometheus_text().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif path == '/metrics.json':
+                body = json.dumps(snapshot()).encode('utf-8')
+                content_type = 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True).start()
+    _servers[port] = server
+    return server
+
+
+def serve_from_env():
+    """serve() on $SCAM_METRICS_PORT when it is set (None otherwise)"""
+    port = os.environ.get('SCAM_METRICS_PORT')
+    if not port or not _settings.enabled:
+        return None
+    try:
+        return serve(int(port))
+    except OSError:
+        # Another process (e.g. a second Streamlit session server) owns the port
+        return None
+
+
+if os.environ.get('SCAM_METRICS_LOG'):
+    configure(log=os.environ['SCAM_METRICS_LOG'])
+if os.environ.get('SCAM_PROFILE_SLOW_MS'):
+    configure(slow_ms=float(os.environ['SCAM_PROFILE_SLOW_MS']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score corpus messages and print the stage metrics")
+    parser.add_argument('--messages', type=int, default=2000, help='messages to score, one request each')
+    parser.add_argument('--engine', choices=['sparse', 'numpy'], default='numpy')
+    parser.add_argument('--format', choices=['prometheus', 'json'], default='prometheus')
+    parser.add_argument('--slow-ms', type=float, default=None,
+                        help='profile requests and dump flame graphs of those slower than this')
+    args = parser.parse_args()
+
+    from corpus_cache import CorpusCache
+    from pipeline import load_pipeline
+
+    if args.slow_ms is not None:
+        configure(slow_ms=args.slow_ms)
+    pipeline = load_pipeline(engine=args.engine)
+    data = CorpusCache().load_all(balance=False)
+    if data is None:
+        return
+    for message in data['message'].astype(str).head(args.messages):
+        with request('cli.score', engine=args.engine):
+            pipeline.predict([message])
+    if args.format == 'json':
+        print(json.dumps(snapshot(), indent=2))
+    else:
+        print(prometheus_text(), end='')
+
+
+if __name__ == "__main__":
+    main()
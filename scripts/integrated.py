@@ -1,13 +1,22 @@
-import whisper
+import os
 import streamlit as st
-import pickle
-from text_processor import PreProcessText
+import instrumentation
+from pipeline import load_pipeline
+from whisper_pool import DEFAULT_MODEL, PoolBusy, TranscriptionPool, save_upload
+from audio_io import SAMPLE_RATE, open_audio
+from streaming_verdict import StreamingVerdict, format_timestamp
+from transcription_backends import WhisperBackend
+from transcript_cache import TranscriptCache
+from vad import speech_view
+from diarization import assign_speakers, diarize, score_by_speaker
+
+# Sidebar choice -> diarization caller rule
+CALLER_CHOICES={"speaks the most":'longest',"speaks first":'first',"speaks second":'second'}
 
 #  PREDICTION MODEL
 
 
-tfidf=pickle.load(open('vectorizer.pkl','rb'))
-prediction_model=pickle.load(open('model.pkl','rb'))
+pipeline=load_pipeline(engine='numpy')
 
 # st.title("Transcript app")
 # # upload audio file
@@ -76,15 +85,67 @@ prediction_model=pickle.load(open('model.pkl','rb'))
 
 # new
 
+@st.cache_resource
+def get_transcription_pool():
+    # One warm pool per server process, shared by every rerun and session
+    return TranscriptionPool(DEFAULT_MODEL, workers=2, max_queue=8)
+
+
+@st.cache_resource
+def get_transcript_cache():
+    return TranscriptCache()
+
+
+def transcribe_upload(backend,audio_file,vad=True):
+    # Content-addressed: the same recording is only decoded once per model
+    def transcribe():
+        if not vad:
+            audio_path=save_upload(audio_file)
+            try:
+                return backend.transcribe(audio_path)
+            finally:
+                os.remove(audio_path)
+        # Only speech goes to Whisper; the decoded PCM is shared with the other views
+        speech,time_map,skipped=speech_view(open_audio(audio_file))
+        if len(speech)==0:
+            return {'text':'','segments':[],'skipped_fraction':skipped}
+        result=backend.transcribe_samples(speech[:])
+        for segment in result.get('segments',[]):
+            # Timestamps on the original recording, not the compacted speech
+            segment['start']=time_map.to_original(segment['start'])
+            segment['end']=time_map.to_original(segment['end'])
+        result['skipped_fraction']=skipped
+        return result
+    backend_id=backend.backend_id+('+vad' if vad else '')
+    return get_transcript_cache().get_or_transcribe(audio_file,backend_id,transcribe)
+
+
+def score_speakers(audio_file,segments,caller_rule='longest'):
+    # Diarize the call and score each speaker's side on its own
+    segments=assign_speakers(diarize(open_audio(audio_file)),[dict(segment) for segment in segments])
+    sides,caller=score_by_speaker(pipeline,segments,caller_rule)
+    return segments,sides,caller
+
+
 def main():
     st.title("FlukeFinders")
+    instrumentation.serve_from_env()
     # file uploader
     # uploaded_file=st.file_uploader("upload an audio file",type=["mp3"])
     audio_file=st.file_uploader("Upload audio",type=["wav","mp3","m4a","mp4"])
-    model=whisper.load_model("base")
+    backend=WhisperBackend(pool=get_transcription_pool(),queue_timeout=30)
     st.sidebar.text("whisper model loaded")
-
-    if audio_file is not None:
+    early_verdict=st.sidebar.checkbox("Early verdict (long recordings)")
+    vad=st.sidebar.checkbox("Skip silence (VAD)",value=True)
+    per_speaker=st.sidebar.checkbox("Score each speaker separately")
+    caller_rule=CALLER_CHOICES[st.sidebar.selectbox("Caller",list(CALLER_CHOICES),disabled=not per_speaker)]
+    # Defaults to the tuned operating point; used by the streaming and the whole-file verdict
+    threshold=st.sidebar.slider("Scam threshold",0.05,0.99,float(pipeline.threshold))
+
+    if audio_file is not None and early_verdict:
+        if st.button("Analyze audio"):
+            analyze_streaming(backend,audio_file,threshold,vad)
+    elif audio_file is not None:
         if st.button("Analyze audio"):
             col1,col2,col3=st.columns([0.4,0.5,0.3])
 
@@ -92,7 +153,20 @@ def main():
                 st.info("Transcription below")
                 st.sidebar.success("transcribing audio")
                 st.text(audio_file.name)
-                transcription=model.transcribe(audio_file.name)
+                try:
+                    with instrumentation.request('integrated.transcribe') as transcribing:
+                        transcription=transcribe_upload(backend,audio_file,vad)
+                except PoolBusy as e:
+                    st.error(f"Server busy, please retry: {e}")
+                    st.stop()
+                if transcription['cached']:
+                    stats=get_transcript_cache().stats()
+                    st.sidebar.text(f"transcript from cache (hit rate {stats['hit_rate']:.0%})")
+                elif 'decode_s' in transcription:
+                    st.sidebar.text(f"queue wait {transcription['queue_wait_s']:.1f}s, "
+                                    f"decode {transcription['decode_s']:.1f}s")
+                if 'skipped_fraction' in transcription:
+                    st.sidebar.text(f"silence skipped: {transcription['skipped_fraction']:.0%}")
                 st.markdown(transcription['text'])
                 
 
@@ -106,10 +180,15 @@ def main():
             
             with col2:
                 input_message=transcription["text"]
-                obj=PreProcessText()
-                transform_message=obj.remove_punctuation(input_message)
-                vector_input=tfidf.transform([transform_message])
-                result=prediction_model.predict(vector_input)[0]
+                with instrumentation.request('integrated.score') as scoring:
+                    probability=pipeline.scam_probability([input_message])[0]
+                    sides,caller={},None
+                    if per_speaker and transcription.get('segments'):
+                        # The verdict follows the caller's side; the whole call when it is unclear
+                        segments,sides,caller=score_speakers(audio_file,transcription['segments'],caller_rule)
+                        if caller is not None:
+                            probability=sides[caller]['scam_probability']
+                    result=pipeline.labels([probability],threshold)[0]
                 
             
                 st.info("your uploaded audio is below")
@@ -135,9 +214,53 @@ def main():
                     st.header("Alert this can be a Scam")
                 else:
                     st.header("There is No Scam")
+                st.text(f"scam probability {probability:.1%}")
+                for speaker,side in sorted(sides.items()):
+                    marker=" (caller)" if speaker==caller else ""
+                    st.text(f"speaker {speaker}{marker}: {side['seconds']:.0f}s, "
+                            f"scam probability {side['scam_probability']:.2f}")
+                if sides and caller is None:
+                    st.caption("caller unclear - the whole call was scored")
+                # Where the time went (empty when SCAM_METRICS=0)
+                stages={**transcribing.stages,**scoring.stages}
+                if stages:
+                    st.caption(f"{transcribing.seconds+scoring.seconds:.2f}s: "
+                               f"{instrumentation.format_stages(stages)}")
                 
                 
 
+def analyze_streaming(backend,audio_file,threshold,vad=True):
+    # Decode 30 s windows and stop as soon as the running score crosses the threshold;
+    # the recording stays memory-mapped, only the current window is in memory
+    audio=open_audio(audio_file)
+    verdict=StreamingVerdict(pipeline,backend.transcribe_samples,threshold=threshold,vad=vad)
+    progress=st.progress(0.0)
+    status=st.empty()
+    duration=len(audio)/SAMPLE_RATE
+
+    def show(update):
+        progress.progress(min(update['end_s']/duration,1.0) if duration else 1.0)
+        status.text(f"{format_timestamp(update['end_s'])} decoded - "
+                    f"scam probability {update['scam_probability']:.2f}")
+
+    with instrumentation.request('integrated.streaming') as timing:
+        result=verdict.analyze(audio,on_update=show)
+    st.audio(audio_file)
+    st.sidebar.text(f"silence skipped: {result['skipped_fraction']:.0%}")
+    if timing.stages:
+        st.sidebar.caption(instrumentation.format_stages(timing.stages))
+    if result['scam']:
+        st.header("Alert this can be a Scam")
+        st.text(f"decided after {format_timestamp(result['decided_at_s'])} of "
+                f"{format_timestamp(result['duration_s'])} ({result['elapsed_s']:.1f}s)")
+        for segment in result['offending_segments']:
+            st.markdown(f"**{format_timestamp(segment['start'])}-{format_timestamp(segment['end'])}** "
+                        f"{segment['text']}")
+    else:
+        st.header("There is No Scam")
+    st.markdown(result['text'])
+
+
 if __name__ == "__main__":
     main()
 
@@ -1,30 +1,40 @@
 import streamlit as st
-import websockets
 import asyncio
-import json
-import pyaudio
 import os
+import instrumentation
 from pathlib import Path
+from pipeline import load_pipeline
+from live_session import LiveSession, MicrophoneSource, RollingScamScore, WavFileSource
+from transcription_backends import ASSEMBLYAI_STREAMING_URL, AssemblyAIBackend, get_backend
 
 if 'text' not in st.session_state:
 	st.session_state['text'] = 'Listening...'
 	st.session_state['run'] = False
 
-# Audio parameters 
+
+# Prometheus /metrics when SCAM_METRICS_PORT is set (see instrumentation.py)
+instrumentation.serve_from_env()
+
+
+@st.cache_resource
+def get_pipeline():
+	return load_pipeline(engine='numpy')
+
+
+# Audio parameters
 st.sidebar.header('Audio Parameters')
 
 FRAMES_PER_BUFFER = int(st.sidebar.text_input('Frames per buffer', 3200))
-FORMAT = pyaudio.paInt16
-CHANNELS = 1
 RATE = int(st.sidebar.text_input('Rate', 16000))
-p = pyaudio.PyAudio()
-stream = p.open(
-   format=FORMAT,
-   channels=CHANNELS,
-   rate=RATE,
-   input=True,
-   frames_per_buffer=FRAMES_PER_BUFFER
-)
+
+# Source / service (a WAV file + the mock backend or mock server work offline)
+st.sidebar.header('Source')
+SOURCE = st.sidebar.radio('Audio source', ['Microphone', 'WAV file'])
+WAV_PATH = st.sidebar.text_input('WAV file', 'ham1.wav')
+BACKEND = st.sidebar.selectbox('Transcription backend', ['assemblyai', 'whisper', 'mock'])
+URL = st.sidebar.text_input('AssemblyAI websocket', ASSEMBLYAI_STREAMING_URL)
+THRESHOLD = st.sidebar.slider('Scam alert threshold', 0.05, 0.99, float(get_pipeline().threshold))
+VAD = st.sidebar.checkbox('Skip silence (VAD)', value=True)
 
 # Start/stop audio transmission
 def start_listening():
@@ -48,112 +58,83 @@ col1, col2 = st.columns(2)
 col1.button('Start', on_click=start_listening)
 col2.button('Stop', on_click=stop_listening)
 
+# Live scam score
+st.markdown("---")
+st.subheader("🚨 Scam Score")
+alert_placeholder = st.empty()
+score_placeholder = st.progress(0.0)
+turns_placeholder = st.empty()
+stages_placeholder = st.empty()
+
 # Display transcription output area
 st.markdown("---")
 st.subheader("📝 Transcription Output")
 transcription_placeholder = st.empty()
 status_placeholder = st.empty()
 
-# Send audio (Input) / Receive transcription (Output)
-async def send_receive():
-	URL = f"wss://streaming.assemblyai.com/v3/ws?sample_rate={RATE}&model=default"
-
-	print(f'Connecting websocket to url ${URL}')
-
-	headers = {"Authorization": st.secrets['api_key']}
-	
-	async with websockets.connect(
-		URL,
-		subprotocols=["chat"],
-		additional_headers=headers,
-		ping_interval=5,
-		ping_timeout=20
-	) as _ws:
-
-		r = await asyncio.sleep(0.1)
-		print("Receiving messages ...")
 
-		session_begins = await _ws.recv()
-		print(session_begins)
-		print("Sending messages ...")
+def show_status(text):
+	print(text)
+	if text == 'connected':
 		status_placeholder.success("✅ Connected to transcription service")
-
-
-		async def send():
-			while st.session_state['run']:
-				try:
-					data = stream.read(FRAMES_PER_BUFFER)
-					# Send raw binary audio data, not JSON
-					r = await _ws.send(data)
-
-				except websockets.exceptions.ConnectionClosedError as e:
-					print(f"Connection closed: {e}")
-					status_placeholder.warning("⚠️ Connection closed")
-					break
-
-				except Exception as e:
-					print(f"Error in send: {e}")
-					status_placeholder.error(f"❌ Error: {e}")
-					break
-
-				r = await asyncio.sleep(0.01)
-
-
-		async def receive():
-			while st.session_state['run']:
-				try:
-					result_str = await _ws.recv()
-					result_json = json.loads(result_str)
-					
-					# Skip non-transcript messages
-					if result_json.get('type') == 'Begin':
-						print(f"Session started: {result_json.get('id')}")
-						continue
-					
-					if 'text' in result_json and result_json['text']:
-						result = result_json['text']
-						message_type = result_json.get('message_type', 'Unknown')
-
-						if message_type == 'FinalTranscript':
-							print(f"Final: {result}")
-							st.session_state['text'] = result
-							transcription_placeholder.success(f"**Final:** {result}")
-
-							# Save to file
-							transcription_txt = open('transcription.txt', 'a')
-							transcription_txt.write(result)
-							transcription_txt.write(' ')
-							transcription_txt.close()
-						
-						elif message_type == 'PartialTranscript':
-							print(f"Partial: {result}")
-							transcription_placeholder.info(f"*Partial:* {result}")
-
-
-				except websockets.exceptions.ConnectionClosedError as e:
-					print(f"Connection closed: {e}")
-					status_placeholder.warning("⚠️ Connection closed")
-					break
-
-				except json.JSONDecodeError as e:
-					print(f"JSON decode error: {e}")
-					break
-
-				except KeyError as e:
-					print(f"Key error: {e}")
-					break
-
-				except Exception as e:
-					print(f"Error in receive: {e}")
-					status_placeholder.error(f"❌ Error: {e}")
-					break
-			
-		send_result, receive_result = await asyncio.gather(send(), receive())
-
-
-asyncio.run(send_receive())
+	else:
+		status_placeholder.warning(f"⚠️ {text}")
+
+
+def show_partial(text):
+	transcription_placeholder.info(f"*Partial:* {text}")
+
+
+def show_final(update):
+	print(f"Final [{update['score']:.2f}]: {update['text']}")
+	st.session_state['text'] = update['text']
+	transcription_placeholder.success(f"**Final:** {update['text']}")
+	score_placeholder.progress(update['score'])
+	if update['alert']:
+		alert_placeholder.error(f"⚠️ Possible scam - score {update['score']:.2f} "
+								f"(peak {update['peak']:.2f})")
+	else:
+		alert_placeholder.info(f"Score {update['score']:.2f} (peak {update['peak']:.2f})")
+	turns_placeholder.markdown('\n'.join(
+		f"- `{turn['scam_probability']:.2f}` {turn['text']}" for turn in session.scorer.turns[-6:]))
+	if update['stages']:
+		stages_placeholder.caption(f"last turn scored in {instrumentation.format_stages(update['stages'])}")
+
+
+if st.session_state['run']:
+	if SOURCE == 'WAV file':
+		source = WavFileSource(WAV_PATH, rate=RATE, frames_per_buffer=FRAMES_PER_BUFFER)
+	else:
+		source = MicrophoneSource(rate=RATE, frames_per_buffer=FRAMES_PER_BUFFER)
+
+	if BACKEND == 'assemblyai':
+		print(f'Connecting websocket to url {URL}')
+		api_key = st.secrets.get('api_key') if URL == ASSEMBLYAI_STREAMING_URL else None
+		backend = AssemblyAIBackend(api_key=api_key, url=URL)
+	else:
+		backend = get_backend(BACKEND)
+
+	session = LiveSession(
+		source,
+		RollingScamScore(get_pipeline(), threshold=THRESHOLD),
+		backend,
+		rate=RATE,
+		vad=VAD,
+		transcript_path='transcription.txt',
+		on_status=show_status,
+		on_partial=show_partial,
+		on_final=show_final)
+
+	# Capture runs on its own thread; Stop reruns the script, which ends the session
+	stats = asyncio.run(session.run())
+	st.session_state['run'] = False
+	if VAD:
+		st.sidebar.text(f"silence not sent: {stats['vad_skipped']:.0%}")
+	if stats['dropped']:
+		status_placeholder.warning(f"⚠️ {stats['dropped']} of {stats['captured']} audio chunks "
+								   f"dropped (network slower than capture)")
 
 if Path('transcription.txt').is_file():
 	st.markdown('### Download')
 	download_transcription()
-	os.remove('transcription.txt')
\ No newline at end of file
+	os.remove('transcription.txt')
@@ -0,0 +1,300 @@
+"""
+Live call monitoring: audio capture -> streaming transcription -> scam score
+The asyncio side of live.py, kept free of Streamlit so it can run headless
+
+    MicrophoneSource / WavFileSource   capture on a PortAudio callback or a
+                                       reader thread, never on the event loop
+    AudioQueue                         bounded asyncio queue fed from that
+                                       thread; full -> chunk dropped and counted
+    RollingScamScore                   scores every final transcript and the
+                                       last few turns of the conversation
+    LiveSession                        feeds the queue (through a StreamingVad
+                                       unless vad=False) to a transcription
+                                       backend's stream() and scores the finals
+
+Any backend from transcription_backends.py works: AssemblyAI (the real
+service or scripts/mock_transcription_server.py), local Whisper, or the
+in-process mock.
+
+Usage (from the project root):
+    python scripts/live_session.py --wav ham1.wav --backend mock
+    python scripts/mock_transcription_server.py &
+    python scripts/live_session.py --wav ham1.wav --url ws://localhost:8765
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+import numpy as np
+from instrumentation import request
+from transcription_backends import ASSEMBLYAI_STREAMING_URL, BACKENDS, get_backend
+from vad import StreamingVad
+
+DEFAULT_RATE = 16000
+DEFAULT_FRAMES_PER_BUFFER = 3200
+
+
+class AudioQueue(object):
+    """
+    Bounded queue between a capture thread and the event loop
+
+    The capture side never blocks: when the sender falls behind and the
+    queue is full, the new chunk is dropped and counted, so the audio
+    callback keeps its real-time deadline.
+    """
+
+    def __init__(self, loop, maxsize=50):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.captured = 0
+        self.dropped = 0
+
+    def put_threadsafe(self, chunk):
+        """Called from the capture thread (None marks the end of the stream)"""
+        self.loop.call_soon_threadsafe(self._put, chunk)
+
+    def _put(self, chunk):
+        if chunk is None:
+            # The end marker must get through even if the queue is full
+            while self.queue.full():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(None)
+            return
+        self.captured += 1
+        try:
+            self.queue.put_nowait(chunk)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def chunks(self):
+        """Async iterator over queued chunks, ending at the end marker"""
+        while True:
+            chunk = await self.queue.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def stats(self):
+        return {'captured': self.captured, 'dropped': self.dropped,
+                'queued': self.queue.qsize()}
+
+
+class MicrophoneSource(object):
+    """PyAudio input stream in callback mode"""
+
+    def __init__(self, rate=DEFAULT_RATE, frames_per_buffer=DEFAULT_FRAMES_PER_BUFFER):
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self._audio = None
+        self._stream = None
+
+    def start(self, audio_queue):
+        import pyaudio
+
+        def callback(in_data, frame_count, time_info, status):
+            audio_queue.put_threadsafe(in_data)
+            return None, pyaudio.paContinue
+
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=self.rate,
+                                        input=True, frames_per_buffer=self.frames_per_buffer,
+                                        stream_callback=callback)
+        self._stream.start_stream()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._audio.terminate()
+            self._stream = None
+
+
+class WavFileSource(object):
+    """
+    Plays an audio file into the queue from a reader thread
+
+    The file is decoded to 16-bit mono PCM at `rate` (WAV needs no ffmpeg).
+    With realtime=True chunks are paced like a microphone; otherwise they are
+    pushed as fast as possible (useful for exercising the drop accounting).
+    """
+
+    def __init__(self, path, rate=DEFAULT_RATE, frames_per_buffer=DEFAULT_FRAMES_PER_BUFFER,
+                 realtime=True):
+        self.path = path
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.realtime = realtime
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _pcm(self):
+        from audio_io import load_audio
+        samples = load_audio(self.path, sr=self.rate)
+        return (np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes()
+
+    def start(self, audio_queue):
+        pcm = self._pcm()
+        chunk_bytes = self.frames_per_buffer * 2
+        chunk_seconds = self.frames_per_buffer / self.rate
+
+        def run():
+            started = time.perf_counter()
+            for index, offset in enumerate(range(0, len(pcm), chunk_bytes)):
+                if self._stop.is_set():
+                    break
+                if self.realtime:
+                    delay = started + index * chunk_seconds - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                audio_queue.put_threadsafe(pcm[offset:offset + chunk_bytes])
+            audio_queue.put_threadsafe(None)
+
+        self._thread = threading.Thread(target=run, name='wav-source', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class RollingScamScore(object):
+    """
+    Scam probability of each final transcript and of the recent conversation
+
+    The conversation score is computed on the text of the last `window`
+    turns, so it rises when a call turns into a scam and falls back when
+    the topic changes.
+    """
+
+    def __init__(self, pipeline, window=6, threshold=None):
+        self.pipeline = pipeline
+        self.window = window
+        self.threshold = pipeline.threshold if threshold is None else threshold
+        self.turns = []
+        self.peak = 0.0
+
+    def add(self, text):
+        """Score a final transcript; returns a dict describing the new state"""
+        turn_probability = float(self.pipeline.scam_probability([text])[0])
+        self.turns.append({'text': text, 'scam_probability': turn_probability,
+                           'time': time.time()})
+        recent = ' '.join(turn['text'] for turn in self.turns[-self.window:])
+        score = float(self.pipeline.scam_probability([recent])[0])
+        self.peak = max(self.peak, score)
+        return {'text': text, 'turn_probability': turn_probability, 'score': score,
+                'peak': self.peak, 'alert': score >= self.threshold, 'turns': len(self.turns)}
+
+
+class LiveSession(object):
+    """
+    One streaming transcription session
+
+    Callbacks (all optional, called on the event loop):
+        on_status(str), on_partial(text), on_final(score_dict from RollingScamScore,
+                                                    plus 'stages': seconds per stage)
+    """
+
+    def __init__(self, source, scorer, backend, rate=DEFAULT_RATE, queue_size=50, vad=True,
+                 transcript_path=None, on_status=None, on_partial=None, on_final=None):
+        self.source = source
+        self.vad = StreamingVad(sr=rate) if vad else None
+        self.scorer = scorer
+        self.backend = backend
+        self.rate = rate
+        self.queue_size = queue_size
+        self.transcript_path = transcript_path
+        self.on_status = on_status or (lambda text: None)
+        self.on_partial = on_partial or (lambda text: None)
+        self.on_final = on_final or (lambda update: None)
+        self.audio_queue = None
+
+    def stop(self):
+        """Stop capturing; the session ends once the backend has flushed"""
+        self.source.stop()
+        if self.audio_queue is not None:
+            self.audio_queue.put_threadsafe(None)
+
+    async def _speech_chunks(self):
+        """Queued chunks with silence removed (nothing is sent while nobody speaks)"""
+        async for chunk in self.audio_queue.chunks():
+            if self.vad is None:
+                yield chunk
+                continue
+            speech = self.vad.process(chunk)
+            if speech:
+                yield speech
+
+    async def run(self):
+        self.audio_queue = AudioQueue(asyncio.get_running_loop(), maxsize=self.queue_size)
+        transcript = open(self.transcript_path, 'a') if self.transcript_path else None
+        self.source.start(self.audio_queue)
+        try:
+            async for kind, text in self.backend.stream(self._speech_chunks(), self.rate):
+                if kind == 'begin':
+                    self.on_status('connected')
+                elif kind == 'partial':
+                    self.on_partial(text)
+                elif kind == 'final' and text:
+                    if transcript is not None:
+                        transcript.write(text + ' ')
+                        transcript.flush()
+                    with request('live.turn') as timing:
+                        update = self.scorer.add(text)
+                    update['stages'] = dict(timing.stages)
+                    self.on_final(update)
+        finally:
+            self.source.stop()
+            if transcript is not None:
+                transcript.close()
+        self.on_status('closed')
+        stats = self.audio_queue.stats()
+        stats['vad_skipped'] = self.vad.skipped_fraction if self.vad is not None else 0.0
+        return stats
+
+
+def main():
+    from pipeline import load_pipeline
+
+    parser = argparse.ArgumentParser(description="Score a live (or replayed) call")
+    parser.add_argument('--backend', default='assemblyai', choices=sorted(BACKENDS))
+    parser.add_argument('--url', default=ASSEMBLYAI_STREAMING_URL,
+                        help='AssemblyAI streaming websocket (or the mock server)')
+    parser.add_argument('--api-key', default=None, help='AssemblyAI API key')
+    parser.add_argument('--wav', default=None, help='replay a WAV file instead of the microphone')
+    parser.add_argument('--fast', action='store_true', help='replay faster than real time')
+    parser.add_argument('--rate', type=int, default=DEFAULT_RATE)
+    parser.add_argument('--threshold', type=float, default=None,
+                        help="alert threshold (default: the pipeline's)")
+    parser.add_argument('--no-vad', action='store_true', help='stream silence too')
+    args = parser.parse_args()
+
+    if args.wav:
+        source = WavFileSource(args.wav, rate=args.rate, realtime=not args.fast)
+    else:
+        source = MicrophoneSource(rate=args.rate)
+    scorer = RollingScamScore(load_pipeline(engine='numpy'), threshold=args.threshold)
+
+    def show(update):
+        flag = '  <-- ALERT' if update['alert'] else ''
+        print(f"[{update['score']:.2f}] ({update['turn_probability']:.2f}) {update['text']}{flag}")
+
+    if args.backend == 'assemblyai':
+        backend = get_backend('assemblyai', api_key=args.api_key, url=args.url)
+    else:
+        backend = get_backend(args.backend)
+
+    session = LiveSession(source, scorer, backend, rate=args.rate, vad=not args.no_vad,
+                          on_status=lambda text: print(f"-- {text}"), on_final=show)
+    stats = asyncio.run(session.run())
+    print(f"\nchunks captured {stats['captured']}, dropped {stats['dropped']}, "
+          f"silence not sent {stats['vad_skipped']:.0%}, peak score {scorer.peak:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Local stand-in for the AssemblyAI streaming websocket
+Lets live.py / live_session.py run end to end without an API key or network
+
+Protocol (subset of AssemblyAI v3):
+    server -> {"type": "Begin", "id": ...} on connect
+    client -> binary 16-bit PCM chunks, then {"type": "Terminate"}
+    server -> {"type": "Turn", "transcript": ..., "end_of_turn": false} while
+              a line is being "spoken", then the same with end_of_turn true
+    server -> {"type": "Termination", "audio_duration_seconds": ...}
+
+Text comes from a script (one line per turn) through the same
+ScriptedTranscript as the in-process MockBackend. A new line starts every
+--turn-seconds of received audio, so the pace follows the client's audio.
+
+Usage (from the project root):
+    python scripts/mock_transcription_server.py --port 8765 [--script call.txt]
+"""
+
+import argparse
+import asyncio
+import json
+import uuid
+from urllib.parse import parse_qs, urlparse
+from transcription_backends import DEFAULT_SCRIPT, ScriptedTranscript
+
+
+
+def make_handler(script, turn_seconds):
+    async def handler(ws):
+        query = parse_qs(urlparse(ws.request.path).query)
+        rate = int(query.get('sample_rate', ['16000'])[0])
+        scripted = ScriptedTranscript(script, turn_seconds, rate)
+
+        await ws.send(json.dumps({'type': 'Begin', 'id': str(uuid.uuid4())}))
+        async for message in ws:
+            if isinstance(message, str):
+                if json.loads(message).get('type') == 'Terminate':
+                    break
+                continue
+            turn = scripted.turn
+            kind, text = scripted.feed(len(message))
+            await ws.send(json.dumps({'type': 'Turn', 'transcript': text,
+                                      'end_of_turn': kind == 'final', 'turn_order': turn}))
+        await ws.send(json.dumps({'type': 'Termination',
+                                  'audio_duration_seconds': scripted.received / (rate * 2)}))
+    return handler
+
+
+async def serve(host, port, script, turn_seconds):
+    import websockets
+
+    async with websockets.serve(make_handler(script, turn_seconds), host, port):
+        print(f"Mock transcription server on ws://{host}:{port}")
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake streaming transcription websocket")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--script', default=None, help='text file, one turn per line')
+    parser.add_argument('--turn-seconds', type=float, default=3.0,
+                        help='seconds of audio per transcript line')
+    args = parser.parse_args()
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, encoding='utf-8') as f:
+            script = [line.strip() for line in f if line.strip()]
+    try:
+        asyncio.run(serve(args.host, args.port, script, args.turn_seconds))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Cross-validated model selection for the scam classifier
+Stratified k-fold evaluation of a hyperparameter grid, run in parallel
+
+Grid (defaults, all overridable):
+    alpha       MultinomialNB smoothing            0.1 0.5 1.0
+    tfidf       TF-IDF weighting on/off            on off
+    ngram       1 = unigrams, 2 = unigrams+bigrams 1 2
+    min_df      minimum document frequency         1 2 5
+
+The corpus is deduplicated first (dedup.py), so copies of a held-out message
+never sit in the training fold. Every message is tokenized once
+(pre-tokenized rows come from the corpus cache) and turned into one unigram
+and one bigram count matrix over the whole corpus. Each (configuration, fold) task then only slices those
+matrices: min_df and the idf weights are computed from the training fold
+alone, so held-out rows never leak into the vocabulary or the weights.
+Tasks run on a process pool; every worker receives the matrices once.
+
+Scores are for the scam class (label 0): precision, recall and F1 on the
+held-out folds (mean and std), plus fit time per fold and predict time
+per message. The report is printed and written as CSV.
+
+The saved pipeline only serves unigram features; bigram configurations
+show what adding them would buy.
+
+Usage (from the project root):
+    python scripts/model_selection.py                       # full grid, 5 folds, all cores
+    python scripts/model_selection.py --folds 3 --alpha 0.1 1.0 --ngram 1 --workers 4
+    python scripts/model_selection.py --output model_selection.csv --sort recall
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfTransformer
+from sklearn.model_selection import StratifiedKFold
+from sklearn.naive_bayes import MultinomialNB
+from pipeline import SCAM_LABEL
+
+DEFAULT_GRID = {
+    'alpha': (0.1, 0.5, 1.0),
+    'tfidf': (True, False),
+    'ngram': (1, 2),
+    'min_df': (1, 2, 5),
+}
+# What retrain_model.py trains today
+CURRENT_CONFIG = {'alpha': 1.0, 'tfidf': True, 'ngram': 1, 'min_df': 1}
+METRICS = ('precision', 'recall', 'f1', 'accuracy')
+
+_worker_data = None
+
+
+def count_matrices(token_lists):
+    """
+    Unigram and bigram count matrices for tokenized messages
+
+    Returns:
+        (unigrams CSR (n_docs, n_terms), bigrams CSR (n_docs, n_pairs))
+    """
+    vocabulary = {}
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64,
+                          count=len(token_lists))
+    ids = np.fromiter((vocabulary.setdefault(token, len(vocabulary))
+                       for tokens in token_lists for token in tokens),
+                      dtype=np.int64, count=int(lengths.sum()))
+    docs = np.repeat(np.arange(len(token_lists)), lengths)
+    unigrams = sp.csr_matrix((np.ones(len(ids)), (docs, ids)),
+                             shape=(len(token_lists), len(vocabulary)))
+
+    # Adjacent pairs within the same message, encoded as one integer each
+    same_doc = docs[1:] == docs[:-1]
+    pairs = ids[:-1][same_doc] * len(vocabulary) + ids[1:][same_doc]
+    pair_ids, columns = np.unique(pairs, return_inverse=True)
+    bigrams = sp.csr_matrix((np.ones(len(columns)), (docs[1:][same_doc], columns)),
+                            shape=(len(token_lists), len(pair_ids)))
+    unigrams.sum_duplicates()
+    bigrams.sum_duplicates()
+    return unigrams, bigrams
+
+
+def _init_worker(unigrams, bigrams, labels):
+    global _worker_data
+    _worker_data = {1: unigrams, 2: sp.hstack([unigrams, bigrams], format='csr'),
+                    'labels': labels}
+
+
+def evaluate_fold(config, train_index, test_index):
+    """
+    Fit one configuration on a training fold and score its held-out fold
+
+    Returns:
+        dict with the METRICS, fit_s, predict_s, n_features
+    """
+    X = _worker_data[config['ngram']]
+    y = _worker_data['labels']
+
+    start = time.perf_counter()
+    X_train = X[train_index]
+    keep = np.flatnonzero(X_train.getnnz(axis=0) >= config['min_df'])
+    X_train = X_train[:, keep]
+    tfidf = None
+    if config['tfidf']:
+        tfidf = TfidfTransformer().fit(X_train)
+        X_train = tfidf.transform(X_train)
+    model = MultinomialNB(alpha=config['alpha']).fit(X_train, y[train_index])
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    X_test = X[test_index][:, keep]
+    if tfidf is not None:
+        X_test = tfidf.transform(X_test)
+    predicted = model.predict(X_test)
+    predict_s = time.perf_counter() - start
+
+    actual = y[test_index] == SCAM_LABEL
+    flagged = predicted == SCAM_LABEL
+    tp = int(np.sum(actual & flagged))
+    precision = tp / max(int(flagged.sum()), 1)
+    recall = tp / max(int(actual.sum()), 1)
+    return {
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        'accuracy': float(np.mean(actual == flagged)),
+        'fit_s': fit_s,
+        'predict_s': predict_s / len(test_index),
+        'n_features': len(keep),
+    }
+
+
+def expand_grid(grid):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def cross_validate(unigrams, bigrams, labels, configs, folds=5, workers=None, random_state=42):
+    """
+    Evaluate every configuration on the same stratified folds
+
+    Returns:
+        list of result dicts (config keys + '<metric>_mean', '<metric>_std',
+        'fit_s', 'predict_us', 'n_features'), in configs order
+    """
+    labels = np.asarray(labels)
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state)
+                  .split(np.zeros(len(labels)), labels))
+    tasks = [(config, train, test) for config in configs for train, test in splits]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        _init_worker(unigrams, bigrams, labels)
+        scores = [evaluate_fold(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(unigrams, bigrams, labels)) as pool:
+            scores = list(pool.map(evaluate_fold, *zip(*tasks), chunksize=max(1, folds // 2)))
+
+    results = []
+    for i, config in enumerate(configs):
+        fold_scores = scores[i * folds:(i + 1) * folds]
+        result = dict(config)
+        for metric in METRICS:
+            values = np.array([s[metric] for s in fold_scores])
+            result[f'{metric}_mean'] = float(values.mean())
+            result[f'{metric}_std'] = float(values.std())
+        result['fit_s'] = float(np.mean([s['fit_s'] for s in fold_scores]))
+        result['predict_us'] = float(np.mean([s['predict_s'] for s in fold_scores])) * 1e6
+        result['n_features'] = int(np.mean([s['n_features'] for s in fold_scores]))
+        results.append(result)
+    return results
+
+
+def write_report(results, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    from corpus_cache import CorpusCache
+
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--alpha', type=float, nargs='+', default=DEFAULT_GRID['alpha'])
+    parser.add_argument('--tfidf', choices=['on', 'off'], nargs='+', default=['on', 'off'])
+    parser.add_argument('--ngram', type=int, choices=[1, 2], nargs='+', default=DEFAULT_GRID['ngram'])
+    parser.add_argument('--min-df', type=int, nargs='+', default=DEFAULT_GRID['min_df'])
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    parser.add_argument('--sort', choices=METRICS, default='f1', help='rank configurations by')
+    parser.add_argument('--output', default='model_selection.csv', help='CSV report')
+    args = parser.parse_args()
+
+    data = CorpusCache().load_all(balance=False, dedup=True)
+    if data is None:
+        return
+
+    start = time.perf_counter()
+    unigrams, bigrams = count_matrices(list(data['tokens']))
+    print(f"\nCount matrices: {unigrams.shape[1]} unigrams, {bigrams.shape[1]} bigrams "
+          f"({time.perf_counter() - start:.2f}s, tokenized once)")
+
+    grid = {'alpha': args.alpha, 'tfidf': [t == 'on' for t in args.tfidf],
+            'ngram': args.ngram, 'min_df': args.min_df}
+    configs = expand_grid(grid)
+    print(f"Evaluating {len(configs)} configurations x {args.folds} folds...")
+    start = time.perf_counter()
+    results = cross_validate(unigrams, bigrams, data['label'].to_numpy(), configs,
+                             folds=args.folds, workers=args.workers)
+    wall = time.perf_counter() - start
+    results.sort(key=lambda r: r[f'{args.sort}_mean'], reverse=True)
+    write_report(results, args.output)
+
+    print("\n" + "="*70)
+    print(f"MODEL SELECTION - {args.folds}-fold CV, scam class, sorted by {args.sort} "
+          f"({wall:.1f}s)")
+    print("="*70)
+    print(f"  {'alpha':>5} {'tfidf':>5} {'ngram':>5} {'min_df':>6} {'precision':>15} "
+          f"{'recall':>15} {'f1':>7} {'fit s':>6} {'pred µs':>7}")
+    for r in results:
+        marker = '  <- current' if all(r[k] == v for k, v in CURRENT_CONFIG.items()) else ''
+        print(f"  {r['alpha']:>5} {'on' if r['tfidf'] else 'off':>5} {r['ngram']:>5} "
+              f"{r['min_df']:>6} {r['precision_mean']:7.4f}±{r['precision_std']:.4f} "
+              f"{r['recall_mean']:7.4f}±{r['recall_std']:.4f} {r['f1_mean']:7.4f} "
+              f"{r['fit_s']:6.2f} {r['predict_us']:7.1f}{marker}")
+    print(f"\n✓ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+Persisted inference pipeline: tokenizer config + vocabulary + idf + Naive Bayes
+Shared by training and every prediction entry point so both use the same features
+
+On disk a pipeline is a directory of plain arrays instead of pickles:
+    manifest.json              format version, tokenizer and feature settings
+    vocabulary.json            terms in column order (empty in hashing mode)
+    idf.npy                    idf weights (only when TF-IDF is used)
+    feature_log_prob.npy       MultinomialNB.feature_log_prob_
+    class_log_prior.npy        MultinomialNB.class_log_prior_
+    classes.npy                class labels (0 = scam, 1 = legitimate)
+The .npy files are memory-mapped on load, so cold start is a few milliseconds.
+
+Two inference engines give identical predictions and probabilities:
+    'sparse'   builds a CSR matrix per call - best for batches
+    'numpy'    dict lookups + a gather of feature_log_prob rows per message,
+               skipping sparse construction - best for single messages
+
+Decision settings (optional, in manifest.json):
+    calibration   Platt scaling of the NB scam log-odds, fit on held-out data
+                  (see calibration.py); scam_probability/predict_proba return
+                  calibrated probabilities when present
+    threshold     operating point: a message is labelled scam when its scam
+                  probability >= threshold (default 0.5); moving it trades
+                  false positives for recall without retraining
+
+Two feature modes:
+    vocabulary  one column per known term (CountVectorizer.vocabulary_)
+    hashing     2^k hashed columns, no vocabulary (see hashing_features.py)
+
+Usage (from the project root):
+    python scripts/pipeline.py --convert     # build scam_pipeline/ from vectorizer.pkl + model.pkl
+"""
+
+import collections
+import json
+import os
+import shutil
+import sys
+import numpy as np
+import scipy.sparse as sp
+from instrumentation import stage
+from text_processor import TOKENIZER_VERSION, TokenizerEngine
+
+PIPELINE_FORMAT_VERSION = 1
+DEFAULT_PIPELINE_DIR = 'scam_pipeline'
+SCAM_LABEL = 0
+DEFAULT_THRESHOLD = 0.5
+ENGINES = ('sparse', 'numpy')
+
+_ARRAYS = ('feature_log_prob', 'class_log_prior', 'classes')
+
+
+class ScamPipeline(object):
+    """
+    Tokenize -> count -> (TF-IDF) -> MultinomialNB, backed by NumPy arrays
+    """
+
+    def __init__(self, vocabulary, feature_log_prob, class_log_prior, classes,
+                 idf=None, norm=None, sublinear_tf=False, language='english',
+                 tokenizer_version=TOKENIZER_VERSION, metadata=None, engine='sparse',
+                 hashing=None, calibration=None, threshold=DEFAULT_THRESHOLD):
+        """
+        Args:
+            vocabulary: list of terms (column order) or dict term -> column
+                        (None in hashing mode)
+            feature_log_prob: (n_classes, n_features) array
+            class_log_prior: (n_classes,) array
+            classes: (n_classes,) array of labels
+            idf: (n_features,) idf weights, or None to use raw counts
+            norm: 'l2', 'l1' or None (row normalization after weighting)
+            sublinear_tf: replace tf with 1 + log(tf)
+            language: NLTK stopword language used by the tokenizer
+            tokenizer_version: TOKENIZER_VERSION the vocabulary was built with
+            metadata: free-form dict stored in the manifest
+            engine: 'sparse' or 'numpy' (see module docstring)
+            hashing: {'n_bits': k, 'alternate_sign': bool} for hashing mode
+            calibration: {'method': 'platt', 'a': float, 'b': float, ...} or None
+            threshold: scam probability at or above which predict() says scam
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'. Choose one of {ENGINES}")
+        if vocabulary is None:
+            terms = []
+        elif isinstance(vocabulary, dict):
+            terms = [None] * len(vocabulary)
+            for term, index in vocabulary.items():
+                terms[index] = term
+        else:
+            terms = list(vocabulary)
+        self.terms = terms
+        self.vocabulary = {term: index for index, term in enumerate(terms)}
+        self.feature_log_prob = feature_log_prob
+        self.class_log_prior = class_log_prior
+        self.classes = np.asarray(classes)
+        self.idf = idf
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+        self.language = language
+        self.tokenizer_version = tokenizer_version
+        self.metadata = dict(metadata or {})
+        self.tokenizer = TokenizerEngine(language)
+        self.engine = engine
+        self.hashing = dict(hashing) if hashing else None
+        self.calibration = dict(calibration) if calibration else None
+        self.threshold = float(threshold)
+        self.featurizer = None
+        if self.hashing:
+            from hashing_features import HashingFeaturizer
+            self.featurizer = HashingFeaturizer(**self.hashing)
+
+        if tokenizer_version != TOKENIZER_VERSION:
+            print(f"  ! Pipeline was built with tokenizer v{tokenizer_version}, "
+                  f"running v{TOKENIZER_VERSION} - retrain to refresh the vocabulary",
+                  file=sys.stderr)
+
+    @property
+    def n_features(self):
+        if self.featurizer is not None:
+            return self.featurizer.n_features
+        return len(self.terms)
+
+    @property
+    def scam_index(self):
+        """Column of predict_proba holding the scam (label 0) probability"""
+        return int(np.flatnonzero(self.classes == SCAM_LABEL)[0])
+
+    @property
+    def legitimate_label(self):
+        return self.classes[self.classes != SCAM_LABEL][0]
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_estimators(cls, bow_transformer, tfidf_transformer, model, metadata=None,
+                        engine='sparse'):
+        """
+        Build a pipeline from fitted sklearn estimators
+
+        Args:
+            bow_transformer: fitted CountVectorizer (analyzer=PreProcessText.token_words)
+            tfidf_transformer: fitted TfidfTransformer, or None if the model was fit on counts
+            model: fitted MultinomialNB
+        """
+        idf = None
+        norm = None
+        sublinear_tf = False
+        if tfidf_transformer is not None:
+            if tfidf_transformer.use_idf:
+                idf = np.asarray(tfidf_transformer.idf_, dtype=np.float64)
+            norm = tfidf_transformer.norm
+            sublinear_tf = tfidf_transformer.sublinear_tf
+        return cls(bow_transformer.vocabulary_,
+                   np.asarray(model.feature_log_prob_, dtype=np.float64),
+                   np.asarray(model.class_log_prior_, dtype=np.float64),
+                   model.classes_,
+                   idf=idf, norm=norm, sublinear_tf=sublinear_tf,
+                   metadata=metadata, engine=engine)
+
+    @classmethod
+    def from_pickles(cls, vectorizer_path='vectorizer.pkl', model_path='model.pkl', engine='sparse'):
+        """
+        Convert the legacy vectorizer.pkl/model.pkl pair
+
+        Those files carry no TfidfTransformer, so the pipeline scores raw counts,
+        exactly like the entry points did before this artifact existed.
+        """
+        import pickle
+        with open(vectorizer_path, 'rb') as f:
+            bow_transformer = pickle.load(f)
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+        return cls.from_estimators(bow_transformer, None, model,
+                                   metadata={'source': 'legacy pickles'}, engine=engine)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, directory=DEFAULT_PIPELINE_DIR):
+        """Write the pipeline to a directory (an existing one is renamed aside, not deleted first)"""
+        tmp_dir = directory.rstrip('/\\') + '.tmp'
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        manifest = {
+            'format_version': PIPELINE_FORMAT_VERSION,
+            'tokenizer': {'version': self.tokenizer_version, 'language': self.language},
+            'features': {
+                'n_features': self.n_features,
+                'tfidf': self.idf is not None,
+                'norm': self.norm,
+                'sublinear_tf': self.sublinear_tf,
+                'hashing': self.hashing,
+            },
+            'metadata': self.metadata,
+            'calibration': self.calibration,
+            'threshold': self.threshold,
+        }
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        with open(os.path.join(tmp_dir, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.terms, f, ensure_ascii=False)
+
+        for name in _ARRAYS:
+            np.save(os.path.join(tmp_dir, name + '.npy'), np.asarray(getattr(self, name)))
+        if self.idf is not None:
+            np.save(os.path.join(tmp_dir, 'idf.npy'), np.asarray(self.idf))
+
+        # Swap by renames: the old directory is only deleted once the new one is in place
+        old_dir = directory.rstrip('/\\') + '.old'
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        if os.path.exists(directory):
+            os.rename(directory, old_dir)
+        os.rename(tmp_dir, directory)
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+
+    @classmethod
+    def load(cls, directory=DEFAULT_PIPELINE_DIR, mmap=True, engine='sparse'):
+        """
+        Load a pipeline directory
+
+        Args:
+            directory: path written by save()
+            mmap: memory-map the arrays instead of reading them into memory
+            engine: 'sparse' or 'numpy'
+        """
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['format_version'] > PIPELINE_FORMAT_VERSION:
+            raise ValueError(f"Pipeline format v{manifest['format_version']} is newer than "
+                             f"supported v{PIPELINE_FORMAT_VERSION}. Please update the code.")
+        with open(os.path.join(directory, 'vocabulary.json'), encoding='utf-8') as f:
+            terms = json.load(f)
+
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+                  for name in _ARRAYS}
+        features = manifest['features']
+        idf = None
+        if features['tfidf']:
+            idf = np.load(os.path.join(directory, 'idf.npy'), mmap_mode=mmap_mode)
+
+        return cls(terms, arrays['feature_log_prob'], arrays['class_log_prior'],
+                   arrays['classes'], idf=idf, norm=features['norm'],
+                   sublinear_tf=features['sublinear_tf'],
+                   language=manifest['tokenizer']['language'],
+                   tokenizer_version=manifest['tokenizer']['version'],
+                   metadata=manifest.get('metadata'), engine=engine,
+                   hashing=features.get('hashing'), calibration=manifest.get('calibration'),
+                   threshold=manifest.get('threshold', DEFAULT_THRESHOLD))
+
+    # ------------------------------------------------------------------
+    # Inference
+    # ------------------------------------------------------------------
+
+    def count_matrix(self, token_lists):
+        """Token lists -> sparse (n_docs, n_features) count matrix"""
+        if self.featurizer is not None:
+            return self.featurizer.transform(token_lists)
+        vocabulary = self.vocabulary
+        indices = []
+        indptr = [0]
+        for tokens in token_lists:
+            for token in tokens:
+                index = vocabulary.get(token)
+                if index is not None:
+                    indices.append(index)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float64)
+        X = sp.csr_matrix((data, np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+                          shape=(len(indptr) - 1, self.n_features))
+        X.sum_duplicates()
+        return X
+
+    def weight(self, X):
+        """Apply the TF-IDF weighting and row normalization to a count matrix"""
+        if self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1
+        if self.idf is not None:
+            X.data *= np.asarray(self.idf)[X.indices]
+        if self.norm is not None:
+            if self.norm == 'l2':
+                row_norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+            else:
+                row_norms = np.asarray(abs(X).sum(axis=1)).ravel()
+            row_norms[row_norms == 0] = 1.0
+            X.data /= np.repeat(row_norms, np.diff(X.indptr))
+        return X
+
+    def transform(self, texts):
+        """Messages -> feature matrix exactly as seen by the model during training"""
+        with stage('tokenize'):
+            token_lists = self.tokenizer.tokenize_batch(texts)
+        with stage('vectorize'):
+            return self.weight(self.count_matrix(token_lists))
+
+    def joint_log_likelihood(self, X):
+        return np.asarray(X @ np.asarray(self.feature_log_prob).T) + self.class_log_prior
+
+    def _joint_log_likelihood_one(self, tokens):
+        """NumPy engine: joint log-likelihood of one token list, no sparse matrices"""
+        if self.featurizer is not None:
+            ids, weights = self.featurizer.counts_one(tokens)
+        else:
+            vocabulary = self.vocabulary
+            counts = collections.Counter(vocabulary[token] for token in tokens if token in vocabulary)
+            ids = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+            weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if not len(ids):
+            return np.array(self.class_log_prior, dtype=np.float64)
+        if self.sublinear_tf:
+            weights = np.log(weights) + 1
+        if self.idf is not None:
+            weights *= self.idf[ids]
+        if self.norm == 'l2':
+            weights /= np.sqrt(weights @ weights)
+        elif self.norm is not None:
+            weights /= np.abs(weights).sum()
+        # Gather only the needed columns, so memory-mapped arrays are never copied whole
+        return np.asarray(self.feature_log_prob)[:, ids] @ weights + self.class_log_prior
+
+    def _joint_log_likelihoods(self, texts):
+        if self.engine == 'numpy':
+            with stage('tokenize'):
+                token_lists = self.tokenizer.tokenize_batch(texts)
+            with stage('predict'):
+                jll = [self._joint_log_likelihood_one(tokens) for tokens in token_lists]
+                return np.array(jll, dtype=np.float64).reshape(len(jll), len(self.classes))
+        X = self.transform(texts)
+        with stage('predict'):
+            return self.joint_log_likelihood(X)
+
+    def _log_proba(self, jll):
+        # logsumexp over classes (same math as scipy, without its dispatch overhead)
+        top = jll.max(axis=1, keepdims=True)
+        return jll - (top + np.log(np.exp(jll - top).sum(axis=1, keepdims=True)))
+
+    def _scam_log_odds(self, jll):
+        # log P(scam) - log P(not scam), straight from the joint log-likelihoods
+        others = np.delete(jll, self.scam_index, axis=1)
+        top = others.max(axis=1)
+        return jll[:, self.scam_index] - (top + np.log(np.exp(others - top[:, None]).sum(axis=1)))
+
+    def scam_log_odds(self, texts):
+        """Uncalibrated Naive Bayes log-odds of scam (the input Platt scaling is fit on)"""
+        return self._scam_log_odds(self._joint_log_likelihoods(texts))
+
+    def _calibrated(self, jll):
+        """(n, n_classes) probabilities; Platt-scaled when a calibration is set"""
+        if self.calibration is None:
+            return np.exp(self._log_proba(jll))
+        scam = 1 / (1 + np.exp(-(self.calibration['a'] * self._scam_log_odds(jll)
+                                 + self.calibration['b'])))
+        proba = np.empty_like(jll)
+        proba[:, self.scam_index] = scam
+        proba[:, 1 - self.scam_index] = 1 - scam      # binary: scam vs legitimate
+        return proba
+
+    def predict_log_proba(self, texts):
+        if self.calibration is not None:
+            return np.log(self.predict_proba(texts))
+        return self._log_proba(self._joint_log_likelihoods(texts))
+
+    def predict_proba(self, texts):
+        return self._calibrated(self._joint_log_likelihoods(texts))
+
+    def labels(self, scam_probabilities, threshold=None):
+        """Labels for given scam probabilities at the operating threshold"""
+        threshold = self.threshold if threshold is None else threshold
+        return np.where(np.asarray(scam_probabilities) >= threshold, SCAM_LABEL,
+                        self.legitimate_label)
+
+    def predict(self, texts, threshold=None):
+        """Labels at the operating threshold (self.threshold unless given)"""
+        return self.labels(self.scam_probability(texts), threshold)
+
+    def scam_probability(self, texts):
+        """Probability of the scam class for each message (calibrated when available)"""
+        return self.predict_proba(texts)[:, self.scam_index]
+
+
+def load_pipeline(directory=DEFAULT_PIPELINE_DIR, vectorizer_path='vectorizer.pkl',
+                  model_path='model.pkl', engine='sparse'):
+    """
+    Load the pipeline used by every entry point
+
+    Falls back to converting the legacy pickle pair when no pipeline
+    directory has been written yet. Use engine='numpy' for one-message-at-a-time
+    callers and 'sparse' for batches.
+    """
+    if os.path.exists(os.path.join(directory, 'manifest.json')):
+        return ScamPipeline.load(directory, engine=engine)
+    # Interrupted save: the previous pipeline is still complete, renamed aside
+    old_dir = directory.rstrip('/\\') + '.old'
+    if os.path.exists(os.path.join(old_dir, 'manifest.json')):
+        return ScamPipeline.load(old_dir, engine=engine)
+    # stderr: scripts such as score.py write their results to stdout
+    print(f"  ! {directory}/ not found - converting {vectorizer_path} and {model_path}",
+          file=sys.stderr)
+    return ScamPipeline.from_pickles(vectorizer_path, model_path, engine=engine)
+
+
+def save_pipeline(pipeline, directory=DEFAULT_PIPELINE_DIR, backup=True):
+    """Save a pipeline, keeping the previous one as <directory>_backup"""
+    if backup and os.path.exists(directory):
+        backup_dir = directory.rstrip('/\\') + '_backup'
+        if os.path.exists(backup_dir):
+            shutil.rmtree(backup_dir)
+        # Copied, not moved: the old pipeline stays loadable until save() swaps it
+        shutil.copytree(directory, backup_dir)
+        print(f"Backed up old {directory}/ to {backup_dir}/")
+    pipeline.save(directory)
+    print(f"Saved new {directory}/")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect or convert the scam pipeline artifact")
+    parser.add_argument('--convert', action='store_true',
+                        help='build the pipeline directory from vectorizer.pkl and model.pkl')
+    parser.add_argument('--dir', default=DEFAULT_PIPELINE_DIR, help='pipeline directory')
+    args = parser.parse_args()
+
+    if args.convert:
+        save_pipeline(ScamPipeline.from_pickles(), args.dir)
+
+    pipe = load_pipeline(args.dir)
+    mode = f"hashing 2^{pipe.hashing['n_bits']}" if pipe.hashing else 'vocabulary'
+    print(f"Features: {pipe.n_features} ({mode})  TF-IDF: {pipe.idf is not None}  norm: {pipe.norm}")
+    print(f"Classes: {pipe.classes.tolist()}  tokenizer v{pipe.tokenizer_version}")
+    calibration = (f"platt a={pipe.calibration['a']:.4f} b={pipe.calibration['b']:.4f}"
+                   if pipe.calibration else 'none')
+    print(f"Calibration: {calibration}  threshold: {pipe.threshold}")
@@ -9,8 +9,11 @@ from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import os
-from data_loader import DatasetLoader, DatasetCombiner
+from data_loader import DEFAULT_DATASETS, DatasetCombiner
+from corpus_cache import CorpusCache
 from text_processor import PreProcessText
+from retrain_model import pretokenized
+from pipeline import ScamPipeline, save_pipeline
 
 nltk.download('stopwords', quiet=True)
 
@@ -25,40 +28,23 @@ def retrain_with_new_data():
     print("  fraud/normal → 0/1")
     print("  spam/ham → 0/1\n")
     
-    # Load MainCall.csv (fraud/normal, NO HEADERS)
-    if os.path.exists('Datasets/MainCall.csv'):
-        df = DatasetLoader.load_csv('Datasets/MainCall.csv',
-                                   has_header=False,
-                                   label_col_index=0,
-                                   text_col_index=1)
-        if df is not None:
-            all_data.append(df)
-    
-    # Load Bigmaincall.csv (spam/ham, NO HEADERS)
-    if os.path.exists('Datasets/Bigmaincall.csv'):
-        df = DatasetLoader.load_csv('Datasets/Bigmaincall.csv',
-                                   has_header=False,
-                                   label_col_index=0,
-                                   text_col_index=1)
-        if df is not None:
-            all_data.append(df)
-    
-    # Load SMSSpamCollection.txt (TSV format)
-    if os.path.exists('Datasets/Default/SMSSpamCollection.txt'):
-        df = DatasetLoader.load_tsv('Datasets/Default/SMSSpamCollection.txt',
-                                   label_column_index=0,
-                                   text_column_index=1)
-        if df is not None:
-            all_data.append(df)
+    # Load every dataset in DEFAULT_DATASETS (pre-tokenized from the corpus cache)
+    cache = CorpusCache()
+    for spec in DEFAULT_DATASETS:
+        if os.path.exists(spec['path']):
+            df = cache.load(spec)
+            if df is not None:
+                all_data.append(df)
     
     # Combine data
     if all_data:
-        training_data = DatasetCombiner.combine(*all_data, balance=False)
+        training_data = DatasetCombiner.combine(*all_data, balance=False, dedup=True)
         
         # Train
         print("\n=== Training Model ===")
-        bow = CountVectorizer(analyzer=obj.token_words).fit(training_data['message'])
-        bow_transformed = bow.transform(training_data['message'])
+        bow = CountVectorizer(analyzer=pretokenized).fit(training_data['tokens'])
+        bow_transformed = bow.transform(training_data['tokens'])
+        bow.set_params(analyzer=obj.token_words)
         tfidf = TfidfTransformer().fit(bow_transformed)
         tfidf_transformed = tfidf.transform(bow_transformed)
         model = MultinomialNB().fit(tfidf_transformed, training_data['label'])
@@ -75,6 +61,8 @@ def retrain_with_new_data():
             pickle.dump(bow, f)
         with open('model.pkl', 'wb') as f:
             pickle.dump(model, f)
+        save_pipeline(ScamPipeline.from_estimators(bow, tfidf, model,
+                                                   metadata={'source': 'quick_retrain.py'}))
         
         print("✓ Models saved successfully!")
     else:
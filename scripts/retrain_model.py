@@ -1,6 +1,14 @@
 """
 Retrain the scam detection model with additional datasets
 Auto-handles different label formats across datasets
+
+20% of each class is held out of training and used to calibrate the scam
+probabilities (calibration.py); the held-out rows also give an honest
+accuracy next to the training accuracy.
+
+The datasets overlap heavily, so exact and near-duplicate messages are
+collapsed to one row first (dedup.py); otherwise copies of a held-out
+message would be trained on.
 """
 
 import pickle
@@ -11,7 +19,10 @@ from sklearn.naive_bayes import MultinomialNB
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import os
 from data_loader import DatasetLoader, DatasetCombiner
+from corpus_cache import CorpusCache
 from text_processor import PreProcessText
+from pipeline import ScamPipeline, save_pipeline
+from calibration import DEFAULT_HOLDOUT, calibrate_pipeline
 
 # Download required NLTK data
 nltk.download('stopwords', quiet=True)
@@ -28,12 +39,18 @@ def load_data_from_tsv(file_path, label_col_index=0, text_col_index=1):
     return DatasetLoader.load_tsv(file_path, label_col_index, text_col_index)
 
 
-def combine_datasets(*dataframes, balance=False):
-    """Combine multiple dataframes with optional balancing"""
-    return DatasetCombiner.combine(*dataframes, balance=balance)
+def combine_datasets(*dataframes, balance=False, dedup=True):
+    """Combine multiple dataframes with optional balancing and deduplication"""
+    return DatasetCombiner.combine(*dataframes, balance=balance, dedup=dedup)
+
+
+def pretokenized(tokens):
+    """Analyzer for messages that are already token lists (from the corpus cache)"""
+    return tokens
 
 
-def retrain_model(training_data, text_column='message', label_column='label'):
+def retrain_model(training_data, text_column='message', label_column='label',
+                  tokens_column='tokens'):
     """
     Retrain the model with new data
     
@@ -41,6 +58,7 @@ def retrain_model(training_data, text_column='message', label_column='label'):
     - training_data: DataFrame with text and label columns
     - text_column: name of the column containing text messages
     - label_column: name of the column containing labels (0 or 1)
+    - tokens_column: optional column of already tokenized messages (skips tokenization)
     """
     print("\n=== Starting Model Retraining ===\n")
     
@@ -49,8 +67,14 @@ def retrain_model(training_data, text_column='message', label_column='label'):
     
     # Step 1: Create and fit CountVectorizer (Bag of Words)
     print("Step 1: Training CountVectorizer (Bag of Words)...")
-    bow_transformer = CountVectorizer(analyzer=obj.token_words).fit(training_data[text_column])
-    messages_bow = bow_transformer.transform(training_data[text_column])
+    if tokens_column in training_data:
+        bow_transformer = CountVectorizer(analyzer=pretokenized).fit(training_data[tokens_column])
+        messages_bow = bow_transformer.transform(training_data[tokens_column])
+        # Saved vectorizer must tokenize raw text at prediction time
+        bow_transformer.set_params(analyzer=obj.token_words)
+    else:
+        bow_transformer = CountVectorizer(analyzer=obj.token_words).fit(training_data[text_column])
+        messages_bow = bow_transformer.transform(training_data[text_column])
     print(f"  - Vocabulary size: {len(bow_transformer.get_feature_names_out())}")
     
     # Step 2: Create and fit TfidfTransformer
@@ -79,8 +103,13 @@ def retrain_model(training_data, text_column='message', label_column='label'):
     return bow_transformer, tfidf_transformer, model
 
 
-def save_models(bow_transformer, tfidf_transformer, model):
-    """Save trained models to pickle files"""
+def save_models(bow_transformer, tfidf_transformer, model, held_out=None):
+    """
+    Save the pipeline artifact plus the legacy pickle files
+    
+    With held_out (rows not used for training) the pipeline is calibrated on
+    them before it is saved.
+    """
     print("\n=== Saving Models ===\n")
     
     # Backup old models
@@ -105,11 +134,31 @@ def save_models(bow_transformer, tfidf_transformer, model):
         pickle.dump(model, f)
     print("Saved new model.pkl")
     
+    # Save the pipeline (includes the TF-IDF weights the pickles leave out)
+    metadata = {'source': 'retrain_model.py'}
+    if held_out is not None:
+        metadata['holdout'] = {'fraction': DEFAULT_HOLDOUT, 'random_state': 42, 'dedup': True}
+    pipeline = ScamPipeline.from_estimators(bow_transformer, tfidf_transformer, model,
+                                            metadata=metadata)
+    if held_out is not None:
+        before, after = calibrate_pipeline(pipeline, held_out)
+        held_out_accuracy = (pipeline.predict(held_out['message'].astype(str).tolist())
+                             == held_out['label'].to_numpy()).mean()
+        print(f"Calibrated on {len(held_out)} held-out messages: "
+              f"Brier {before['brier']:.4f} -> {after['brier']:.4f}, "
+              f"held-out accuracy {held_out_accuracy:.4f}")
+    save_pipeline(pipeline)
+    
     print("\nModels saved successfully!")
 
 
-def main():
-    """Main retraining function"""
+def main(use_cache=True):
+    """
+    Main retraining function
+    
+    With use_cache=True unchanged datasets are read pre-tokenized from
+    the corpus cache instead of being parsed again.
+    """
     
     print("\n" + "="*70)
     print("SCAM DETECTION MODEL RETRAINER - WITH AUTO LABEL NORMALIZATION")
@@ -119,6 +168,15 @@ def main():
     print("  - Bigmaincall.csv (spam/ham) → 0/1")
     print("  - SMSSpamCollection (spam/ham) → 0/1")
     
+    if use_cache:
+        combined_data = CorpusCache().load_all(balance=False, dedup=True)
+        if combined_data is None:
+            return
+        train_data, held_out = DatasetCombiner.split(combined_data, holdout=DEFAULT_HOLDOUT)
+        bow_transformer, tfidf_transformer, model = retrain_model(train_data)
+        save_models(bow_transformer, tfidf_transformer, model, held_out)
+        return
+    
     datasets = []
     
     # Load MainCall.csv (fraud/normal format, NO HEADERS)
@@ -158,13 +216,15 @@ def main():
     # Combine all datasets (with optional balancing)
     print()
     combined_data = combine_datasets(*datasets, balance=False)
+    train_data, held_out = DatasetCombiner.split(combined_data, holdout=DEFAULT_HOLDOUT)
     
     # Retrain model
-    bow_transformer, tfidf_transformer, model = retrain_model(combined_data)
+    bow_transformer, tfidf_transformer, model = retrain_model(train_data)
     
-    # Save models
-    save_models(bow_transformer, tfidf_transformer, model)
+    # Save models (calibrated on the held-out rows)
+    save_models(bow_transformer, tfidf_transformer, model, held_out)
 
 
 if __name__ == "__main__":
-    main()
+    import sys
+    main(use_cache='--no-cache' not in sys.argv)
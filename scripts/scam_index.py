@@ -0,0 +1,349 @@
+"""
+Index of known scam templates for near-duplicate lookup
+Recycled scam scripts are recognised by their MinHash signature, without the model
+
+    ScamTemplateIndex.build(corpus)     scam rows (label 0) of the combined datasets,
+                                        near-duplicates collapsed (dedup.py)
+    index.query(text, k=5)              nearest templates + estimated Jaccard similarity
+    index.add(messages, source=...)     incremental insert of newly confirmed scams;
+                                        near-copies of an existing template are skipped
+    index.save() / ScamTemplateIndex.load()
+
+Templates are bucketed by the same LSH bands as dedup.py (16 bands of 4
+MinHash rows), kept as one dict per band, so a query hashes the message
+once, looks up 16 buckets and compares the signatures of the candidates
+only. A template at similarity 0.6 is found with probability ~0.9, one at
+0.8 with probability > 0.999. A typical message is answered in ~0.2 ms.
+
+A transcript is much longer than any template, so its Jaccard similarity to
+a template read out inside it stays low. Texts over TRANSCRIPT_WORDS words
+are therefore queried window by window (WINDOW_WORDS words, a quarter
+window apart) and scored by the estimated containment |T∩W| / |T| of the
+template T in the window W, best window per template (~8 ms for a few
+hundred words).
+
+On disk (default scam_index/):
+    manifest.json     format version, MinHash and band settings
+    signatures.npy    (n_templates, num_perm) uint32
+    templates.jsonl   one {"message", "source", "added"} per template, same order
+
+Usage (from the project root):
+    python scripts/scam_index.py build                          # from DEFAULT_DATASETS
+    python scripts/scam_index.py query "You have won a prize, call now to claim"
+    python scripts/scam_index.py add "Your KYC has expired, share the OTP to reactivate"
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+from dedup import BANDS, NUM_PERM, SHINGLE_CHARS, MinHasher, band_keys, deduplicate, normalize
+from instrumentation import stage
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_INDEX_DIR = 'scam_index'
+# Estimated Jaccard similarity above which a new scam counts as an existing template
+DUPLICATE_SIMILARITY = 0.9
+MIN_SIMILARITY = 0.5
+# Longer texts are queried in windows, scored by containment of the template
+TRANSCRIPT_WORDS = 40
+WINDOW_WORDS = (8, 16, 32)
+
+
+def shingle_counts(texts, shingle_chars=SHINGLE_CHARS):
+    """Number of shingles of each text, as MinHasher.shingles counts them"""
+    lengths = np.array([len(normalize(text).encode('utf-8')) for text in texts], dtype=np.int64)
+    return np.maximum(lengths - shingle_chars + 1, 1)
+
+
+def text_windows(words, sizes=WINDOW_WORDS):
+    """Overlapping word windows of every size, a quarter window apart"""
+    windows = []
+    for size in sizes:
+        step = max(1, size // 4)
+        for start in range(0, max(1, len(words) - size + step), step):
+            windows.append(' '.join(words[start:start + size]))
+    return windows
+
+
+class ScamTemplateIndex(object):
+    """
+    MinHash LSH index of confirmed scam messages
+
+    Signatures (and shingle counts, for containment) live in growable arrays
+    (capacity doubles), so inserts are amortized O(1) and queries never copy them.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, shingle_chars=SHINGLE_CHARS, seed=1, bands=BANDS):
+        self.hasher = MinHasher(num_perm, shingle_chars, seed)
+        self.bands = bands
+        self.templates = []
+        self._signatures = np.empty((64, num_perm), dtype=np.uint32)
+        self._sizes = np.empty(64, dtype=np.int64)
+        self._buckets = [{} for _ in range(bands)]
+
+    def __len__(self):
+        return len(self.templates)
+
+    @property
+    def signatures(self):
+        return self._signatures[:len(self.templates)]
+
+    # Inserts
+    # ------------------------------------------------------------------
+
+    def _insert(self, signature, size, keys, template):
+        i = len(self.templates)
+        if i == len(self._signatures):
+            grown = np.empty((2 * i, self._signatures.shape[1]), dtype=np.uint32)
+            grown[:i] = self._signatures
+            self._signatures = grown
+            self._sizes = np.resize(self._sizes, 2 * i)
+        self._signatures[i] = signature
+        self._sizes[i] = size
+        self.templates.append(template)
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(i)
+        return i
+
+    def add(self, messages, source='analyst', skip_duplicates=True):
+        """
+        Insert confirmed scam messages
+
+        Args:
+            messages: iterable of strings
+            source: stored with each template (dataset path, analyst name, ...)
+            skip_duplicates: a message within DUPLICATE_SIMILARITY of an
+                existing template (or of an earlier message in this call)
+                is not inserted again
+
+        Returns:
+            list with, for every message, the id of its template (new or existing)
+        """
+        messages = [str(message) for message in messages]
+        if not messages:
+            return []
+        signatures = self.hasher.signatures(messages)
+        all_keys = band_keys(signatures, self.bands).tolist()
+        sizes = shingle_counts(messages, self.hasher.shingle_chars)
+        added = time.strftime('%Y-%m-%dT%H:%M:%S')
+        ids = []
+        for message, signature, size, keys in zip(messages, signatures, sizes, all_keys):
+            if skip_duplicates:
+                match = self._best(signature, keys)
+                if match is not None and match[1] >= DUPLICATE_SIMILARITY:
+                    ids.append(match[0])
+                    continue
+            ids.append(self._insert(signature, size, keys,
+                                    {'message': message, 'source': source, 'added': added}))
+        return ids
+
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _candidates(self, keys):
+        found = set()
+        for bucket, key in zip(self._buckets, keys):
+            members = bucket.get(key)
+            if members:
+                found.update(members)
+        return np.fromiter(found, dtype=np.intp, count=len(found))
+
+    def _similarities(self, signature, keys):
+        candidates = self._candidates(keys)
+        similarity = np.mean(self._signatures[candidates] == signature, axis=1)
+        return candidates, similarity
+
+    def _best(self, signature, keys):
+        candidates, similarity = self._similarities(signature, keys)
+        if not len(candidates):
+            return None
+        best = int(np.argmax(similarity))
+        return int(candidates[best]), float(similarity[best])
+
+    def _containments(self, words):
+        """Templates found in any window of a long text, with their best containment"""
+        windows = text_windows(words)
+        signatures = self.hasher.signatures(windows)
+        sizes = shingle_counts(windows, self.hasher.shingle_chars)
+        best = {}
+        for signature, size, keys in zip(signatures, sizes, band_keys(signatures, self.bands).tolist()):
+            candidates, similarity = self._similarities(signature, keys)
+            # |T∩W| = J |T∪W| and |T∪W| = (|T| + |W|) / (1 + J)
+            template_sizes = self._sizes[candidates]
+            containment = np.minimum(
+                similarity * (template_sizes + size) / ((1 + similarity) * template_sizes), 1.0)
+            for i, value in zip(candidates.tolist(), containment.tolist()):
+                if value > best.get(i, 0.0):
+                    best[i] = value
+        return (np.fromiter(best.keys(), dtype=np.intp, count=len(best)),
+                np.fromiter(best.values(), dtype=np.float64, count=len(best)))
+
+    def query(self, text, k=5, min_similarity=MIN_SIMILARITY):
+        """
+        Nearest known scam templates of a message or transcript
+
+        Up to TRANSCRIPT_WORDS words the similarity is the estimated Jaccard
+        similarity of text and template; for longer texts it is the estimated
+        fraction of the template contained in the best matching window.
+
+        Returns:
+            up to k dicts {'id', 'similarity', 'message', 'source', 'added'},
+            most similar first
+        """
+        with stage('template_lookup'):
+            words = str(text).split()
+            if len(words) > TRANSCRIPT_WORDS:
+                candidates, similarity = self._containments(words)
+            else:
+                signature = self.hasher.signature(str(text))
+                keys = band_keys(signature[None, :], self.bands)[0].tolist()
+                candidates, similarity = self._similarities(signature, keys)
+            keep = similarity >= min_similarity
+            candidates, similarity = candidates[keep], similarity[keep]
+            order = np.argsort(-similarity, kind='stable')[:k]
+        return [dict(self.templates[candidates[i]], id=int(candidates[i]),
+                     similarity=float(similarity[i])) for i in order]
+
+    def best_match(self, text, min_similarity=MIN_SIMILARITY):
+        """The single nearest template, or None"""
+        matches = self.query(text, k=1, min_similarity=min_similarity)
+        return matches[0] if matches else None
+
+    # Build / persistence
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, corpus, source='corpus', **options):
+        """
+        Index the scam rows (label 0) of a combined dataset
+
+        Near-duplicates are collapsed first, so each campaign is stored once.
+        """
+        scams, _ = deduplicate(corpus[corpus['label'] == 0])
+        index = cls(**options)
+        index.add(scams['message'], source=source, skip_duplicates=False)
+        return index
+
+    def save(self, directory=DEFAULT_INDEX_DIR):
+        """Write the index to a directory (an existing one is renamed aside, not deleted first)"""
+        tmp_dir = directory.rstrip('/\\') + '.tmp'
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        manifest = {
+            'format_version': INDEX_FORMAT_VERSION,
+            'num_perm': self.hasher.num_perm,
+            'shingle_chars': self.hasher.shingle_chars,
+            'seed': self.hasher.seed,
+            'bands': self.bands,
+            'n_templates': len(self),
+        }
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        np.save(os.path.join(tmp_dir, 'signatures.npy'), self.signatures)
+        with open(os.path.join(tmp_dir, 'templates.jsonl'), 'w', encoding='utf-8') as f:
+            for template in self.templates:
+                f.write(json.dumps(template) + '\n')
+
+        # Swap by renames: the old directory is only deleted once the new one is in place
+        old_dir = directory.rstrip('/\\') + '.old'
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        if os.path.exists(directory):
+            os.rename(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+
+    @classmethod
+    def load(cls, directory=DEFAULT_INDEX_DIR):
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported scam index format {manifest.get('format_version')} "
+                             f"in {directory}")
+        index = cls(manifest['num_perm'], manifest['shingle_chars'], manifest['seed'],
+                    manifest['bands'])
+        signatures = np.load(os.path.join(directory, 'signatures.npy'))
+        with open(os.path.join(directory, 'templates.jsonl'), encoding='utf-8') as f:
+            templates = [json.loads(line) for line in f if line.strip()]
+        if not len(signatures) == len(templates) == manifest['n_templates']:
+            raise ValueError(f"Scam index in {directory} is inconsistent: {len(signatures)} signatures, "
+                             f"{len(templates)} templates, manifest says {manifest['n_templates']}")
+        sizes = shingle_counts([template['message'] for template in templates],
+                               index.hasher.shingle_chars)
+        for signature, size, keys, template in zip(signatures, sizes,
+                                                   band_keys(signatures, index.bands).tolist(),
+                                                   templates):
+            index._insert(signature, size, keys, template)
+        return index
+
+
+def load_scam_index(directory=DEFAULT_INDEX_DIR):
+    """The saved index, or None when it has not been built yet"""
+    for path in (directory, directory.rstrip('/\\') + '.old'):     # .old: interrupted save
+        if os.path.exists(os.path.join(path, 'manifest.json')):
+            return ScamTemplateIndex.load(path)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Known-scam template index")
+    parser.add_argument('command', choices=['build', 'query', 'add', 'stats'])
+    parser.add_argument('text', nargs='*', help='message(s) to look up or add')
+    parser.add_argument('--index', default=DEFAULT_INDEX_DIR, help='index directory')
+    parser.add_argument('-k', type=int, default=5, help='templates to return')
+    parser.add_argument('--min-similarity', type=float, default=MIN_SIMILARITY)
+    parser.add_argument('--source', default='analyst', help='stored with added templates')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        from corpus_cache import CorpusCache
+        corpus = CorpusCache().load_all(balance=False)
+        if corpus is None:
+            return
+        start = time.perf_counter()
+        index = ScamTemplateIndex.build(corpus)
+        index.save(args.index)
+        print(f"\n✓ {len(index)} scam templates indexed in {time.perf_counter() - start:.2f}s "
+              f"-> {args.index}/")
+        return
+
+    index = load_scam_index(args.index)
+    if index is None:
+        print(f"\n✗ No index in {args.index}/ - run: python scripts/scam_index.py build")
+        return
+
+    if args.command == 'stats':
+        sizes = [len(members) for bucket in index._buckets for members in bucket.values()]
+        print(f"Templates: {len(index)}")
+        print(f"Buckets: {len(sizes)} (largest {max(sizes, default=0)})")
+        return
+
+    if args.command == 'add':
+        before = len(index)
+        ids = index.add(args.text, source=args.source)
+        index.save(args.index)
+        reported = set()
+        for message, template_id in zip(args.text, ids):
+            state = 'new' if template_id >= before and template_id not in reported else 'already known'
+            reported.add(template_id)
+            print(f"  {state:>13} #{template_id}: {message[:70]}")
+        print(f"\n✓ {len(index) - before} template(s) added ({len(index)} total)")
+        return
+
+    for text in args.text:
+        start = time.perf_counter()
+        matches = index.query(text, k=args.k, min_similarity=args.min_similarity)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"\n{text[:70]!r} - {len(matches)} match(es) in {elapsed_ms:.2f} ms")
+        for match in matches:
+            print(f"  {match['similarity']:.2f}  #{match['id']:<5} {match['message'][:80]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Batch scoring: stream a CSV/TSV/JSONL file through the scam pipeline
+Writes one row per input message with the predicted label and scam probability
+
+Reads the same layouts as DatasetLoader.load_csv / load_tsv (header or
+column indices). Input is read in fixed-size chunks and scored across a
+process pool with a bounded number of chunks in flight, so memory stays
+flat no matter how large the file is.
+
+Usage (from the project root):
+    python scripts/score.py Datasets/MainCall.csv --no-header --text-col-index 1 -o scores.csv
+    python scripts/score.py Datasets/Default/SMSSpamCollection.txt --format tsv -o scores.jsonl
+    python scripts/score.py calls.jsonl --text-column transcript --workers 8 -o scores.csv
+"""
+
+import argparse
+import collections
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from pipeline import DEFAULT_PIPELINE_DIR, load_pipeline
+
+OUTPUT_FIELDS = ['row', 'label', 'scam_probability']
+
+_worker_pipeline = None
+
+
+def detect_format(path):
+    """Guess csv/tsv/jsonl from the file extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.tsv', '.txt'):
+        return 'tsv'
+    if ext in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    return 'csv'
+
+
+def iter_text_chunks(path, fmt, chunksize, text_column=None, text_col_index=1, has_header=True):
+    """
+    Yield lists of messages, chunksize rows at a time
+
+    Args:
+        path: input file
+        fmt: 'csv', 'tsv' or 'jsonl'
+        chunksize: rows per chunk
+        text_column: column/key name holding the text (csv with header, jsonl)
+        text_col_index: column index holding the text (csv without header, tsv)
+        has_header: whether a csv file has a header row
+    """
+    if fmt == 'jsonl':
+        reader = pd.read_json(path, lines=True, chunksize=chunksize, dtype=False)
+        column = text_column or 'message'
+    elif fmt == 'tsv':
+        reader = pd.read_csv(path, sep='\t', header=None, chunksize=chunksize,
+                             usecols=[text_col_index], dtype=str)
+        column = text_col_index
+    elif has_header:
+        column = text_column or 'message'
+        reader = pd.read_csv(path, chunksize=chunksize, usecols=[column], dtype=str)
+    else:
+        reader = pd.read_csv(path, header=None, chunksize=chunksize,
+                             usecols=[text_col_index], dtype=str)
+        column = text_col_index
+
+    for chunk in reader:
+        yield chunk[column].fillna('').astype(str).tolist()
+
+
+def _init_worker(pipeline_dir, threshold=None):
+    """Load the pipeline once per worker process"""
+    global _worker_pipeline
+    _worker_pipeline = load_pipeline(pipeline_dir)
+    if threshold is not None:
+        _worker_pipeline.threshold = threshold
+
+
+def _score_chunk(texts):
+    """Score one chunk in a worker: returns (labels, scam probabilities)"""
+    scam = _worker_pipeline.scam_probability(texts)
+    return _worker_pipeline.labels(scam).tolist(), scam.tolist()
+
+
+class ResultWriter(object):
+    """Writes scored rows as CSV or JSONL depending on the output extension"""
+
+    def __init__(self, path):
+        self.jsonl = detect_format(path) == 'jsonl' if path != '-' else False
+        self.file = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        if not self.jsonl:
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(OUTPUT_FIELDS)
+
+    def write(self, first_row, labels, probabilities):
+        if self.jsonl:
+            for offset, (label, prob) in enumerate(zip(labels, probabilities)):
+                self.file.write(json.dumps({'row': first_row + offset, 'label': label,
+                                            'scam_probability': round(prob, 6)}) + '\n')
+        else:
+            self.writer.writerows(
+                (first_row + offset, label, f'{prob:.6f}')
+                for offset, (label, prob) in enumerate(zip(labels, probabilities)))
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def score_file(path, output, fmt=None, chunksize=10000, workers=None, pipeline_dir=DEFAULT_PIPELINE_DIR,
+               text_column=None, text_col_index=1, has_header=True, quiet=False, threshold=None):
+    """
+    Score every message in path and write the results to output
+
+    Returns:
+        dict with rows, seconds and rows_per_second
+    """
+    fmt = fmt or detect_format(path)
+    workers = workers or os.cpu_count() or 1
+    chunks = iter_text_chunks(path, fmt, chunksize, text_column, text_col_index, has_header)
+    writer = ResultWriter(output)
+    rows = 0
+    start = time.perf_counter()
+
+    def report(done_rows):
+        if not quiet:
+            elapsed = time.perf_counter() - start
+            print(f"  scored {done_rows:,} rows  ({done_rows / max(elapsed, 1e-9):,.0f} rows/s)",
+                  file=sys.stderr)
+
+    try:
+        if workers == 1:
+            _init_worker(pipeline_dir, threshold)
+            for texts in chunks:
+                writer.write(rows, *_score_chunk(texts))
+                rows += len(texts)
+                report(rows)
+        else:
+            # Keep at most 2 chunks per worker in flight to bound memory
+            max_pending = workers * 2
+            pending = collections.deque()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(pipeline_dir, threshold)) as pool:
+                for texts in chunks:
+                    pending.append((len(texts), pool.submit(_score_chunk, texts)))
+                    while len(pending) >= max_pending:
+                        n, future = pending.popleft()
+                        writer.write(rows, *future.result())
+                        rows += n
+                        report(rows)
+                while pending:
+                    n, future = pending.popleft()
+                    writer.write(rows, *future.result())
+                    rows += n
+                    report(rows)
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - start
+    return {'rows': rows, 'seconds': seconds, 'rows_per_second': rows / max(seconds, 1e-9)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV/TSV/JSONL file with the scam model")
+    parser.add_argument('input', help='input file (.csv, .tsv/.txt, .jsonl)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='output file (.csv or .jsonl, default: CSV on stdout)')
+    parser.add_argument('--format', choices=['csv', 'tsv', 'jsonl'], default=None,
+                        help='input format (default: from extension)')
+    parser.add_argument('--no-header', action='store_true', help='CSV input has no header row')
+    parser.add_argument('--text-column', default=None,
+                        help="text column/key name (default: 'message')")
+    parser.add_argument('--text-col-index', type=int, default=1,
+                        help='text column index for headerless CSV and TSV (default: 1)')
+    parser.add_argument('--chunksize', type=int, default=10000, help='rows per chunk')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: CPU count, 1 = no pool)')
+    parser.add_argument('--pipeline', default=DEFAULT_PIPELINE_DIR, help='pipeline directory')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='scam probability threshold (default: the one in the pipeline manifest)')
+    args = parser.parse_args()
+
+    stats = score_file(args.input, args.output, fmt=args.format, chunksize=args.chunksize,
+                       workers=args.workers, pipeline_dir=args.pipeline,
+                       text_column=args.text_column, text_col_index=args.text_col_index,
+                       has_header=not args.no_header, threshold=args.threshold)
+    print(f"✓ Scored {stats['rows']:,} rows in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_second']:,.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Low-latency HTTP/JSON scoring service with micro-batching
+Loads the pipeline once and coalesces concurrent requests into batches
+
+Endpoints:
+    POST /predict        {"message": "..."}          -> one result
+    POST /predict/bulk   {"messages": ["...", ...]}  -> {"results": [...]}
+    GET  /metrics        latency percentiles + batch-size histogram
+    GET  /metrics/prometheus
+                         the same counters plus per-stage timings (tokenize, vectorize,
+                         predict) in Prometheus text format (see instrumentation.py)
+    GET  /health         {"status": "ok"}
+
+Every message waits at most --max-wait-ms for other messages to arrive and
+is then scored together with them (up to --max-batch per model call).
+
+Usage (from the project root):
+    python scripts/server.py --port 8000 --max-batch 64 --max-wait-ms 2
+    curl -s localhost:8000/predict -d '{"message": "You won a prize, call now"}'
+"""
+
+import argparse
+import asyncio
+import bisect
+import collections
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import instrumentation
+from pipeline import DEFAULT_PIPELINE_DIR, load_pipeline
+
+LATENCY_WINDOW = 10000
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class ServiceMetrics(object):
+    """Request latency window and batch-size histogram"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.latencies_ms = collections.deque(maxlen=window)
+        self.batch_buckets = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.requests = 0
+        self.messages = 0
+        self.batches = 0
+        self.errors = 0
+        self.started = time.time()
+
+    def observe_request(self, seconds, n_messages):
+        self.requests += 1
+        self.messages += n_messages
+        self.latencies_ms.append(seconds * 1000.0)
+
+    def observe_batch(self, size):
+        self.batches += 1
+        self.batch_buckets[bisect.bisect_left(BATCH_SIZE_BUCKETS, size)] += 1
+
+    def snapshot(self):
+        latencies = np.fromiter(self.latencies_ms, dtype=np.float64)
+        percentiles = {}
+        if len(latencies):
+            for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100)):
+                percentiles[name] = round(float(np.percentile(latencies, q)), 3)
+        histogram = {f'le_{bound}': count
+                     for bound, count in zip(BATCH_SIZE_BUCKETS, self.batch_buckets)}
+        histogram['gt_%d' % BATCH_SIZE_BUCKETS[-1]] = self.batch_buckets[-1]
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'requests': self.requests,
+            'messages': self.messages,
+            'batches': self.batches,
+            'errors': self.errors,
+            'mean_batch_size': round(self.messages / self.batches, 2) if self.batches else 0,
+            'latency_ms': percentiles,
+            'batch_size_histogram': histogram,
+        }
+
+    def prometheus_text(self, prefix=instrumentation.METRIC_PREFIX):
+        lines = []
+        for name, value, help_text in (('requests', self.requests, 'Scoring requests served'),
+                                       ('messages', self.messages, 'Messages scored'),
+                                       ('batches', self.batches, 'Model calls'),
+                                       ('errors', self.errors, 'Failed model calls')):
+            lines += [f'# HELP {prefix}service_{name}_total {help_text}',
+                      f'# TYPE {prefix}service_{name}_total counter',
+                      f'{prefix}service_{name}_total {value}']
+        lines += [f'# HELP {prefix}service_batch_size Messages per model call',
+                  f'# TYPE {prefix}service_batch_size histogram']
+        cumulative = 0
+        for bound, n in zip(BATCH_SIZE_BUCKETS + ('+Inf',), self.batch_buckets):
+            cumulative += n
+            lines.append(f'{prefix}service_batch_size_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f'{prefix}service_batch_size_sum {self.messages}',
+                  f'{prefix}service_batch_size_count {self.batches}']
+        return '\n'.join(lines) + '\n' + instrumentation.prometheus_text()
+
+
+class MicroBatcher(object):
+    """
+    Collects messages from concurrent requests and scores them in one call
+
+    A batch is flushed when it reaches max_batch messages or when the oldest
+    message has waited max_wait_ms, whichever comes first.
+    """
+
+    def __init__(self, pipeline, max_batch=64, max_wait_ms=2.0, metrics=None):
+        self.pipeline = pipeline
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.metrics = metrics or ServiceMetrics()
+        self.queue = asyncio.Queue()
+        # One model thread keeps scoring off the event loop without oversubscribing
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scorer')
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    async def score(self, messages):
+        """Score a list of messages, returns one result dict per message"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for message in messages:
+            future = loop.create_future()
+            self.queue.put_nowait((message, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    def _score_batch(self, texts):
+        scam = self.pipeline.scam_probability(texts)
+        labels = self.pipeline.labels(scam)
+        return [{'label': int(label), 'scam': bool(label == 0), 'scam_probability': float(p)}
+                for label, p in zip(labels, scam)]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Drain anything already queued without waiting
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            self.metrics.observe_batch(len(batch))
+            texts = [message for message, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self._score_batch, texts)
+            except Exception as e:
+                self.metrics.errors += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class ScoringServer(object):
+    """Minimal HTTP/1.1 server (keep-alive, JSON bodies) on asyncio streams"""
+
+    def __init__(self, batcher, host='127.0.0.1', port=8000):
+        self.batcher = batcher
+        self.metrics = batcher.metrics
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 413, {'error': 'headers too large'}, keep_alive=False)
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, path, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self._send(writer, 400, {'error': 'malformed request line'}, keep_alive=False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        key, value = line.split(':', 1)
+                        headers[key.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._send(writer, 400, {'error': 'bad content-length'}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._send(writer, 413, {'error': 'body too large'}, keep_alive=False)
+                    break
+                try:
+                    body = await reader.readexactly(length) if length else b''
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break                       # client went away mid-body
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                status, payload = await self._dispatch(method, path.split('?', 1)[0], body)
+                await self._send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/metrics':
+            return 200, self.metrics.snapshot()
+        if path == '/metrics/prometheus':
+            return 200, self.metrics.prometheus_text()
+        if path not in ('/predict', '/predict/bulk'):
+            return 404, {'error': f'unknown path {path}'}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+
+        start = time.perf_counter()
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            return 400, {'error': 'body is not valid JSON'}
+
+        if path == '/predict':
+            message = request.get('message') if isinstance(request, dict) else None
+            if not isinstance(message, str):
+                return 400, {'error': "expected {\"message\": \"...\"}"}
+            messages = [message]
+        else:
+            messages = request.get('messages') if isinstance(request, dict) else None
+            if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+                return 400, {'error': "expected {\"messages\": [\"...\", ...]}"}
+
+        try:
+            results = await self.batcher.score(messages)
+        except Exception as e:
+            return 500, {'error': str(e)}
+        self.metrics.observe_request(time.perf_counter() - start, len(messages))
+
+        if path == '/predict':
+            return 200, results[0]
+        return 200, {'results': results}
+
+    async def _send(self, writer, status, payload, keep_alive=True):
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body = json.dumps(payload).encode('utf-8')
+            content_type = 'application/json'
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+async def run_server(host, port, pipeline_dir, max_batch, max_wait_ms, threshold=None):
+    pipeline = load_pipeline(pipeline_dir)
+    if threshold is not None:
+        pipeline.threshold = threshold
+    batcher = MicroBatcher(pipeline, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    server = await ScoringServer(batcher, host, port).start()
+    print(f"✓ Scoring service on http://{host}:{server.port} "
+          f"(max batch {max_batch}, max wait {max_wait_ms} ms, threshold {pipeline.threshold:.3f})")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP scam scoring service with micro-batching")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--pipeline', default=DEFAULT_PIPELINE_DIR, help='pipeline directory')
+    parser.add_argument('--max-batch', type=int, default=64,
+                        help='maximum messages per model call (N)')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                        help='maximum time a message waits for a batch to fill (T)')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='scam probability threshold (default: the one in the pipeline manifest)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_server(args.host, args.port, args.pipeline, args.max_batch, args.max_wait_ms,
+                               args.threshold))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Streaming scam verdict for long recordings
+Transcribes audio window by window and re-scores the call after each one,
+stopping as soon as the scam probability crosses a threshold
+
+Segments are committed once per window:
+    - a non-final window commits the segments that end before the next
+      window would start (window_s - overlap_s later); the first segment
+      running into the overlap, and everything after it, is left to the next
+      window, which then starts where that segment starts and decodes it whole
+    - a segment longer than a window step cannot be decoded whole anywhere
+      and is committed as it is
+    - segments whose midpoint falls before the end of the last committed
+      segment are skipped, so nothing is counted twice
+
+With vad=True silence is cut out first (vad.speech_view) and only speech is
+windowed; segment and window times are mapped back to the recording.
+
+`audio` may be a float32 array or a memory-mapped audio_io.PcmAudio; only
+the current window is ever held as float32.
+
+After every window the accumulated text is scored with the saved pipeline
+(running score) and each new segment is scored on its own. If the call is
+flagged, the segments that scored highest are returned with timestamps.
+
+Usage (from the project root):
+    python scripts/streaming_verdict.py final.mp4 --threshold 0.8
+    python scripts/streaming_verdict.py scam2.mp4 --window 20 --overlap 4 --no-early-stop
+"""
+
+import argparse
+import itertools
+import time
+from audio_io import SAMPLE_RATE, open_audio
+from pipeline import load_pipeline
+from vad import TimeMap, speech_view
+from transcription_backends import BACKENDS, WhisperBackend, get_backend
+
+MAX_OFFENDING_SEGMENTS = 3
+
+
+class StreamingVerdict(object):
+    """
+    Window-by-window transcription + classification with early stopping
+
+    Args:
+        pipeline: ScamPipeline
+        transcribe: function(float32 samples at 16 kHz) -> dict with 'segments',
+            each segment having 'start', 'end' (seconds in the window) and 'text';
+            usually a backend's transcribe_samples
+        threshold: scam probability that ends the analysis (default: the
+            pipeline's operating threshold, as used by pipeline.labels)
+        window_s, overlap_s: window length and overlap in seconds
+        min_words: words needed before an early verdict is allowed
+        early_stop: False to always decode the whole recording
+        vad: skip non-speech audio before transcribing
+    """
+
+    def __init__(self, pipeline, transcribe, threshold=None, window_s=30.0,
+                 overlap_s=5.0, min_words=12, early_stop=True, vad=False):
+        if overlap_s >= window_s:
+            raise ValueError("overlap_s must be smaller than window_s")
+        self.pipeline = pipeline
+        self.transcribe = transcribe
+        self.threshold = pipeline.threshold if threshold is None else threshold
+        self.window_s = window_s
+        self.overlap_s = overlap_s
+        self.min_words = min_words
+        self.early_stop = early_stop
+        self.vad = vad
+
+    def iter_updates(self, audio, sr=SAMPLE_RATE):
+        """
+        Yield one update dict per decoded window
+
+        Keys: window, start_s, end_s, new_segments, segments, text,
+        scam_probability, skipped_fraction, elapsed_s, last_window, done
+        """
+        started = time.perf_counter()
+        skipped = 0.0
+        time_map = TimeMap([(0.0, len(audio) / sr)])
+        if self.vad:
+            audio, time_map, skipped = speech_view(audio, sr)
+            if len(audio) == 0:
+                return
+        segments = []
+        committed_until = 0.0
+        n_words = 0
+
+        window = int(self.window_s * sr)
+        step = int((self.window_s - self.overlap_s) * sr)
+        offset = 0
+        for index in itertools.count():
+            stop = min(offset + window, len(audio))
+            is_last = stop >= len(audio)
+            samples = audio[offset:stop]
+            window_start, window_end = offset / sr, stop / sr
+            next_offset = offset + step
+
+            new_segments = []
+            for segment in self.transcribe(samples).get('segments', []):
+                start = window_start + segment['start']
+                end = window_start + segment['end']
+                text = segment['text'].strip()
+                if not text or (start + end) / 2 < committed_until:
+                    continue
+                if not is_last and end > next_offset / sr:
+                    # Cut at (or running into) the overlap: the next window starts with it
+                    if int(start * sr) > offset:
+                        next_offset = min(next_offset, int(start * sr))
+                        break
+                new_segments.append({'start': time_map.to_original(start),
+                                     'end': time_map.to_original(end), 'text': text})
+                committed_until = end
+
+            if new_segments:
+                probabilities = self.pipeline.scam_probability([s['text'] for s in new_segments])
+                for segment, probability in zip(new_segments, probabilities):
+                    segment['scam_probability'] = float(probability)
+                    n_words += len(segment['text'].split())
+                segments.extend(new_segments)
+
+            text = ' '.join(s['text'] for s in segments)
+            score = float(self.pipeline.scam_probability([text])[0]) if segments else 0.0
+            done = is_last or (self.early_stop and score >= self.threshold
+                               and n_words >= self.min_words)
+            yield {
+                'window': index,
+                'start_s': time_map.to_original(window_start),
+                'end_s': time_map.to_original(window_end),
+                'new_segments': new_segments,
+                'segments': segments,
+                'text': text,
+                'scam_probability': score,
+                'skipped_fraction': skipped,
+                'elapsed_s': time.perf_counter() - started,
+                'last_window': is_last,
+                'done': done,
+            }
+            if done:
+                return
+            offset = next_offset
+
+    def analyze(self, audio, sr=SAMPLE_RATE, on_update=None):
+        """
+        Run to the end (or to the early verdict) and return the result
+
+        Returns:
+            dict with 'scam' (bool), 'scam_probability', 'stopped_early', 'skipped_fraction',
+            'decided_at_s' (audio time of the verdict), 'duration_s', 'text',
+            'segments', 'offending_segments', 'windows', 'elapsed_s'
+        """
+        update = None
+        for update in self.iter_updates(audio, sr):
+            if on_update is not None:
+                on_update(update)
+
+        duration = len(audio) / sr
+        if update is None:                      # no speech at all
+            return {'scam': False, 'scam_probability': 0.0, 'stopped_early': False,
+                    'skipped_fraction': 1.0, 'decided_at_s': duration, 'duration_s': duration,
+                    'text': '', 'segments': [], 'offending_segments': [], 'windows': 0,
+                    'elapsed_s': 0.0}
+        scam = update['scam_probability'] >= self.threshold
+        offending = []
+        if scam:
+            ranked = sorted(update['segments'], key=lambda s: s['scam_probability'], reverse=True)
+            offending = sorted(ranked[:MAX_OFFENDING_SEGMENTS], key=lambda s: s['start'])
+        return {
+            'scam': scam,
+            'scam_probability': update['scam_probability'],
+            'stopped_early': not update['last_window'],
+            'skipped_fraction': update['skipped_fraction'],
+            'decided_at_s': update['end_s'],
+            'duration_s': duration,
+            'text': update['text'],
+            'segments': update['segments'],
+            'offending_segments': offending,
+            'windows': update['window'] + 1,
+            'elapsed_s': update['elapsed_s'],
+        }
+
+
+def format_timestamp(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scam verdict on a recording, window by window")
+    parser.add_argument('file', help='audio/video file')
+    parser.add_argument('--backend', default='whisper', choices=sorted(BACKENDS))
+    parser.add_argument('--model', default='base', help='Whisper model size')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help="scam probability that stops the analysis (default: the pipeline's)")
+    parser.add_argument('--window', type=float, default=30.0, help='window length in seconds')
+    parser.add_argument('--overlap', type=float, default=5.0, help='window overlap in seconds')
+    parser.add_argument('--min-words', type=int, default=12,
+                        help='words needed before stopping early')
+    parser.add_argument('--no-early-stop', action='store_true', help='decode the whole file')
+    parser.add_argument('--no-vad', action='store_true', help='transcribe silence too')
+    args = parser.parse_args()
+
+    audio = open_audio(args.file)
+    if args.backend == 'whisper':
+        backend = WhisperBackend(args.model)
+    else:
+        backend = get_backend(args.backend)
+    verdict = StreamingVerdict(load_pipeline(engine='numpy'), backend.transcribe_samples,
+                               threshold=args.threshold, window_s=args.window,
+                               overlap_s=args.overlap, min_words=args.min_words,
+                               early_stop=not args.no_early_stop, vad=not args.no_vad)
+
+    def show(update):
+        print(f"  [{format_timestamp(update['start_s'])}-{format_timestamp(update['end_s'])}] "
+              f"scam {update['scam_probability']:.3f}  ({update['elapsed_s']:.1f}s)")
+
+    print(f"\nAnalyzing {args.file} ({len(audio) / SAMPLE_RATE:.0f}s of audio)")
+    result = verdict.analyze(audio, on_update=show)
+
+    print(f"\n{'SCAM' if result['scam'] else 'No scam'} - probability "
+          f"{result['scam_probability']:.3f} after {format_timestamp(result['decided_at_s'])} "
+          f"of {format_timestamp(result['duration_s'])} "
+          f"({'stopped early, ' if result['stopped_early'] else ''}{result['elapsed_s']:.1f}s, "
+          f"{result['skipped_fraction']:.0%} silence skipped)")
+    for segment in result['offending_segments']:
+        print(f"  {format_timestamp(segment['start'])}-{format_timestamp(segment['end'])} "
+              f"({segment['scam_probability']:.2f}) {segment['text']}")
+
+
+if __name__ == "__main__":
+    main()
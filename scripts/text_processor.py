@@ -10,45 +10,100 @@ from nltk.corpus import stopwords
 # Download required NLTK data
 nltk.download('stopwords', quiet=True)
 
+# Bump whenever the token output changes, so cached token data is rebuilt
+TOKENIZER_VERSION = 1
+
+
+class TokenizerEngine(object):
+    """
+    Precompiled tokenizer producing the same tokens as PreProcessText.token_words
+
+    The stopword list is read from NLTK once and frozen into a set, and
+    punctuation is stripped with a single str.translate call instead of a
+    per-character loop.
+    """
+
+    def __init__(self, language='english'):
+        self.language = language
+        self.stopwords = frozenset(stopwords.words(language))
+        self.punctuation_table = str.maketrans('', '', string.punctuation)
+
+    def remove_punctuation(self, text=''):
+        """Remove punctuation from text (String -> String)"""
+        return text.translate(self.punctuation_table)
+
+    def remove_stopwords(self, text=''):
+        """Remove stopwords from text (String -> List)"""
+        stop = self.stopwords
+        return [x for x in text.split() if x.lower() not in stop]
+
+    def tokenize(self, text=''):
+        """Tokenize a single message (String -> List)"""
+        stop = self.stopwords
+        return [x for x in text.translate(self.punctuation_table).split()
+                if x.lower() not in stop]
+
+    def tokenize_batch(self, texts):
+        """
+        Tokenize many messages at once
+
+        Args:
+            texts: any iterable of strings (list, pandas Series, ...)
+
+        Returns:
+            List of token lists, in the same order as texts
+        """
+        stop = self.stopwords
+        table = self.punctuation_table
+        return [[x for x in text.translate(table).split() if x.lower() not in stop]
+                for text in texts]
+
+
+_ENGINE = None
+
+
+def get_tokenizer():
+    """Return the process-wide TokenizerEngine (created on first use)"""
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = TokenizerEngine()
+    return _ENGINE
+
 
 class PreProcessText(object):
     """Text preprocessing for scam detection model"""
-    
+
     def __init__(self):
         pass
-    
+
     def remove_punctuation(self, text=''):
         """
         Remove punctuation from text
-        Takes a String 
-        Return: Return a String 
-        """
-        message = []
-        for x in text:
-            if x in string.punctuation:
-                pass
-            else:
-                message.append(x)
-        return ''.join(message)
-    
+        Takes a String
+        Return: Return a String
+        """
+        return get_tokenizer().remove_punctuation(text)
+
     def remove_stopwords(self, text=''):
         """
         Remove stopwords from text
         Takes a String
         Return: List
         """
-        words = []
-        for x in text.split():
-            if x.lower() not in stopwords.words('english'):
-                words.append(x)
-        return words
-    
+        return get_tokenizer().remove_stopwords(text)
+
     def token_words(self, text=''):
         """
         Tokenize words in text
         Takes String
         Return: Token (list of words used to train the model)
         """
-        message = self.remove_punctuation(text)
-        words = self.remove_stopwords(message)
-        return words
+        return get_tokenizer().tokenize(text)
+
+    def token_words_batch(self, texts):
+        """
+        Tokenize a list/Series of messages
+        Takes iterable of Strings
+        Return: List of token lists
+        """
+        return get_tokenizer().tokenize_batch(texts)
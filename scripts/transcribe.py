@@ -1,5 +1,7 @@
-import whisper
+import os
 import streamlit as st
+from whisper_pool import DEFAULT_MODEL, TranscriptionPool, save_upload
+from transcription_backends import WhisperBackend
 # import pickle
 
 st.title("Transcript app")
@@ -7,14 +9,24 @@ st.title("Transcript app")
 # model=pickle.load(open('transcribe.pkl','rb'))
 # upload audio file
 audio_file=st.file_uploader("Upload audio",type=["wav","mp3","m4a","mp4"])
-model=whisper.load_model("base")
+
+@st.cache_resource
+def get_transcription_pool():
+    return TranscriptionPool(DEFAULT_MODEL, workers=1, max_queue=8)
+
+backend=WhisperBackend(pool=get_transcription_pool())
 st.text("whisper model loaded")
 if st.sidebar.button("Transcribe audio"):
     if audio_file is not None:
         st.sidebar.success("transcribing audio")
         st.text(audio_file.name)
-        transcription=model.transcribe(audio_file.name)
-        st.sidebar.success("Transcription completed")
+        audio_path=save_upload(audio_file)
+        try:
+            transcription=backend.transcribe(audio_path)
+        finally:
+            os.remove(audio_path)
+        st.sidebar.success(f"Transcription completed (queue {transcription['queue_wait_s']:.1f}s, "
+                           f"decode {transcription['decode_s']:.1f}s)")
         st.markdown(transcription["text"])
     
     else:
@@ -1,18 +1,13 @@
 # Install the assemblyai package by executing the command "pip install assemblyai"
 
-import assemblyai as aai
+from transcription_backends import AssemblyAIBackend
 
-aai.settings.api_key = "Your api key from assembly ai"
+backend = AssemblyAIBackend(api_key="Your api key from assembly ai")
 
 # audio_file = "./local_file.mp3"
 audio_file = "./final.mp4"
 
-config = aai.TranscriptionConfig(speech_models=["universal"])
+# Raises TranscriptionError if the service reports a failure
+transcript = backend.transcribe(audio_file)
 
-transcript = aai.Transcriber(config=config).transcribe(audio_file)
-
-if transcript.status == "error":
-  raise RuntimeError(f"Transcription failed: {transcript.error}")
-
-# print(transcript.sentiment_analysis)
-print(transcript.text)
\ No newline at end of file
+print(transcript['text'])
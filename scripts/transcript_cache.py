@@ -0,0 +1,225 @@
+"""
+Content-addressed transcript cache
+Re-analyzing the same recording returns the stored transcript instead of
+calling the transcription service or decoding again
+
+Entries are JSON files named after SHA-256(media bytes) + the backend id
+(e.g. 'whisper-base', 'assemblyai-universal'), so the same call uploaded
+under another name still hits, and switching model never returns a stale
+transcript. Every hit refreshes the entry's mtime; when the directory grows
+past max_bytes the least recently used entries are deleted.
+
+Usage (from the project root):
+    python scripts/transcript_cache.py            # show size and entries
+    python scripts/transcript_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from instrumentation import count, stage
+
+DEFAULT_CACHE_DIR = '.transcript_cache'
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+def media_sha256(source, block_size=1 << 20):
+    """
+    SHA-256 of a file path, bytes, or file-like object (e.g. a Streamlit upload)
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif hasattr(source, 'getbuffer'):
+        digest.update(source.getbuffer())
+    elif hasattr(source, 'read'):
+        position = source.tell()
+        source.seek(0)
+        for block in iter(lambda: source.read(block_size), b''):
+            digest.update(block)
+        source.seek(position)
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache(object):
+    """
+    On-disk transcript store with size-based LRU eviction
+
+    Safe to share between threads (e.g. Streamlit sessions via st.cache_resource).
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_s = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.size_bytes = sum(os.path.getsize(path) for path in self._entries())
+
+    def _entries(self):
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                if name.endswith('.json')]
+
+    def _path(self, digest, backend_id):
+        safe_id = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in backend_id)
+        return os.path.join(self.cache_dir, f'{digest}-{safe_id}.json')
+
+    def get(self, digest, backend_id):
+        """Stored transcript dict, or None"""
+        path = self._path(digest, backend_id)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+            result = entry['result']
+            os.utime(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.saved_s += entry.get('elapsed_s', 0.0)
+        result['cached'] = True
+        return result
+
+    def put(self, digest, backend_id, result, elapsed_s=0.0):
+        """Store a transcript (elapsed_s: what producing it cost, for the metrics)"""
+        path = self._path(digest, backend_id)
+        data = json.dumps({'backend': backend_id, 'sha256': digest, 'created': time.time(),
+                           'elapsed_s': elapsed_s, 'result': result}, ensure_ascii=False)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        with self._lock:
+            if os.path.exists(path):
+                self.size_bytes -= os.path.getsize(path)
+            os.replace(tmp_path, path)
+            self.size_bytes += os.path.getsize(path)
+            if self.size_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries[:-1]:      # never the entry just written
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self.size_bytes = total
+
+    def get_or_transcribe(self, source, backend_id, transcribe):
+        """
+        Cached transcript of `source`, calling transcribe() only on a miss
+
+        Args:
+            source: path, bytes or file-like object with the media
+            backend_id: backend (and model) that would produce the transcript
+            transcribe: zero-argument function returning the transcript dict
+
+        Returns:
+            transcript dict; 'cached' is True when it came from the cache
+        """
+        with stage('media_hash'):
+            digest = media_sha256(source)
+        result = self.get(digest, backend_id)
+        count('transcript_cache_total', result='miss' if result is None else 'hit')
+        if result is not None:
+            return result
+        start = time.perf_counter()
+        result = transcribe()
+        self.put(digest, backend_id, result, elapsed_s=time.perf_counter() - start)
+        result['cached'] = False
+        return result
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'saved_s': self.saved_s,
+                'entries': len(self._entries()),
+                'size_bytes': self.size_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        removed = 0
+        with self._lock:
+            for path in self._entries():
+                os.remove(path)
+                removed += 1
+            self.size_bytes = 0
+        return removed
+
+
+class CachedBackend(object):
+    """
+    Wraps a transcription backend so transcribe(path) goes through the cache
+
+    Everything else (streaming, transcribe_samples) is passed through.
+    """
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+
+    @property
+    def backend_id(self):
+        return self.backend.backend_id
+
+    def transcribe(self, source):
+        return self.cache.get_or_transcribe(source, self.backend_id,
+                                            lambda: self.backend.transcribe(source))
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the transcript cache")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--clear', action='store_true', help='delete all entries')
+    args = parser.parse_args()
+
+    cache = TranscriptCache(args.cache_dir)
+    if args.clear:
+        print(f"Removed {cache.clear()} transcripts from {args.cache_dir}/")
+        return
+
+    stats = cache.stats()
+    print(f"{args.cache_dir}/: {stats['entries']} transcripts, "
+          f"{stats['size_bytes'] / 1024:.0f} KB of {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+    for path in sorted(cache._entries(), key=os.path.getmtime, reverse=True):
+        with open(path, encoding='utf-8') as f:
+            entry = json.load(f)
+        print(f"  {entry['sha256'][:12]}  {entry['backend']:<22} {entry['elapsed_s']:7.1f}s  "
+              f"{entry['result']['text'][:60]}")
+
+
+if __name__ == "__main__":
+    main()
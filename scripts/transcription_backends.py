@@ -0,0 +1,381 @@
+"""
+Transcription backends behind one interface
+Every app picks a backend instead of wiring up Whisper or AssemblyAI itself
+
+    TranscriptionBackend        base class
+        transcribe(path)                -> {'text', 'segments', 'language', 'backend'}
+        transcribe_samples(samples)     -> same, from 16 kHz float32 samples
+        await transcribe_async(path)    batch call on a thread (event-loop safe)
+        async for kind, text in stream(chunks, rate)
+                                        16-bit PCM chunks in, ('partial' | 'final',
+                                        text) out; ('begin', '') once connected
+
+    WhisperBackend              local, offline (optionally on a TranscriptionPool)
+    AssemblyAIBackend           hosted batch API + v3 streaming websocket
+    MockBackend                 scripted, in-process; no model, key or network
+
+    get_backend(name, **options)
+
+Usage (from the project root):
+    python scripts/transcription_backends.py final.mp4 --backend whisper
+    python scripts/transcription_backends.py ham1.wav --backend mock --stream
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import numpy as np
+from audio_io import SAMPLE_RATE, load_audio
+from instrumentation import stage
+
+ASSEMBLYAI_STREAMING_URL = 'wss://streaming.assemblyai.com/v3/ws'
+
+
+class TranscriptionError(Exception):
+    """Raised when a backend fails to transcribe"""
+
+
+def _pcm_to_samples(pcm):
+    return np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768
+
+
+class TranscriptionBackend(object):
+    """
+    Base class; subclasses implement transcribe and transcribe_samples
+    and may override stream
+    """
+
+    name = 'base'
+    # Seconds of audio decoded per step by the default stream()
+    stream_window_s = 10.0
+
+    @property
+    def backend_id(self):
+        """Identifies the backend and its settings (used as a cache key)"""
+        return self.name
+
+    def transcribe(self, path):
+        raise NotImplementedError
+
+    def transcribe_samples(self, samples, sr=SAMPLE_RATE):
+        raise NotImplementedError
+
+    async def transcribe_async(self, path):
+        return await asyncio.get_running_loop().run_in_executor(None, self.transcribe, path)
+
+    async def stream(self, chunks, rate=SAMPLE_RATE):
+        """
+        Default streaming: buffer stream_window_s of audio, transcribe it on a
+        thread and emit one final per segment
+        """
+        loop = asyncio.get_running_loop()
+        window_bytes = int(self.stream_window_s * rate) * 2
+        buffer = bytearray()
+        yield 'begin', ''
+        async for chunk in chunks:
+            buffer.extend(chunk)
+            if len(buffer) < window_bytes:
+                continue
+            samples = _pcm_to_samples(bytes(buffer))
+            buffer.clear()
+            result = await loop.run_in_executor(None, self.transcribe_samples, samples, rate)
+            for segment in result['segments']:
+                yield 'final', segment['text'].strip()
+        if buffer:
+            result = await loop.run_in_executor(None, self.transcribe_samples,
+                                                _pcm_to_samples(bytes(buffer)), rate)
+            for segment in result['segments']:
+                yield 'final', segment['text'].strip()
+
+    def _result(self, text, segments=None, language=None, **extra):
+        result = {'text': text, 'segments': segments or [], 'language': language,
+                  'backend': self.backend_id}
+        result.update(extra)
+        return result
+
+
+# ----------------------------------------------------------------------
+# Local Whisper
+# ----------------------------------------------------------------------
+
+class WhisperBackend(TranscriptionBackend):
+    """
+    Offline Whisper
+
+    With a TranscriptionPool, file transcription runs on its warm worker
+    processes (results also carry queue_wait_s / decode_s); otherwise on the
+    process-wide cached model. queue_timeout is how long to wait for a pool
+    slot before PoolBusy is raised.
+    """
+
+    name = 'whisper'
+
+    def __init__(self, size='base', pool=None, queue_timeout=None, **options):
+        self.size = pool.size if pool is not None else size
+        self.pool = pool
+        self.queue_timeout = queue_timeout
+        self.options = options
+
+    @property
+    def backend_id(self):
+        if not self.options:
+            return f'whisper-{self.size}'
+        # language, beam size, VAD filter, ... change the transcript: part of the cache key
+        options = json.dumps(self.options, sort_keys=True, default=str)
+        return f'whisper-{self.size}-{hashlib.sha256(options.encode()).hexdigest()[:12]}'
+
+    def _model(self):
+        from whisper_pool import get_whisper_model
+        return get_whisper_model(self.size)
+
+    def transcribe(self, path):
+        with stage('transcribe', backend=self.backend_id):
+            if self.pool is not None:
+                return self._from_pool(path)
+            return self._from_whisper(self._model().transcribe(path, **self.options))
+
+    def transcribe_samples(self, samples, sr=SAMPLE_RATE):
+        if sr != SAMPLE_RATE:
+            raise ValueError(f"Whisper expects {SAMPLE_RATE} Hz audio, got {sr}")
+        with stage('transcribe', backend=self.backend_id):
+            if self.pool is not None:
+                return self._from_pool(samples)
+            return self._from_whisper(self._model().transcribe(samples, **self.options))
+
+    def _from_pool(self, audio):
+        result = self.pool.transcribe(audio, timeout=self.queue_timeout, **self.options)
+        extra = {key: result[key] for key in ('queue_wait_s', 'decode_s') if key in result}
+        return self._result(result['text'], result['segments'], result['language'], **extra)
+
+    def _from_whisper(self, result):
+        return self._result(result['text'], result.get('segments', []), result.get('language'))
+
+
+# ----------------------------------------------------------------------
+# AssemblyAI
+# ----------------------------------------------------------------------
+
+def parse_message(message):
+    """
+    AssemblyAI streaming message -> ('partial' | 'final' | 'begin' | 'end' | None, text)
+
+    Understands v3 'Turn' messages and the older v2 transcript messages.
+    """
+    data = json.loads(message)
+    kind = data.get('type') or data.get('message_type')
+    if kind in ('Begin', 'SessionBegins'):
+        return 'begin', ''
+    if kind in ('Termination', 'SessionTerminated'):
+        return 'end', ''
+    if kind == 'Turn':
+        text = data.get('transcript', '')
+        if not text:
+            return None, ''
+        return ('final' if data.get('end_of_turn') else 'partial'), text
+    if kind == 'FinalTranscript':
+        return 'final', data.get('text', '')
+    if kind == 'PartialTranscript':
+        return 'partial', data.get('text', '')
+    return None, ''
+
+
+class AssemblyAIBackend(TranscriptionBackend):
+    """
+    Hosted AssemblyAI transcription
+
+    `url` can point at scripts/mock_transcription_server.py for offline runs
+    of the streaming path.
+    """
+
+    name = 'assemblyai'
+
+    def __init__(self, api_key=None, speech_models=('universal',), url=ASSEMBLYAI_STREAMING_URL):
+        self.api_key = api_key or os.environ.get('ASSEMBLYAI_API_KEY')
+        self.speech_models = list(speech_models)
+        self.url = url
+
+    @property
+    def backend_id(self):
+        return f"assemblyai-{'+'.join(self.speech_models)}"
+
+    def transcribe(self, path):
+        """path may also be a file-like object (e.g. a Streamlit upload)"""
+        import assemblyai as aai
+
+        if self.api_key:
+            aai.settings.api_key = self.api_key
+        config = aai.TranscriptionConfig(speech_models=self.speech_models)
+        with stage('transcribe', backend=self.backend_id):
+            transcript = aai.Transcriber(config=config).transcribe(path)
+        if transcript.status == "error":
+            raise TranscriptionError(f"Transcription failed: {transcript.error}")
+        text = transcript.text or ''
+        segments = [{'start': 0.0, 'end': float(transcript.audio_duration or 0), 'text': text}]
+        return self._result(text, segments if text else [],
+                            getattr(transcript, 'language_code', None))
+
+    def transcribe_samples(self, samples, sr=SAMPLE_RATE):
+        import tempfile
+        import wave
+
+        pcm = (np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes()
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+            path = f.name
+        try:
+            with wave.open(path, 'wb') as w:
+                w.setnchannels(1)
+                w.setsampwidth(2)
+                w.setframerate(sr)
+                w.writeframes(pcm)
+            return self.transcribe(path)
+        finally:
+            os.remove(path)
+
+    async def stream(self, chunks, rate=SAMPLE_RATE):
+        import websockets
+
+        separator = '&' if '?' in self.url else '?'
+        url = f'{self.url}{separator}sample_rate={rate}'
+        headers = {'Authorization': self.api_key} if self.api_key else {}
+
+        async with websockets.connect(url, additional_headers=headers, ping_interval=5,
+                                      ping_timeout=20) as ws:
+            async def send():
+                async for chunk in chunks:
+                    await ws.send(chunk)
+                await ws.send(json.dumps({'type': 'Terminate'}))
+
+            sender = asyncio.ensure_future(send())
+            try:
+                async for message in ws:
+                    kind, text = parse_message(message)
+                    if kind == 'end':
+                        break
+                    if kind is not None:
+                        yield kind, text
+            except websockets.exceptions.ConnectionClosedError as e:
+                raise TranscriptionError(f"Connection closed: {e}") from e
+            finally:
+                sender.cancel()
+
+
+# ----------------------------------------------------------------------
+# In-process stand-in
+# ----------------------------------------------------------------------
+
+DEFAULT_SCRIPT = [
+    "hi is this a good time to talk",
+    "we noticed suspicious activity on your account",
+    "congratulations you have been selected to receive a cash prize",
+    "to claim your reward we need to verify your account details",
+    "this offer is only valid today so please act urgently",
+]
+
+
+class ScriptedTranscript(object):
+    """
+    Turns received audio into scripted transcript events
+
+    A new script line starts every turn_seconds of audio; while a line is
+    being "spoken" it is revealed word by word as partials. Shared by
+    MockBackend and mock_transcription_server.py.
+    """
+
+    def __init__(self, script=None, turn_seconds=3.0, rate=SAMPLE_RATE):
+        self.script = list(script or DEFAULT_SCRIPT)
+        self.bytes_per_turn = int(turn_seconds * rate * 2)
+        self.received = 0
+        self.turn = 0
+
+    def feed(self, n_bytes):
+        """Account for n_bytes of PCM; returns ('partial' | 'final', text)"""
+        self.received += n_bytes
+        line = self.script[self.turn % len(self.script)]
+        progress = (self.received - self.turn * self.bytes_per_turn) / self.bytes_per_turn
+        if progress >= 1:
+            self.turn += 1
+            return 'final', line
+        words = line.split()
+        return 'partial', ' '.join(words[:max(1, int(progress * len(words)))])
+
+
+class MockBackend(TranscriptionBackend):
+    """Returns scripted text at a fixed pace; for tests and benchmarks of the plumbing"""
+
+    name = 'mock'
+
+    def __init__(self, script=None, turn_seconds=3.0):
+        self.script = list(script or DEFAULT_SCRIPT)
+        self.turn_seconds = turn_seconds
+
+    def transcribe(self, path):
+        return self.transcribe_samples(load_audio(path))
+
+    def transcribe_samples(self, samples, sr=SAMPLE_RATE):
+        duration = len(samples) / sr
+        segments = []
+        start = 0.0
+        index = 0
+        while start < duration:
+            end = min(start + self.turn_seconds, duration)
+            segments.append({'start': start, 'end': end,
+                             'text': self.script[index % len(self.script)]})
+            start = end
+            index += 1
+        return self._result(' '.join(s['text'] for s in segments), segments, 'en')
+
+    async def stream(self, chunks, rate=SAMPLE_RATE):
+        scripted = ScriptedTranscript(self.script, self.turn_seconds, rate)
+        yield 'begin', ''
+        async for chunk in chunks:
+            yield scripted.feed(len(chunk))
+
+
+BACKENDS = {
+    'whisper': WhisperBackend,
+    'assemblyai': AssemblyAIBackend,
+    'mock': MockBackend,
+}
+
+
+def get_backend(name, **options):
+    """Create a backend by name ('whisper', 'assemblyai' or 'mock')"""
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown transcription backend '{name}'. "
+                         f"Available: {', '.join(BACKENDS)}") from None
+    return backend(**options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe a file with any backend")
+    parser.add_argument('file', help='audio/video file')
+    parser.add_argument('--backend', default='whisper', choices=sorted(BACKENDS))
+    parser.add_argument('--stream', action='store_true',
+                        help='feed the file through the streaming interface')
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+    if not args.stream:
+        print(backend.transcribe(args.file)['text'])
+        return
+
+    pcm = (np.clip(load_audio(args.file), -1, 1) * 32767).astype('<i2').tobytes()
+
+    async def chunks():
+        for offset in range(0, len(pcm), 6400):
+            yield pcm[offset:offset + 6400]
+
+    async def run():
+        async for kind, text in backend.stream(chunks()):
+            if kind == 'final':
+                print(text)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Energy-based voice activity detection (NumPy only)
+Drops silence before audio is transcribed, so decode time and streaming
+bandwidth follow the amount of speech instead of the recording length
+
+    detect_speech(samples)     -> [(start_s, end_s), ...] speech regions
+    speech_only(samples)       -> (speech samples, TimeMap, skipped fraction)
+    speech_view(samples)       the same without copying: a lazy SpeechAudio over
+                               the speech regions of an array or PcmAudio
+    TimeMap                    maps times in the compacted audio back to the
+                               original recording (for segment timestamps)
+    StreamingVad               the same decision frame by frame for live PCM;
+                               keeps a short pre-roll and hangover so word
+                               onsets and end-of-turn pauses survive
+
+A 30 ms frame is speech when its RMS level is margin_db above the noise
+floor (10th percentile of frame levels, or a running minimum when live)
+and above an absolute floor. Short gaps are bridged and every region is
+padded. This removes silence and low-level noise. Hold music at speech level
+passes through: telling it apart needs a real classifier.
+
+Usage (from the project root):
+    python scripts/vad.py ham1.wav Conversation/dataset/train/student/audio_1.wav
+"""
+
+import argparse
+import bisect
+import numpy as np
+from audio_io import SAMPLE_RATE, load_audio
+from instrumentation import timed
+
+FRAME_MS = 30
+MARGIN_DB = 12.0
+MIN_LEVEL_DB = -50.0
+PADDING_MS = 200
+MIN_SILENCE_MS = 500
+MIN_SPEECH_MS = 120
+
+
+def frame_levels(samples, sr=SAMPLE_RATE, frame_ms=FRAME_MS, block_frames=2000):
+    """
+    RMS level (dBFS) of consecutive frames; the last partial frame is padded
+
+    Reads block_frames frames at a time, so a memory-mapped PcmAudio is
+    never converted to float32 as a whole.
+    """
+    frame = int(sr * frame_ms / 1000)
+    n_frames = -(-len(samples) // frame)
+    levels = np.empty(n_frames)
+    for first in range(0, n_frames, block_frames):
+        block = samples[first * frame:(first + block_frames) * frame]
+        count = -(-len(block) // frame)
+        padded = np.zeros(count * frame, dtype=np.float32)
+        padded[:len(block)] = block
+        power = np.square(padded.reshape(count, frame), dtype=np.float64).mean(axis=1)
+        levels[first:first + count] = 10 * np.log10(power + 1e-12)
+    return levels
+
+
+def _runs(mask):
+    """(start, end) index pairs of consecutive True values"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def detect_speech(samples, sr=SAMPLE_RATE, frame_ms=FRAME_MS, margin_db=MARGIN_DB,
+                  min_level_db=MIN_LEVEL_DB, padding_ms=PADDING_MS,
+                  min_silence_ms=MIN_SILENCE_MS, min_speech_ms=MIN_SPEECH_MS):
+    """
+    Speech regions of a recording
+
+    Returns:
+        list of (start_s, end_s), sorted and non-overlapping
+    """
+    if len(samples) == 0:
+        return []
+    levels = frame_levels(samples, sr, frame_ms)
+    threshold = max(np.percentile(levels, 10) + margin_db, min_level_db)
+    runs = _runs(levels > threshold)
+
+    to_frames = lambda ms: int(round(ms / frame_ms))
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < to_frames(min_silence_ms):
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    pad = to_frames(padding_ms)
+    duration = len(samples) / sr
+    regions = []
+    for start, end in merged:
+        if end - start < to_frames(min_speech_ms):
+            continue
+        start_s = max(0, int(start) - pad) * frame_ms / 1000
+        end_s = min(duration, (int(end) + pad) * frame_ms / 1000)
+        if regions and start_s <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end_s)
+        else:
+            regions.append((start_s, end_s))
+    return regions
+
+
+class TimeMap(object):
+    """Maps a time in the concatenated speech back to the original recording"""
+
+    def __init__(self, regions):
+        self.compact_starts = []
+        self.original_starts = []
+        position = 0.0
+        for start, end in regions:
+            self.compact_starts.append(position)
+            self.original_starts.append(start)
+            position += end - start
+        self.duration = position
+
+    def to_original(self, t):
+        if not self.compact_starts:
+            return t
+        index = max(0, bisect.bisect_right(self.compact_starts, t) - 1)
+        return self.original_starts[index] + (t - self.compact_starts[index])
+
+
+def speech_only(samples, sr=SAMPLE_RATE, **options):
+    """
+    Concatenate the speech regions of a recording
+
+    Returns:
+        (speech samples, TimeMap, fraction of the audio skipped)
+    """
+    regions = detect_speech(samples, sr, **options)
+    if not regions:
+        return samples[:0], TimeMap([]), 1.0 if len(samples) else 0.0
+    speech = np.concatenate([samples[int(start * sr):int(end * sr)] for start, end in regions])
+    return speech, TimeMap(regions), 1 - len(speech) / len(samples)
+
+
+class SpeechAudio(object):
+    """
+    The speech regions of a recording as one virtual array
+
+    len() and slicing work like on the concatenated speech, but samples are
+    only read (and converted, for PcmAudio) for the slice asked for.
+    """
+
+    def __init__(self, samples, regions, sr=SAMPLE_RATE):
+        self.samples = samples
+        self.spans = [(int(start * sr), int(end * sr)) for start, end in regions]
+        self.offsets = np.cumsum([0] + [end - start for start, end in self.spans])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, index):
+        start, stop, _ = index.indices(len(self))
+        pieces = []
+        first = max(0, bisect.bisect_right(self.offsets, start) - 1)
+        for i in range(first, len(self.spans)):
+            if self.offsets[i] >= stop:
+                break
+            base = self.spans[i][0] - self.offsets[i]
+            lo, hi = max(start, self.offsets[i]), min(stop, self.offsets[i + 1])
+            pieces.append(np.asarray(self.samples[base + lo:base + hi], dtype=np.float32))
+        return np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+
+
+@timed('vad')
+def speech_view(samples, sr=SAMPLE_RATE, **options):
+    """
+    speech_only without the copy
+
+    Returns:
+        (SpeechAudio, TimeMap, fraction of the audio skipped)
+    """
+    regions = detect_speech(samples, sr, **options)
+    view = SpeechAudio(samples, regions, sr)
+    skipped = 1 - len(view) / len(samples) if len(samples) else 0.0
+    return view, TimeMap(regions), skipped
+
+
+class StreamingVad(object):
+    """
+    Frame-by-frame VAD for 16-bit PCM chunks (live capture)
+
+    process(chunk) returns the bytes worth sending (possibly empty). The
+    noise floor follows the quietest recent frames; speech keeps the stream
+    open for hangover_ms so the service still sees the pause that ends a turn.
+    """
+
+    def __init__(self, sr=SAMPLE_RATE, frame_ms=FRAME_MS, margin_db=MARGIN_DB,
+                 min_level_db=MIN_LEVEL_DB, preroll_ms=PADDING_MS, hangover_ms=800):
+        self.frame_bytes = int(sr * frame_ms / 1000) * 2
+        self.margin_db = margin_db
+        self.min_level_db = min_level_db
+        self.preroll = max(1, preroll_ms // frame_ms)
+        self.hangover = max(1, hangover_ms // frame_ms)
+        self.noise_db = None
+        self._remainder = b''
+        self._recent = []
+        self._hang = 0
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def _is_speech(self, frame):
+        samples = np.frombuffer(frame, dtype='<i2').astype(np.float64) / 32768
+        level = 10 * np.log10(np.mean(samples * samples) + 1e-12)
+        if self.noise_db is None or level < self.noise_db:
+            self.noise_db = level
+        else:
+            self.noise_db += 0.02               # let the floor rise slowly if noise grows
+        return level > max(self.noise_db + self.margin_db, self.min_level_db)
+
+    def process(self, chunk):
+        data = self._remainder + chunk
+        n_frames = len(data) // self.frame_bytes
+        self._remainder = data[n_frames * self.frame_bytes:]
+        out = []
+        for i in range(n_frames):
+            frame = data[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+            self.frames_in += 1
+            if self._is_speech(frame):
+                if self._hang == 0:
+                    out.extend(self._recent)    # pre-roll: the start of the word
+                    self.frames_out += len(self._recent)
+                self._recent = []
+                self._hang = self.hangover
+            if self._hang > 0:
+                self._hang -= 1
+                out.append(frame)
+                self.frames_out += 1
+            else:
+                self._recent = (self._recent + [frame])[-self.preroll:]
+        return b''.join(out)
+
+    @property
+    def skipped_fraction(self):
+        return 1 - self.frames_out / self.frames_in if self.frames_in else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the speech regions of recordings")
+    parser.add_argument('files', nargs='+', help='audio/video files')
+    parser.add_argument('--margin-db', type=float, default=MARGIN_DB,
+                        help='dB above the noise floor that counts as speech')
+    args = parser.parse_args()
+
+    for path in args.files:
+        samples = load_audio(path)
+        regions = detect_speech(samples, margin_db=args.margin_db)
+        speech_s = sum(end - start for start, end in regions)
+        duration = len(samples) / SAMPLE_RATE
+        print(f"\n{path}: {duration:.1f}s, speech {speech_s:.1f}s, "
+              f"skipped {1 - speech_s / duration if duration else 0:.0%}")
+        for start, end in regions:
+            print(f"  {start:7.2f} - {end:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Shared Whisper transcription engine
+Loads each Whisper model once per process and serves requests from warm workers
+
+    get_whisper_model(size)     process-wide model cache (LRU over model sizes)
+    TranscriptionPool           warm worker processes + bounded request queue;
+                                every result reports queue wait vs decode time
+
+Streamlit apps should hold the pool with st.cache_resource so every rerun
+and every session reuses the same warm workers instead of reloading Whisper.
+
+Usage (from the project root):
+    python scripts/whisper_pool.py final.mp4 scam2.mp4 --model base --workers 2
+"""
+
+import argparse
+import collections
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_MODEL = 'base'
+MAX_CACHED_MODELS = 2
+
+_models = collections.OrderedDict()
+_models_lock = threading.Lock()
+
+
+def get_whisper_model(size=DEFAULT_MODEL, max_models=MAX_CACHED_MODELS):
+    """
+    Return a loaded Whisper model, loading it only on first use
+
+    Up to max_models sizes are kept; the least recently used one is evicted.
+    """
+    with _models_lock:
+        if size in _models:
+            _models.move_to_end(size)
+            return _models[size]
+
+        import whisper
+        model = whisper.load_model(size)
+        _models[size] = model
+        while len(_models) > max_models:
+            _models.popitem(last=False)
+        return model
+
+
+def save_upload(uploaded_file):
+    """Write a Streamlit upload to a temp file (workers need a path); caller deletes it"""
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        f.write(uploaded_file.getbuffer())
+        return f.name
+
+
+class PoolBusy(Exception):
+    """Raised when the transcription queue is full"""
+
+
+# ----------------------------------------------------------------------
+# Worker process side
+# ----------------------------------------------------------------------
+
+def _warm_worker(size):
+    """Initializer: load the model before the first request arrives"""
+    get_whisper_model(size)
+
+
+def _transcribe_in_worker(path, size, submitted_at, options):
+    started_at = time.time()
+    result = get_whisper_model(size).transcribe(path, **options)
+    finished_at = time.time()
+    return {
+        'text': result['text'],
+        'segments': result.get('segments', []),
+        'language': result.get('language'),
+        'queue_wait_s': started_at - submitted_at,
+        'decode_s': finished_at - started_at,
+        'worker_pid': os.getpid(),
+    }
+
+
+# ----------------------------------------------------------------------
+# Caller side
+# ----------------------------------------------------------------------
+
+class TranscriptionPool(object):
+    """
+    Pool of worker processes that each keep a warm Whisper model
+
+    At most workers + max_queue requests are accepted at once; further
+    submissions wait up to `timeout` seconds for a slot, then raise PoolBusy.
+    """
+
+    def __init__(self, size=DEFAULT_MODEL, workers=1, max_queue=4):
+        self.size = size
+        self.workers = workers
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.total_queue_wait = 0.0
+        self.total_decode = 0.0
+        # spawn: forking a process that already imported torch can deadlock
+        self._executor = ProcessPoolExecutor(max_workers=workers,
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_warm_worker, initargs=(size,))
+
+    def submit(self, path, timeout=None, **options):
+        """
+        Queue a file (or decoded audio) for transcription
+
+        Args:
+            path: audio/video file path (anything ffmpeg can decode), or
+                float32 mono samples at 16 kHz
+            timeout: seconds to wait for a queue slot (None = wait forever, 0 = don't wait)
+            **options: passed to whisper's model.transcribe (e.g. language='en')
+
+        Returns:
+            concurrent.futures.Future resolving to a dict with 'text', 'segments',
+            'queue_wait_s' and 'decode_s'
+        """
+        if timeout == 0:
+            acquired = self._slots.acquire(blocking=False)
+        else:
+            acquired = self._slots.acquire(timeout=timeout)
+        if not acquired:
+            with self._stats_lock:
+                self.rejected += 1
+            raise PoolBusy(f"Transcription queue is full ({self.workers} workers, "
+                           f"{self.max_queue} waiting)")
+        future = self._executor.submit(_transcribe_in_worker, path, self.size, time.time(), options)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def transcribe(self, path, timeout=None, **options):
+        """Blocking helper: submit and wait for the result"""
+        return self.submit(path, timeout=timeout, **options).result()
+
+    def _on_done(self, future):
+        self._slots.release()
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        with self._stats_lock:
+            self.completed += 1
+            self.total_queue_wait += result['queue_wait_s']
+            self.total_decode += result['decode_s']
+
+    def stats(self):
+        with self._stats_lock:
+            done = self.completed or 1
+            return {
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'mean_queue_wait_s': self.total_queue_wait / done,
+                'mean_decode_s': self.total_decode / done,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe files on a warm Whisper pool")
+    parser.add_argument('files', nargs='+', help='audio/video files')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='Whisper model size')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes')
+    parser.add_argument('--max-queue', type=int, default=8, help='requests allowed to wait')
+    args = parser.parse_args()
+
+    pool = TranscriptionPool(args.model, workers=args.workers, max_queue=args.max_queue)
+    try:
+        futures = [(path, pool.submit(path)) for path in args.files]
+        for path, future in futures:
+            result = future.result()
+            print(f"\n{path}  (queue {result['queue_wait_s']:.2f}s, "
+                  f"decode {result['decode_s']:.2f}s, pid {result['worker_pid']})")
+            print(f"  {result['text'].strip()}")
+        print(f"\n{pool.stats()}")
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import numpy as np
+from diarization import identify_caller, score_by_speaker
+
+# The callee repeats scam words back; the caller does most of the talking
+SEGMENTS = [
+    {'start': 0.0, 'end': 1.0, 'speaker': 1, 'text': 'hello who is this'},
+    {'start': 1.0, 'end': 9.0, 'speaker': 0, 'text': 'this is your bank, your account is blocked'},
+    {'start': 9.0, 'end': 10.5, 'speaker': 1, 'text': 'you want my otp from the bank'},
+    {'start': 10.5, 'end': 16.0, 'speaker': 0, 'text': 'yes read the code to me now'},
+]
+
+
+class KeywordPipeline(object):
+    def scam_probability(self, texts):
+        return np.array([0.9 if 'otp' in text else 0.1 for text in texts])
+
+
+def test_caller_does_not_follow_the_scores():
+    sides, caller = score_by_speaker(KeywordPipeline(), SEGMENTS)
+
+    assert caller == 0
+    assert sides[1]['scam_probability'] > sides[0]['scam_probability']
+
+
+def test_turn_order_rules():
+    assert identify_caller(SEGMENTS, 'first') == 1
+    assert identify_caller(SEGMENTS, 'second') == 0
+
+
+def test_balanced_call_has_no_caller():
+    balanced = [dict(segment, end=segment['start'] + 1.0) for segment in SEGMENTS]
+
+    assert identify_caller(balanced) is None
+    assert score_by_speaker(KeywordPipeline(), balanced)[1] is None
@@ -0,0 +1,27 @@
+from scam_index import MIN_SIMILARITY, ScamTemplateIndex
+
+TEMPLATES = [
+    'Your KYC has expired, share the OTP sent to your number to reactivate your account today',
+    'Congratulations you have won a cash prize of 50000, call now to claim your reward',
+]
+
+FILLER = ('hi good morning how are you doing today I was just calling about the meeting '
+          'we had planned for next week and whether the venue is still booked ')
+
+
+def test_template_read_out_inside_a_transcript_is_found():
+    index = ScamTemplateIndex()
+    index.add(TEMPLATES)
+    transcript = FILLER + TEMPLATES[0] + ' ' + FILLER
+
+    match = index.best_match(transcript)
+
+    assert match is not None and match['id'] == 0
+    assert match['similarity'] >= MIN_SIMILARITY
+
+
+def test_unrelated_transcript_has_no_match():
+    index = ScamTemplateIndex()
+    index.add(TEMPLATES)
+
+    assert index.best_match(FILLER * 3) is None
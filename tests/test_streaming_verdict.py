@@ -0,0 +1,47 @@
+import numpy as np
+from audio_io import SAMPLE_RATE
+from streaming_verdict import StreamingVerdict
+
+# (start, end, text) in recording seconds; 30 s windows overlapping by 5 s
+SCRIPT = [
+    (2.0, 6.0, 'hello this is your bank'),
+    (22.0, 33.0, 'please share your otp code now to keep your account open'),   # crosses 30 s
+    (33.5, 35.0, 'it is urgent'),
+    (50.0, 54.0, 'thank you'),                                                  # crosses 52 s
+]
+
+
+class ConstantPipeline(object):
+    threshold = 0.5
+
+    def scam_probability(self, texts):
+        return np.zeros(len(texts))
+
+
+def fake_transcribe(samples):
+    # Each sample holds its own index, so the window position is known. Like
+    # Whisper, speech cut by the window edge comes back as a shorter segment.
+    start = float(samples[0]) / SAMPLE_RATE
+    end = start + len(samples) / SAMPLE_RATE
+    segments = []
+    for s, e, text in SCRIPT:
+        cut_start, cut_end = max(s, start), min(e, end)
+        if cut_end <= cut_start:
+            continue
+        words = text.split()
+        first = int(round(len(words) * (cut_start - s) / (e - s)))
+        last = int(round(len(words) * (cut_end - s) / (e - s)))
+        segments.append({'start': cut_start - start, 'end': cut_end - start,
+                         'text': ' '.join(words[first:last])})
+    return {'segments': segments}
+
+
+def test_segment_crossing_window_boundary_is_committed_whole_once():
+    audio = np.arange(60 * SAMPLE_RATE, dtype=np.float32)
+    verdict = StreamingVerdict(ConstantPipeline(), fake_transcribe, window_s=30.0, overlap_s=5.0,
+                               early_stop=False)
+
+    result = verdict.analyze(audio)
+
+    assert [segment['text'] for segment in result['segments']] == [text for _, _, text in SCRIPT]
+    assert [segment['start'] for segment in result['segments']] == [s for s, _, _ in SCRIPT]